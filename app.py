@@ -1,36 +1,159 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Text, DateTime, ForeignKey, Float
+from fastapi.responses import Response, StreamingResponse
+from starlette.datastructures import MutableHeaders
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+from sqlalchemy import create_engine, select, table, column, text, null, Column, Integer, String, Boolean, Text, DateTime, ForeignKey, Float, Index, UniqueConstraint, tuple_, event, func, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
-from pydantic import BaseModel
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import json
 import logging
-import tempfile
 import subprocess
 import signal
 import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import sys
-import os
+import queue
+import asyncio
+import re
+import selectors
+import socket
+import hashlib
+import marshal
+import gzip
+import zlib
+import csv
+import io
+import importlib.util
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import fcntl
+import random
+import html
+import unicodedata
+import mimetypes
+import bisect
+import contextvars
+from array import array
+import itertools
+from collections import deque, OrderedDict
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:
+    # Opcional: sem ele os arquivos estáticos saem só em gzip
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    # Opcional: sem ele as listagens usam o json da biblioteca padrão
+    orjson = None
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configuração do banco de dados SQLite local
-DATABASE_URL = "sqlite:///./farmmoneyrich.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Variáveis do arquivo .env (as do ambiente têm prioridade)
+load_dotenv()
+
+# === ARMAZENAMENTO ===
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./farmmoneyrich.db")
+# "performance": no SQLite, WAL + pragmas + uma conexão de escrita e um pool de leitura
+# "compat": uma engine com as configurações padrão do driver
+STORAGE_PROFILE = os.getenv("STORAGE_PROFILE", "performance")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "30"))
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+SQLITE_TUNED = IS_SQLITE and STORAGE_PROFILE == "performance"
+
+def sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            # Só vale num banco novo (antes do WAL e das tabelas) ou após um VACUUM;
+            # permite à retenção de logs devolver páginas com incremental_vacuum
+            cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            # Uma escrita roteada para o pool de leitura falha em vez de disputar o lock
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
+def create_engines(url: str, factory) -> tuple:
+    """(escrita, leitura); fora do perfil performance do SQLite são a mesma engine"""
+    connect_args = {"check_same_thread": False} if IS_SQLITE else {}
+    if not SQLITE_TUNED:
+        single = factory(url, connect_args=connect_args)
+        return single, single
+    # O aiosqlite usa NullPool por padrão (uma conexão nova por sessão)
+    poolclass = AsyncAdaptedQueuePool if factory is create_async_engine else QueuePool
+    # Uma única conexão de escrita: escritores esperam no pool, não no lock do SQLite
+    writer = factory(url, connect_args=connect_args, poolclass=poolclass,
+                     pool_size=1, max_overflow=0, pool_timeout=DB_WRITE_TIMEOUT)
+    reader = factory(url, connect_args=connect_args, poolclass=poolclass,
+                     pool_size=DB_READ_POOL_SIZE, max_overflow=DB_READ_POOL_SIZE)
+    event.listen(getattr(writer, "sync_engine", writer), "connect", sqlite_pragmas(read_only=False))
+    event.listen(getattr(reader, "sync_engine", reader), "connect", sqlite_pragmas(read_only=True))
+    return writer, reader
+
+engine, read_engine = create_engines(DATABASE_URL, create_engine)
 Base = declarative_base()
 
+class DBSession(Session):
+    """Escritas (flush, INSERT/UPDATE/DELETE) vão para a engine de escrita; consultas para a de leitura"""
+    writer = engine
+    reader = read_engine
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            return self.writer
+        return self.reader
+
+SessionLocal = sessionmaker(class_=DBSession, autocommit=False, autoflush=False)
+
+# Engine assíncrona (aiosqlite) usada pelos endpoints `async def`: uma consulta
+# esperando o banco não ocupa uma thread do pool do Starlette
+ASYNC_DATABASE_URL = (DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+                      .replace("postgresql://", "postgresql+asyncpg://", 1))
+async_engine, async_read_engine = create_engines(ASYNC_DATABASE_URL, create_async_engine)
+
+class AsyncDBSession(DBSession):
+    """Sessão síncrona por trás de cada AsyncSession (recebe os mesmos eventos)"""
+    writer = async_engine.sync_engine
+    reader = async_read_engine.sync_engine
+
+# Sem expirar no commit: os objetos seguem legíveis sem novo acesso ao banco
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False,
+                                       sync_session_class=AsyncDBSession)
+
 # Dicionário para armazenar processos dos bots
 bot_processes = {}
 
@@ -48,6 +171,7 @@ class Gateway(Base):
     
     # Relacionamento
     bots = relationship("Bot", back_populates="gateway")
+    transactions = relationship("Transaction", back_populates="gateway")
 
 class Bot(Base):
     __tablename__ = "bots"
@@ -59,12 +183,14 @@ class Bot(Base):
     is_active = Column(Boolean, default=False)
     gateway_id = Column(Integer, ForeignKey("gateways.id"), nullable=True)
     process_id = Column(Integer, nullable=True)
+    runtime = Column(String, default="dedicated")  # "dedicated" ou "shared" (worker multiplexado)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relacionamento
     gateway = relationship("Gateway", back_populates="bots")
     logs = relationship("Log", back_populates="bot")
+    transactions = relationship("Transaction", back_populates="bot")
 
 class Log(Base):
     __tablename__ = "logs"
@@ -77,10 +203,231 @@ class Log(Base):
     
     # Relacionamento
     bot = relationship("Bot", back_populates="logs")
+    
+    # Índices para a listagem paginada por (timestamp, id) com filtros.
+    # AUTOINCREMENT: o SQLite não reaproveita ids depois de uma limpeza, então
+    # os cursores dos clientes (after_id/before_id, ids do SSE) continuam válidos
+    __table_args__ = (
+        Index("ix_logs_timestamp", "timestamp"),
+        Index("ix_logs_bot_id_timestamp", "bot_id", "timestamp"),
+        Index("ix_logs_level_timestamp", "level", "timestamp"),
+        {"sqlite_autoincrement": True},
+    )
+
+class Transaction(Base):
+    __tablename__ = "transactions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    external_id = Column(String, nullable=True, unique=True)
+    bot_id = Column(Integer, ForeignKey("bots.id"), nullable=False)
+    gateway_id = Column(Integer, ForeignKey("gateways.id"), nullable=True)
+    amount = Column(Float, nullable=False)
+    currency = Column(String, default="BRL")
+    paid_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relacionamento
+    bot = relationship("Bot", back_populates="transactions")
+    gateway = relationship("Gateway", back_populates="transactions")
+
+class RevenueRollup(Base):
+    """Receita agregada por hora/dia e por bot/gateway, atualizada a cada pagamento"""
+    __tablename__ = "revenue_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    bucket = Column(String, nullable=False)      # "hour" ou "day"
+    dimension = Column(String, nullable=False)   # "bot" ou "gateway"
+    key_id = Column(Integer, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    revenue = Column(Float, nullable=False, default=0)
+    transactions = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint("bucket", "dimension", "key_id", "bucket_start", name="uq_revenue_rollups_key"),
+        Index("ix_revenue_rollups_bucket_start", "bucket", "dimension", "bucket_start"),
+    )
 
 # Criar tabelas
 Base.metadata.create_all(bind=engine)
 
+# create_all não altera tabelas que já existiam: colunas e índices novos são adicionados aqui
+def add_missing_columns(model):
+    existing = {col["name"] for col in inspect(engine).get_columns(model.__tablename__)}
+    with engine.begin() as conn:
+        for col in model.__table__.columns:
+            if col.name in existing:
+                continue
+            ddl = f"ALTER TABLE {model.__tablename__} ADD COLUMN {col.name} {col.type.compile(engine.dialect)}"
+            if col.default is not None and isinstance(col.default.arg, str):
+                ddl += f" DEFAULT '{col.default.arg}'"
+            conn.exec_driver_sql(ddl)
+
+add_missing_columns(Bot)
+
+def ensure_logs_autoincrement():
+    """Bancos SQLite antigos: recria `logs` com AUTOINCREMENT, mantendo os ids"""
+    if not IS_SQLITE:
+        return
+    with engine.connect() as conn:
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'logs'").scalar()
+        if ddl is None or "AUTOINCREMENT" in ddl.upper():
+            return
+        existing = {col["name"] for col in inspect(conn).get_columns("logs")}
+        columns = ", ".join(col.name for col in Log.__table__.columns if col.name in existing)
+        create = str(CreateTable(Log.__table__).compile(engine)).strip().replace("CREATE TABLE logs ", "CREATE TABLE logs_autoincrement ", 1)
+        started = time.monotonic()
+        driver = conn.connection.driver_connection
+        # Um script só, numa transação: o sqlite3 faria commit implícito antes de cada DDL.
+        # DROP TABLE leva junto os índices e os triggers da busca, recriados logo abaixo
+        try:
+            driver.executescript(
+                f"BEGIN IMMEDIATE; {create}; "
+                f"INSERT INTO logs_autoincrement ({columns}) SELECT {columns} FROM logs; "
+                "DROP TABLE logs; ALTER TABLE logs_autoincrement RENAME TO logs; COMMIT;"
+            )
+        except Exception:
+            if driver.in_transaction:
+                driver.execute("ROLLBACK")
+            raise
+        total = conn.exec_driver_sql("SELECT count(*) FROM logs").scalar()
+    logger.info(f"Tabela logs recriada com AUTOINCREMENT: {total} logs em {time.monotonic() - started:.1f}s")
+
+ensure_logs_autoincrement()
+
+for index in Log.__table__.indexes:
+    index.create(bind=engine, checkfirst=True)
+
+# === BUSCA NOS LOGS ===
+# Índice FTS5 com conteúdo externo: guarda só os termos, o texto continua em `logs`.
+# Os triggers mantêm o índice em dia para qualquer escrita (log_writer, add_log, limpeza).
+LOG_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5("
+    "message, content='logs', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS logs_fts_insert AFTER INSERT ON logs BEGIN "
+    "INSERT INTO logs_fts(rowid, message) VALUES (new.id, new.message); END",
+    "CREATE TRIGGER IF NOT EXISTS logs_fts_delete AFTER DELETE ON logs BEGIN "
+    "INSERT INTO logs_fts(logs_fts, rowid, message) VALUES ('delete', old.id, old.message); END",
+    "CREATE TRIGGER IF NOT EXISTS logs_fts_update AFTER UPDATE OF message ON logs BEGIN "
+    "INSERT INTO logs_fts(logs_fts, rowid, message) VALUES ('delete', old.id, old.message); "
+    "INSERT INTO logs_fts(rowid, message) VALUES (new.id, new.message); END",
+)
+
+def setup_log_search() -> bool:
+    """Cria o índice de busca dos logs; False quando o banco não tem FTS5"""
+    if not IS_SQLITE:
+        return False
+    try:
+        with engine.begin() as conn:
+            created = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'logs_fts'").first() is None
+            conn.exec_driver_sql(LOG_SEARCH_DDL[0])
+            if created and conn.exec_driver_sql("SELECT 1 FROM logs LIMIT 1").first():
+                # Banco com logs de antes do índice: indexa tudo antes de criar os triggers, senão
+                # o 'delete' do trigger aponta para linhas que o índice nunca teve e corrompe o FTS
+                started = time.monotonic()
+                conn.exec_driver_sql("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')")
+                logger.info(f"Índice de busca criado para os logs existentes em {time.monotonic() - started:.1f}s")
+            for ddl in LOG_SEARCH_DDL[1:]:
+                conn.exec_driver_sql(ddl)
+    except OperationalError as e:
+        logger.warning(f"Busca nos logs sem FTS5 ({e}); usando LIKE")
+        return False
+    return True
+
+LOG_SEARCH_FTS = setup_log_search()
+
+def rebuild_log_search():
+    """Reindexa todos os logs (bancos criados antes do índice ou índice corrompido)"""
+    if not LOG_SEARCH_FTS:
+        logger.error("Busca com FTS5 indisponível neste banco")
+        return
+    started = time.monotonic()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO logs_fts(logs_fts) VALUES ('rebuild')")
+        conn.exec_driver_sql("INSERT INTO logs_fts(logs_fts) VALUES ('optimize')")
+        total = conn.exec_driver_sql("SELECT count(*) FROM logs").scalar()
+    logger.info(f"Índice de busca reconstruído: {total} logs em {time.monotonic() - started:.1f}s")
+
+def search_terms(q: str) -> List[tuple]:
+    """Termos da busca do usuário: palavras ou "frases entre aspas", como (termo, prefixo)"""
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', q):
+        prefix = not phrase and len(word) > 1 and word.endswith("*")
+        term = phrase or (word.rstrip("*") if prefix else word)
+        if term.strip():
+            terms.append((term, prefix))
+    return terms
+
+def fts_query(terms: List[tuple]) -> str:
+    """Consulta FTS5 sem operadores do usuário: cada termo vira uma frase obrigatória"""
+    return " ".join('"' + term.replace('"', '""') + '"' + ("*" if prefix else "") for term, prefix in terms)
+
+LOG_SEARCH_RANK_MAX_HITS = int(os.getenv("LOG_SEARCH_RANK_MAX_HITS", "10000"))
+LOG_SEARCH_SNIPPET_CHARS = int(os.getenv("LOG_SEARCH_SNIPPET_CHARS", "160"))
+
+def fold_text(value: str) -> tuple:
+    """Texto sem acentos e em minúsculas (como o tokenizer do FTS5) + posição de cada caractere no original"""
+    folded, positions = [], []
+    for i, char in enumerate(value):
+        for piece in unicodedata.normalize("NFKD", char).casefold():
+            if not unicodedata.combining(piece):
+                folded.append(piece)
+                positions.append(i)
+    return "".join(folded), positions
+
+def log_snippet(message: str, terms: List[tuple]) -> str:
+    """Trecho da mensagem em HTML escapado com os termos em <mark>.
+
+    Feito em Python sobre a página já carregada: snippet() do FTS5 precisa
+    reler a lista de documentos do termo, o que custa caro em termos comuns.
+    """
+    folded, positions = fold_text(message)
+    spans = []
+    for term, prefix in terms:
+        tokens = re.findall(r"[^\W_]+", fold_text(term)[0])
+        if not tokens:
+            continue
+        pattern = r"(?<![^\W_])" + r"[\W_]+".join(map(re.escape, tokens)) + (r"[^\W_]*" if prefix else r"(?![^\W_])")
+        spans += [(positions[m.start()], positions[m.end() - 1] + 1) for m in re.finditer(pattern, folded)]
+    spans.sort()
+
+    start, end = 0, len(message)
+    if len(message) > LOG_SEARCH_SNIPPET_CHARS:
+        # Janela em volta do primeiro termo encontrado
+        start = max(0, min(spans[0][0] - LOG_SEARCH_SNIPPET_CHARS // 4 if spans else 0, len(message) - LOG_SEARCH_SNIPPET_CHARS))
+        end = start + LOG_SEARCH_SNIPPET_CHARS
+    parts, cursor = ["…"] if start else [], start
+    for span_start, span_end in spans:
+        span_start, span_end = max(span_start, cursor), min(span_end, end)
+        if span_start >= span_end:
+            continue
+        parts += [html.escape(message[cursor:span_start]), "<mark>", html.escape(message[span_start:span_end]), "</mark>"]
+        cursor = span_end
+    parts.append(html.escape(message[cursor:end]))
+    if end < len(message):
+        parts.append("…")
+    return "".join(parts)
+
+# === SERIALIZAÇÃO DAS LISTAGENS ===
+class FastJSONResponse(Response):
+    """JSON montado direto de dicts com tipos simples (linhas do banco).
+
+    Devolvida pelos endpoints de listagem, que continuam declarando o
+    `response_model` (o schema do OpenAPI não muda): como o endpoint já
+    entrega uma Response, o FastAPI não revalida cada linha no modelo nem
+    passa pelo jsonable_encoder. Os bytes são os mesmos do JSONResponse.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=datetime.isoformat).encode("utf-8")
+
+def row_dicts(result) -> List[dict]:
+    """Linhas de um select de colunas como dicts, sem montar objetos ORM"""
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
 # Schemas Pydantic
 class GatewayBase(BaseModel):
     name: str
@@ -108,136 +455,2939 @@ class GatewayResponse(BaseModel):
     class Config:
         from_attributes = True
 
-class BotBase(BaseModel):
-    name: str
-    token: str
-    code: Optional[str] = ""
-    gateway_id: Optional[int] = None
+class BotBase(BaseModel):
+    name: str
+    token: str
+    code: Optional[str] = ""
+    gateway_id: Optional[int] = None
+    runtime: Optional[str] = Field(None, pattern="^(dedicated|shared)$")
+
+class BotCreate(BotBase):
+    pass
+
+class BotUpdate(BaseModel):
+    name: Optional[str] = None
+    token: Optional[str] = None
+    code: Optional[str] = None
+    gateway_id: Optional[int] = None
+    runtime: Optional[str] = Field(None, pattern="^(dedicated|shared)$")
+
+class BotResponse(BaseModel):
+    id: int
+    name: str
+    token: str
+    code: Optional[str]
+    is_active: bool
+    gateway_id: Optional[int]
+    runtime: Optional[str] = "dedicated"
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class BulkBotAction(BaseModel):
+    action: str = Field(pattern="^(start|stop|restart)$")
+    bot_ids: Optional[List[int]] = None
+    gateway_id: Optional[int] = None
+    concurrency: Optional[int] = Field(None, ge=1, le=64)
+
+# Itens das listagens: só os campos pedidos em ?fields= saem na resposta
+class BotSummary(BaseModel):
+    id: int
+    name: Optional[str] = None
+    is_active: Optional[bool] = None
+    gateway_id: Optional[int] = None
+    runtime: Optional[str] = None
+    token_masked: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class GatewaySummary(BaseModel):
+    id: int
+    name: Optional[str] = None
+    type: Optional[str] = None
+    api_url: Optional[str] = None
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+# Colunas que ?fields= aceita. `code` fica de fora (só em GET /api/bots/{id}),
+# o token sai mascarado e a api_key do gateway nunca sai
+BOT_LIST_FIELDS = {
+    "id": Bot.id,
+    "name": Bot.name,
+    "is_active": Bot.is_active,
+    "gateway_id": Bot.gateway_id,
+    "runtime": Bot.runtime,
+    "token_masked": Bot.token,
+    "created_at": Bot.created_at,
+    "updated_at": Bot.updated_at,
+}
+BOT_SUMMARY_FIELDS = ("id", "name", "is_active", "gateway_id", "token_masked", "created_at", "updated_at")
+
+GATEWAY_LIST_FIELDS = {
+    "id": Gateway.id,
+    "name": Gateway.name,
+    "type": Gateway.type,
+    "api_url": Gateway.api_url,
+    "status": Gateway.status,
+    "created_at": Gateway.created_at,
+}
+GATEWAY_SUMMARY_FIELDS = tuple(GATEWAY_LIST_FIELDS)
+
+# Colunas de LogResponse, lidas sem montar objetos Log
+LOG_RESPONSE_COLUMNS = (Log.id, Log.level, Log.message, Log.bot_id, Log.timestamp)
+
+def mask_token(token: Optional[str]) -> Optional[str]:
+    """Token visível só nas pontas (listagens e eventos)"""
+    if not token:
+        return token
+    return f"{token[:4]}...{token[-4:]}" if len(token) > 12 else "..."
+
+async def list_page(db: AsyncSession, model, available: dict, summary: tuple,
+                    fields: Optional[str], after_id: Optional[int], limit: int) -> List[dict]:
+    """Página de uma listagem por cursor (`id > after_id`), lendo só as colunas pedidas"""
+    names = summary if fields is None else [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(available))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(unknown)}. Disponíveis: {', '.join(available)}")
+    # id sempre presente: é o cursor da próxima página
+    names = ["id"] + [name for name in dict.fromkeys(names) if name != "id"]
+    
+    query = select(*(available[name].label(name) for name in names)).order_by(model.id).limit(limit)
+    if after_id is not None:
+        query = query.where(model.id > after_id)
+    rows = row_dicts(await db.execute(query))
+    if "token_masked" in names:
+        for row in rows:
+            row["token_masked"] = mask_token(row["token_masked"])
+    return rows
+
+class LogCreate(BaseModel):
+    level: str
+    message: str
+    bot_id: Optional[int] = None
+
+class LogResponse(BaseModel):
+    id: int
+    level: str
+    message: str
+    bot_id: Optional[int]
+    timestamp: datetime
+    
+    class Config:
+        from_attributes = True
+
+class LogSearchResult(LogResponse):
+    rank: Optional[float] = None     # bm25 do FTS5: menor = mais relevante
+    snippet: Optional[str] = None    # trecho em HTML escapado, termos encontrados em <mark>
+
+class TransactionCreate(BaseModel):
+    bot_id: int
+    amount: float = Field(gt=0)
+    currency: str = "BRL"
+    external_id: Optional[str] = None
+    gateway_id: Optional[int] = None
+    paid_at: Optional[datetime] = None
+
+class TransactionResponse(BaseModel):
+    id: int
+    external_id: Optional[str]
+    bot_id: int
+    gateway_id: Optional[int]
+    amount: float
+    currency: str
+    paid_at: datetime
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class RevenuePoint(BaseModel):
+    key_id: int
+    bucket_start: datetime
+    revenue: float
+    transactions: int
+    
+    class Config:
+        from_attributes = True
+
+class StatsResponse(BaseModel):
+    total_revenue: float
+    total_transactions: int
+    active_bots: int
+    total_bots: int
+    connected_gateways: int
+    total_gateways: int
+    reconciled_at: Optional[datetime] = None
+    snapshot_age_seconds: float = 0
+
+# Dependência para obter sessão do banco
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# === CACHE DE RESPOSTAS ===
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # 0 desativa
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+JSON_GZIP_MIN_BYTES = int(os.getenv("JSON_GZIP_MIN_BYTES", "1024"))  # 0 desativa
+
+def accepted_encodings(headers: list) -> set:
+    """Codificações do Accept-Encoding da requisição (ignorando as com q=0)"""
+    encodings = set()
+    for name, value in headers:
+        if name == b"accept-encoding":
+            for part in value.decode("latin-1").split(","):
+                coding, _, params = part.partition(";")
+                if re.fullmatch(r"\s*q\s*=\s*0(?:\.0*)?\s*", params):
+                    continue
+                encodings.add(coding.strip().lower())
+    return encodings
+
+class TableVersions:
+    """Versão de cada tabela, incrementada quando uma transação que a alterou termina.
+
+    Os comandos INSERT/UPDATE/DELETE marcam a tabela na conexão; a versão só
+    sobe quando a conexão volta ao pool, depois do commit. Assim uma leitura
+    nunca guarda dados antigos com a versão nova. "Tabelas" que não estão no
+    banco (ex.: `stats`) são incrementadas direto com `bump`.
+    """
+
+    DML = re.compile(r"\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+[\"`]?(\w+)", re.IGNORECASE)
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *tables: str):
+        with self._lock:
+            for name in tables:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def get(self, tables: tuple) -> tuple:
+        return tuple(self._versions.get(name, 0) for name in tables)
+
+    def watch(self, sync_engine):
+        event.listen(sync_engine, "after_cursor_execute", self._after_execute)
+        event.listen(sync_engine, "checkin", self._checkin)
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        match = self.DML.match(statement)
+        if match:
+            conn.info.setdefault("changed_tables", set()).add(match.group(1).lower())
+
+    def _checkin(self, dbapi_connection, connection_record):
+        if connection_record is not None:
+            tables = connection_record.info.pop("changed_tables", None)
+            if tables:
+                self.bump(*tables)
+
+table_versions = TableVersions()
+table_versions.watch(engine)
+table_versions.watch(async_engine.sync_engine)
+
+class ResponseCache:
+    """Corpos das leituras do dashboard num LRU limitado em bytes, válidos enquanto
+    as versões das tabelas de que a rota depende não mudarem"""
+
+    # Rotas (GET) em cache e as tabelas que as invalidam
+    ROUTES = (
+        (re.compile(r"/api/bots(?:/\d+)?"), ("bots",)),
+        (re.compile(r"/api/gateways(?:/\d+)?"), ("gateways",)),
+        (re.compile(r"/api/logs(?:/search)?"), ("logs",)),
+        (re.compile(r"/api/revenue"), ("revenue_rollups",)),
+    )
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        # Muda a cada início do servidor: as versões recomeçam do zero
+        self.boot_id = uuid.uuid4().hex
+        self._entries = OrderedDict()  # chave -> (versões, headers, corpo)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def tables_for(self, path: str) -> Optional[tuple]:
+        for pattern, tables in self.ROUTES:
+            if pattern.fullmatch(path):
+                return tables
+        return None
+
+    def etag(self, key: str, versions: tuple) -> str:
+        return '"' + hashlib.sha1(f"{self.boot_id}|{key}|{versions}".encode()).hexdigest()[:24] + '"'
+
+    def get(self, key: str, versions: tuple) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != versions:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, versions: tuple, headers: list, body: bytes):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(key) + len(previous[2])
+        self._entries[key] = (versions, headers, body)
+        self._bytes += len(key) + len(body)
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old = self._entries.popitem(last=False)
+            self._bytes -= len(old_key) + len(old[2])
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRY_BYTES)
+
+class ResponseCacheMiddleware:
+    """Middleware ASGI do cache de respostas.
+
+    O ETag vem das versões das tabelas, não do corpo: um `If-None-Match` igual
+    é respondido com 304 sem chamar o endpoint nem consultar o banco.
+    """
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        tables = None
+        if scope["type"] == "http" and scope["method"] == "GET" and self.cache.max_bytes:
+            tables = self.cache.tables_for(scope["path"])
+        if tables is None:
+            await self.app(scope, receive, send)
+            return
+
+        query = scope["query_string"].decode("latin-1")
+        key = scope["path"] + ("?" + "&".join(sorted(query.split("&"))) if query else "")
+        if JSON_GZIP_MIN_BYTES and "gzip" in accepted_encodings(scope["headers"]):
+            # Corpo comprimido pelo JSONGzipMiddleware: outra entrada e outro ETag
+            key += "|gzip"
+        versions = table_versions.get(tables)
+        etag = self.cache.etag(key, versions)
+        validators = [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if etag in (candidate.strip().removeprefix("W/") for candidate in value.decode("latin-1").split(",")):
+                    self.cache.not_modified += 1
+                    await send({"type": "http.response.start", "status": 304, "headers": validators})
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+                break
+
+        entry = self.cache.get(key, versions)
+        if entry is not None:
+            await send({"type": "http.response.start", "status": 200, "headers": entry[1]})
+            await send({"type": "http.response.body", "body": entry[2]})
+            return
+
+        # As versões foram lidas antes do endpoint: se algo mudar no meio, a
+        # entrada fica com a versão antiga e não é reaproveitada
+        captured = {"headers": None, "body": [], "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                if message["status"] == 200:
+                    headers = [(name, value) for name, value in message["headers"]
+                               if name not in (b"etag", b"cache-control")] + validators
+                    message = {**message, "headers": headers}
+                    captured["headers"] = headers
+            elif message["type"] == "http.response.body" and captured["headers"] is not None:
+                body = message.get("body", b"")
+                captured["size"] += len(body)
+                if captured["size"] > self.cache.max_entry_bytes:
+                    captured["headers"] = None
+                else:
+                    captured["body"].append(body)
+                    if not message.get("more_body", False):
+                        self.cache.put(key, versions, captured["headers"], b"".join(captured["body"]))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+class JSONGzipMiddleware:
+    """Comprime com gzip as respostas JSON a partir de `minimum_size` bytes.
+
+    Fica por dentro do cache de respostas, que guarda o corpo já comprimido.
+    Só olha `application/json`: streams (SSE, exportação) passam direto.
+    """
+
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.minimum_size:
+            await self.app(scope, receive, send)
+            return
+
+        accepts_gzip = "gzip" in accepted_encodings(scope["headers"])
+        held = {"start": None, "body": []}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message["headers"]))
+                if headers.get("content-type", "").startswith("application/json") and "content-encoding" not in headers:
+                    headers.add_vary_header("Accept-Encoding")
+                    message = {**message, "headers": headers.raw}
+                    if accepts_gzip:
+                        held["start"] = message
+                        return
+            elif message["type"] == "http.response.body" and held["start"] is not None:
+                held["body"].append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                body = b"".join(held["body"])
+                headers = MutableHeaders(raw=list(held["start"]["headers"]))
+                if len(body) >= self.minimum_size:
+                    # mtime=0: mesmo conteúdo, mesmos bytes (ETag forte do cache)
+                    body = gzip.compress(body, compresslevel=6, mtime=0)
+                    headers["content-encoding"] = "gzip"
+                    headers["content-length"] = str(len(body))
+                await send({**held["start"], "headers": headers.raw})
+                await send({"type": "http.response.body", "body": body})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+# === MÉTRICAS (PROMETHEUS) ===
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+HTTP_DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+DB_QUERIES_PER_REQUEST_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+GATEWAY_PROBE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Métodos com série própria; qualquer outro verbo vira "other" (rótulos limitados)
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+# Consultas e tempo de banco da requisição atual: [consultas, segundos]
+request_db_usage = contextvars.ContextVar("request_db_usage", default=None)
+
+class Histogram:
+    """Histograma no formato do Prometheus, com uma parcial por thread.
+
+    `observe()` só escreve na parcial da thread atual, sem lock (a lista de
+    contadores nasce uma vez por thread). O lock só é usado quando uma thread
+    nova aparece e na coleta, que soma as parciais e incorpora as de threads
+    já encerradas.
+    """
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self._local = threading.local()
+        self._shards = []
+        # Uma posição por faixa (+Inf incluída) e a soma na última
+        self._retired = [0] * (len(bounds) + 1) + [0.0]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._register()
+        shard[bisect.bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def _register(self) -> list:
+        shard = self._local.shard = [0] * (len(self.bounds) + 1) + [0.0]
+        with self._lock:
+            self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def collect(self) -> tuple:
+        """(contagem por faixa, não acumulada; soma)"""
+        with self._lock:
+            totals = list(self._retired)
+            alive = []
+            for thread, shard in self._shards:
+                for i, value in enumerate(shard):
+                    totals[i] += value
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    # A thread não escreve mais: a parcial vira parte do acumulado
+                    for i, value in enumerate(shard):
+                        self._retired[i] += value
+            self._shards = alive
+        return totals[:-1], totals[-1]
+
+class HTTPSeries:
+    """Métricas de um par (método, rota); só o event loop escreve aqui"""
+
+    def __init__(self):
+        self.duration = Histogram(HTTP_DURATION_BUCKETS)
+        self.db_queries = Histogram(DB_QUERIES_PER_REQUEST_BUCKETS)
+        self.db_seconds = Histogram(HTTP_DURATION_BUCKETS)
+        self.statuses = {}
+
+    def observe(self, status: int, seconds: float, usage: list):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.duration.observe(seconds)
+        self.db_queries.observe(usage[0])
+        self.db_seconds.observe(usage[1])
+
+class Metrics:
+    """Registro das métricas expostas em GET /metrics"""
+
+    ROUTE_LABELS_MAX = 4096
+
+    def __init__(self):
+        self.routes = []
+        self._http = {}
+        self._route_labels = {}
+        self._db = {}
+        self.gateway_probe = {True: Histogram(GATEWAY_PROBE_BUCKETS), False: Histogram(GATEWAY_PROBE_BUCKETS)}
+        self.bot_restarts = 0
+        self.bot_crashes = 0
+        self._lock = threading.Lock()
+
+    # --- Requisições HTTP ---
+    def observe_request(self, scope, status: int, seconds: float, usage: list):
+        route = scope.get("route")
+        label = route.path if route is not None else self._route_label(scope)
+        method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+        try:
+            series = self._http[method][label]
+        except KeyError:
+            series = self._http.setdefault(method, {}).setdefault(label, HTTPSeries())
+        series.observe(status, seconds, usage)
+
+    def _route_label(self, scope) -> str:
+        """Rota de uma requisição que não passou pelo roteador (ex.: respondida pelo cache)"""
+        path = scope["path"]
+        label = self._route_labels.get(path)
+        if label is None:
+            label = "unmatched"
+            for route in self.routes:
+                match, _ = route.matches(scope)
+                if match != Match.NONE:
+                    label = getattr(route, "path", label)
+                    break
+            if len(self._route_labels) >= self.ROUTE_LABELS_MAX:
+                self._route_labels.clear()
+            self._route_labels[path] = label
+        return label
+
+    # --- Banco ---
+    def watch_engine(self, sync_engine, role: str):
+        """Tempo de cada consulta, por engine, e a contagem da requisição atual"""
+        histogram = self._db.setdefault(role, Histogram(DB_QUERY_BUCKETS))
+
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info["metrics_query_started"] = time.perf_counter()
+
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info.pop("metrics_query_started", time.perf_counter())
+            histogram.observe(elapsed)
+            usage = request_db_usage.get()
+            if usage is not None:
+                usage[0] += 1
+                usage[1] += elapsed
+
+        event.listen(sync_engine, "before_cursor_execute", before_execute)
+        event.listen(sync_engine, "after_cursor_execute", after_execute)
+
+    # --- Bots ---
+    def count_bot_restart(self):
+        with self._lock:
+            self.bot_restarts += 1
+
+    def count_bot_crash(self):
+        with self._lock:
+            self.bot_crashes += 1
+
+    # --- Exposição ---
+    def render(self) -> str:
+        lines = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, labels: str, data: Histogram):
+            counts, total = data.collect()
+            cumulative = 0
+            for bound, count in zip(data.bounds + (None,), counts):
+                cumulative += count
+                le = "+Inf" if bound is None else f"{bound:g}"
+                lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}')
+            braces = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{braces} {total:.6f}")
+            lines.append(f"{name}_count{braces} {cumulative}")
+
+        http = [(method, route, series) for method, routes in sorted(self._http.items())
+                for route, series in sorted(routes.items())]
+        family("farm_http_requests_total", "counter", "Requisições HTTP atendidas, por rota e status")
+        for method, route, series in http:
+            for status, count in sorted(series.statuses.items()):
+                lines.append(f'farm_http_requests_total{{method="{method}",route="{escape_label(route)}",status="{status}"}} {count}')
+        for name, attribute, help_text in (
+            ("farm_http_request_duration_seconds", "duration", "Latência das requisições HTTP (até o fim da resposta)"),
+            ("farm_http_request_db_queries", "db_queries", "Consultas ao banco por requisição HTTP"),
+            ("farm_http_request_db_seconds", "db_seconds", "Tempo no banco por requisição HTTP"),
+        ):
+            family(name, "histogram", help_text)
+            for method, route, series in http:
+                histogram(name, f'method="{method}",route="{escape_label(route)}"', getattr(series, attribute))
+
+        family("farm_db_query_duration_seconds", "histogram", "Duração de cada consulta ao banco, por engine")
+        for role, data in sorted(self._db.items()):
+            histogram("farm_db_query_duration_seconds", f'engine="{role}"', data)
+
+        writer = log_writer.stats()
+        family("farm_log_writer_queue_depth", "gauge", "Logs na fila da escrita em lote")
+        lines.append(f"farm_log_writer_queue_depth {writer['queue_depth']}")
+        for key in ("written", "dropped", "failed"):
+            family(f"farm_log_writer_{key}_total", "counter", f"Logs da escrita em lote ({key})")
+            lines.append(f"farm_log_writer_{key}_total {writer[key]}")
+
+        runtimes = {"dedicated": 0, "shared": 0}
+        for handle in list(bot_processes.values()):
+            runtimes["shared" if isinstance(handle, WorkerBotHandle) else "dedicated"] += 1
+        family("farm_bot_processes", "gauge", "Bots em execução (entradas em bot_processes), por runtime")
+        for runtime, count in runtimes.items():
+            lines.append(f'farm_bot_processes{{runtime="{runtime}"}} {count}')
+        family("farm_bot_restarts_total", "counter", "Reinícios de bots pedidos pelo painel")
+        lines.append(f"farm_bot_restarts_total {self.bot_restarts}")
+        family("farm_bot_crashes_total", "counter", "Bots que encerraram ou falharam sem ser parados pelo painel")
+        lines.append(f"farm_bot_crashes_total {self.bot_crashes}")
+
+        family("farm_gateway_probe_duration_seconds", "histogram", "Latência dos testes de conexão dos gateways")
+        for success, data in self.gateway_probe.items():
+            histogram("farm_gateway_probe_duration_seconds", f'result="{"success" if success else "failure"}"', data)
+        return "\n".join(lines) + "\n"
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+metrics = Metrics()
+if METRICS_ENABLED:
+    if read_engine is engine:
+        metrics.watch_engine(engine, "default")
+        metrics.watch_engine(async_engine.sync_engine, "default")
+    else:
+        metrics.watch_engine(engine, "writer")
+        metrics.watch_engine(read_engine, "reader")
+        metrics.watch_engine(async_engine.sync_engine, "writer")
+        metrics.watch_engine(async_read_engine.sync_engine, "reader")
+
+class MetricsMiddleware:
+    """Latência, status e uso do banco de cada requisição, por rota.
+
+    Fica por fora de todos os outros middlewares: respostas do cache (e 304)
+    também são contadas. O rótulo é o caminho da rota (`/api/bots/{bot_id}`),
+    não o da requisição.
+    """
+
+    def __init__(self, app, registry: Metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        usage = [0, 0.0]
+        token = request_db_usage.set(usage)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_db_usage.reset(token)
+            self.registry.observe_request(scope, status, time.perf_counter() - started, usage)
+
+# === EVENTOS EM TEMPO REAL ===
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "1000"))
+EVENT_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "1000"))
+EVENT_HEARTBEAT_INTERVAL = float(os.getenv("EVENT_HEARTBEAT_INTERVAL", "15"))
+
+class EventSubscriber:
+    """Fila de um cliente conectado ao stream, alimentada a partir de qualquer thread"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_size: int):
+        self.loop = loop
+        self.max_size = max_size
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+    def push(self, entry: tuple):
+        try:
+            self.loop.call_soon_threadsafe(self._put, entry)
+        except RuntimeError:
+            # Loop já encerrado
+            pass
+
+    def _put(self, entry: tuple):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_size:
+            # Cliente lento: encerra o stream e ele reconecta a partir do último id
+            self.overflowed = True
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(entry)
+
+class EventHub:
+    """Pub/sub em memória: cada evento é serializado uma vez e repassado a todos os assinantes"""
+
+    def __init__(self, buffer_size: int, subscriber_queue_size: int):
+        self.subscriber_queue_size = subscriber_queue_size
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._last_id = 0
+
+    def publish(self, event_type: str, data: dict) -> int:
+        payload = json.dumps(data, default=str)
+        with self._lock:
+            self._last_id += 1
+            entry = (self._last_id, event_type, payload)
+            self._buffer.append(entry)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(entry)
+        return entry[0]
+
+    def subscribe(self, last_event_id: Optional[int] = None):
+        """Registra um assinante e devolve (assinante, eventos perdidos, precisa_recarregar)"""
+        subscriber = EventSubscriber(asyncio.get_running_loop(), self.subscriber_queue_size)
+        with self._lock:
+            replay = []
+            reset = False
+            if last_event_id is not None:
+                oldest_id = self._buffer[0][0] if self._buffer else self._last_id + 1
+                if last_event_id > self._last_id or last_event_id + 1 < oldest_id:
+                    # Servidor reiniciado ou o cliente ficou fora por tempo demais
+                    reset = True
+                else:
+                    replay = [entry for entry in self._buffer if entry[0] > last_event_id]
+            self._subscribers.add(subscriber)
+        return subscriber, replay, reset
+
+    def unsubscribe(self, subscriber: EventSubscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+event_hub = EventHub(EVENT_BUFFER_SIZE, EVENT_SUBSCRIBER_QUEUE_SIZE)
+
+def format_sse(entry: tuple) -> str:
+    event_id, event_type, payload = entry
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+def publish_bot(action: str, bot: Bot):
+    event_hub.publish("bot", {"action": action, "bot": {
+        "id": bot.id,
+        "name": bot.name,
+        "token_masked": mask_token(bot.token),
+        "is_active": bot.is_active,
+        "gateway_id": bot.gateway_id,
+        "runtime": bot.runtime,
+        "created_at": bot.created_at,
+        "updated_at": bot.updated_at,
+    }})
+
+def publish_gateway(action: str, gateway: Gateway):
+    event_hub.publish("gateway", {"action": action, "gateway": GatewayResponse.model_validate(gateway).model_dump()})
+
+# === ESTATÍSTICAS EM MEMÓRIA ===
+STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "300"))
+
+class StatsEngine:
+    """Contadores do dashboard mantidos em memória.
+
+    São carregados do banco na inicialização e ajustados por deltas que só
+    valem quando a transação que os gerou é confirmada (ver `stage`). Uma
+    thread reconta tudo periodicamente para corrigir qualquer desvio.
+    """
+
+    COUNTERS = ("total_bots", "active_bots", "total_gateways", "connected_gateways", "total_transactions")
+
+    def __init__(self, reconcile_interval: float):
+        self.reconcile_interval = reconcile_interval
+        self.drift_corrections = 0
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+        self._total_revenue = 0.0
+        self._reconciled_at = None
+        self._reconciled_monotonic = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def stage(self, db: Session, **deltas):
+        """Registra deltas na sessão; aplicados no commit, descartados no rollback"""
+        pending = db.info.setdefault("stats_deltas", {})
+        for name, delta in deltas.items():
+            pending[name] = pending.get(name, 0) + delta
+
+    def apply(self, deltas: dict):
+        with self._lock:
+            for name, delta in deltas.items():
+                if name == "total_revenue":
+                    self._total_revenue += delta
+                else:
+                    self._counters[name] += delta
+        event_hub.publish("stats", self.snapshot())
+
+    def count(self, db: Session) -> dict:
+        return {
+            "total_bots": db.query(Bot).count(),
+            "active_bots": db.query(Bot).filter(Bot.is_active == True).count(),
+            "total_gateways": db.query(Gateway).count(),
+            "connected_gateways": db.query(Gateway).filter(Gateway.status == "Conectado").count(),
+            **revenue_totals(db),
+        }
+
+    def reconcile(self):
+        db = SessionLocal()
+        try:
+            counted = self.count(db)
+        finally:
+            db.close()
+        
+        with self._lock:
+            current = dict(self._counters, total_revenue=self._total_revenue)
+            drift = {name: counted[name] - current[name] for name in counted if counted[name] != current[name]}
+            if self._reconciled_at is not None and drift:
+                self.drift_corrections += 1
+                logger.warning(f"Estatísticas corrigidas na reconciliação: {drift}")
+            self._total_revenue = counted.pop("total_revenue")
+            self._counters.update(counted)
+            self._reconciled_at = datetime.utcnow()
+            self._reconciled_monotonic = time.monotonic()
+
+    def snapshot(self) -> dict:
+        if self._reconciled_at is None:
+            self.reconcile()
+        with self._lock:
+            return dict(
+                self._counters,
+                total_revenue=round(self._total_revenue, 2),
+                reconciled_at=self._reconciled_at,
+                snapshot_age_seconds=round(time.monotonic() - self._reconciled_monotonic, 3),
+            )
+
+    def start(self):
+        self.reconcile()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stats-reconcile", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.reconcile_interval):
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"Erro na reconciliação das estatísticas: {e}")
+
+stats_engine = StatsEngine(STATS_RECONCILE_INTERVAL)
+
+@event.listens_for(SessionLocal, "after_commit")
+@event.listens_for(AsyncDBSession, "after_commit")
+def apply_stats_deltas(session):
+    deltas = session.info.pop("stats_deltas", None)
+    if deltas:
+        stats_engine.apply(deltas)
+
+@event.listens_for(SessionLocal, "after_rollback")
+@event.listens_for(AsyncDBSession, "after_rollback")
+def discard_stats_deltas(session):
+    session.info.pop("stats_deltas", None)
+
+def revenue_totals(db: Session) -> dict:
+    """Totais lidos dos agregados diários por bot, sem varrer o ledger"""
+    revenue, transactions = db.query(
+        func.coalesce(func.sum(RevenueRollup.revenue), 0.0),
+        func.coalesce(func.sum(RevenueRollup.transactions), 0),
+    ).filter(RevenueRollup.bucket == "day", RevenueRollup.dimension == "bot").one()
+    return {"total_revenue": float(revenue), "total_transactions": int(transactions)}
+
+def set_bot_active(db: Session, bot: Bot, active: bool):
+    if bool(bot.is_active) != active:
+        stats_engine.stage(db, active_bots=1 if active else -1)
+    bot.is_active = active
+
+def set_gateway_status(db: Session, gateway: Gateway, status: str):
+    delta = (status == "Conectado") - (gateway.status == "Conectado")
+    if delta:
+        stats_engine.stage(db, connected_gateways=delta)
+    gateway.status = status
+
+# === TESTE DE GATEWAYS ===
+GATEWAY_CHECK_TIMEOUT = float(os.getenv("GATEWAY_CHECK_TIMEOUT", "5"))
+GATEWAY_CHECK_CONCURRENCY = int(os.getenv("GATEWAY_CHECK_CONCURRENCY", "16"))
+GATEWAY_POOL_MAXSIZE = int(os.getenv("GATEWAY_POOL_MAXSIZE", "4"))
+GATEWAY_CHECK_CACHE_TTL = float(os.getenv("GATEWAY_CHECK_CACHE_TTL", "30"))
+
+class GatewayChecker:
+    """Testes de conectividade dos gateways com uma sessão HTTP compartilhada (keep-alive)"""
+
+    def __init__(self, timeout: float, concurrency: int, pool_maxsize: int, cache_ttl: float):
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.session = requests.Session()
+        # pool_block limita as conexões abertas por host em vez de abrir conexões extras
+        adapter = HTTPAdapter(pool_connections=max(10, concurrency), pool_maxsize=pool_maxsize,
+                              pool_block=True, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="gateway-check")
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def probe(self, url: str) -> dict:
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            result = {"success": response.status_code < 500, "status_code": response.status_code, "error": None}
+        except requests.RequestException as e:
+            result = {"success": False, "status_code": None, "error": e.__class__.__name__}
+        elapsed = time.monotonic() - started
+        result["latency_ms"] = round(elapsed * 1000, 1)
+        metrics.gateway_probe[result["success"]].observe(elapsed)
+        return result
+
+    def _run(self, gateway_id: int, url: str) -> dict:
+        try:
+            try:
+                probe = self.probe(url)
+            except Exception as e:
+                # Erro fora do requests (ex.: URL que nem chega a ser montada) também é falha
+                logger.error(f"Erro inesperado ao testar gateway {gateway_id}: {e}")
+                probe = {"success": False, "status_code": None, "error": e.__class__.__name__, "latency_ms": None}
+            result = {"gateway_id": gateway_id, **probe, "checked_at": datetime.utcnow()}
+            with self._lock:
+                self._cache[gateway_id] = (url, time.monotonic(), result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop((gateway_id, url), None)
+
+    def cached(self, gateway_id: int, url: str) -> Optional[dict]:
+        """Resultado ainda dentro do TTL para a mesma URL"""
+        with self._lock:
+            entry = self._cache.get(gateway_id)
+        if entry is None or entry[0] != url or time.monotonic() - entry[1] >= self.cache_ttl:
+            return None
+        return {**entry[2], "cached": True}
+
+    def submit(self, gateway_id: int, url: str):
+        """Agenda um teste; um teste igual já em andamento é reaproveitado"""
+        with self._lock:
+            future = self._inflight.get((gateway_id, url))
+            if future is None:
+                future = self._executor.submit(self._run, gateway_id, url)
+                self._inflight[(gateway_id, url)] = future
+            return future
+
+    def check(self, gateways: List[tuple], use_cache: bool = True) -> List[dict]:
+        """Testa (id, url) em paralelo e espera todos os resultados"""
+        results = {}
+        futures = {}
+        for gateway_id, url in gateways:
+            cached = self.cached(gateway_id, url) if use_cache else None
+            if cached is not None:
+                results[gateway_id] = cached
+                continue
+            futures[gateway_id] = self.submit(gateway_id, url)
+        
+        for gateway_id, future in futures.items():
+            results[gateway_id] = {**future.result(), "cached": False}
+        return [results[gateway_id] for gateway_id, _ in gateways]
+
+    def forget(self, gateway_id: int):
+        with self._lock:
+            self._cache.pop(gateway_id, None)
+
+gateway_checker = GatewayChecker(GATEWAY_CHECK_TIMEOUT, GATEWAY_CHECK_CONCURRENCY, GATEWAY_POOL_MAXSIZE, GATEWAY_CHECK_CACHE_TTL)
+
+def persist_gateway_results(results: List[dict], changes_only: bool = False):
+    """Grava o status de todos os gateways testados numa única transação"""
+    if not results:
+        return
+    by_id = {result["gateway_id"]: result for result in results}
+    db = SessionLocal()
+    try:
+        gateways = db.query(Gateway).filter(Gateway.id.in_(list(by_id))).all()
+        if changes_only:
+            gateways = [gateway for gateway in gateways
+                        if gateway.status != ("Conectado" if by_id[gateway.id]["success"] else "Erro")]
+            if not gateways:
+                return
+        for gateway in gateways:
+            set_gateway_status(db, gateway, "Conectado" if by_id[gateway.id]["success"] else "Erro")
+        db.commit()
+        
+        for gateway in gateways:
+            publish_gateway("status", gateway)
+        add_logs([
+            ("success" if by_id[gateway.id]["success"] else "error",
+             f"Gateway '{gateway.name}' {'conectado com sucesso' if by_id[gateway.id]['success'] else 'falhou na conexão'}",
+             None)
+            for gateway in gateways
+        ])
+    finally:
+        db.close()
+
+# === MONITORAMENTO DE GATEWAYS ===
+# 0 desativa o monitoramento em segundo plano
+GATEWAY_HEALTH_INTERVAL = float(os.getenv("GATEWAY_HEALTH_INTERVAL", "60"))
+GATEWAY_HEALTH_RETRY = float(os.getenv("GATEWAY_HEALTH_RETRY", "10"))
+GATEWAY_HEALTH_MAX_BACKOFF = float(os.getenv("GATEWAY_HEALTH_MAX_BACKOFF", "600"))
+GATEWAY_HEALTH_SAMPLES = int(os.getenv("GATEWAY_HEALTH_SAMPLES", "120"))
+GATEWAY_HEALTH_LOCK_FILE = os.getenv("GATEWAY_HEALTH_LOCK_FILE", "./farmmoneyrich-health.lock")
+
+class LatencyRing:
+    """Últimas latências (ms) de um gateway num buffer circular de float32"""
+
+    def __init__(self, size: int):
+        self._values = array("f", bytes(4 * size))
+        self._next = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._values)
+        self.count = min(self.count + 1, len(self._values))
+
+    def values(self) -> List[float]:
+        if self.count < len(self._values):
+            return list(self._values[:self.count])
+        return list(self._values[self._next:]) + list(self._values[:self._next])
+
+class GatewayHealth:
+    """Estado do monitoramento de um gateway"""
+
+    def __init__(self, gateway_id: int, url: str, status: str, samples: int):
+        self.gateway_id = gateway_id
+        self.url = url
+        self.status = status
+        self.latency = LatencyRing(samples)
+        self.due = None
+        self.interval = None
+        self.running = False
+        self.checks = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_checked_at = None
+        self.last_success_at = None
+        self.last_error = None
+
+class GatewayHealthScheduler:
+    """Testa cada gateway em segundo plano no seu próprio intervalo.
+
+    Gateways saudáveis são testados a cada `interval`; os que falham voltam a
+    ser testados após `retry` segundos, dobrando a cada falha até
+    `max_backoff`, sempre com jitter. Os primeiros testes são espalhados ao
+    longo do intervalo. O banco só é escrito quando o status muda, e um lock
+    de arquivo garante um único agendador entre os workers do servidor.
+    """
+
+    def __init__(self, interval: float, retry: float, max_backoff: float, samples: int, lock_file: str):
+        self.interval = interval
+        self.retry = retry
+        self.max_backoff = max_backoff
+        self.samples = samples
+        self.lock_file = lock_file
+        self.leader = False
+        self._states = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._sync_requested = True
+        self._lock_fd = None
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="gateway-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            self.leader = False
+
+    def refresh(self):
+        """Relê a lista de gateways na próxima volta do agendador"""
+        self._sync_requested = True
+        self._wake.set()
+
+    def _acquire(self) -> bool:
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self.leader = True
+        logger.info(f"Monitoramento de gateways ativo neste processo (PID {os.getpid()})")
+        return True
+
+    def _schedule(self, state: GatewayHealth, delay: float):
+        state.interval = delay
+        state.due = time.monotonic() + delay
+        heapq.heappush(self._heap, (state.due, next(self._seq), state.gateway_id))
+
+    def next_delay(self, state: GatewayHealth) -> float:
+        if state.consecutive_failures == 0:
+            return self.interval * random.uniform(0.9, 1.1)
+        backoff = min(self.max_backoff, self.retry * 2 ** (state.consecutive_failures - 1))
+        return backoff * random.uniform(0.5, 1.0)
+
+    def sync(self, first: bool = False):
+        db = SessionLocal()
+        try:
+            rows = db.query(Gateway.id, Gateway.api_url, Gateway.status).all()
+        finally:
+            db.close()
+        
+        with self._lock:
+            seen = set()
+            for gateway_id, url, status in rows:
+                seen.add(gateway_id)
+                state = self._states.get(gateway_id)
+                if state is not None and state.url == url:
+                    if not state.running:
+                        state.status = status
+                    continue
+                # Gateway novo ou com URL alterada: histórico recomeça
+                state = GatewayHealth(gateway_id, url, status, self.samples)
+                self._states[gateway_id] = state
+                self._schedule(state, random.uniform(0, self.interval) if first else 0)
+            for gateway_id in set(self._states) - seen:
+                del self._states[gateway_id]
+
+    def _run(self):
+        while not self._acquire():
+            # Outro worker já monitora; assume se ele sair
+            if self._stop.wait(self.interval):
+                return
+        
+        first = True
+        next_sync = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if self._sync_requested or now >= next_sync:
+                self._sync_requested = False
+                try:
+                    self.sync(first)
+                    first = False
+                except Exception as e:
+                    logger.error(f"Erro ao carregar gateways para o monitoramento: {e}")
+                next_sync = now + self.interval
+            
+            due = []
+            with self._lock:
+                while self._heap and self._heap[0][0] <= now:
+                    when, _, gateway_id = heapq.heappop(self._heap)
+                    state = self._states.get(gateway_id)
+                    # Entradas de gateways removidos ou reagendados são descartadas
+                    if state is not None and state.due == when and not state.running:
+                        state.running = True
+                        due.append(state)
+                wait = min(next_sync, self._heap[0][0] if self._heap else next_sync) - now
+            
+            for state in due:
+                future = gateway_checker.submit(state.gateway_id, state.url)
+                future.add_done_callback(lambda f, state=state: self._done(state, f))
+            
+            self._wake.wait(max(0.0, wait))
+            self._wake.clear()
+
+    def _done(self, state: GatewayHealth, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"gateway_id": state.gateway_id, "success": False, "status_code": None,
+                      "error": e.__class__.__name__, "latency_ms": None, "checked_at": datetime.utcnow()}
+        
+        with self._lock:
+            state.running = False
+            state.checks += 1
+            state.last_checked_at = result["checked_at"]
+            if result["success"]:
+                state.consecutive_failures = 0
+                state.last_success_at = result["checked_at"]
+                state.last_error = None
+                state.latency.add(result["latency_ms"])
+            else:
+                state.failures += 1
+                state.consecutive_failures += 1
+                state.last_error = result["error"] or f"HTTP {result['status_code']}"
+            changed = state.status != ("Conectado" if result["success"] else "Erro")
+            state.status = "Conectado" if result["success"] else "Erro"
+            if self._states.get(state.gateway_id) is state:
+                self._schedule(state, self.next_delay(state))
+        self._wake.set()
+        
+        if changed:
+            try:
+                persist_gateway_results([result], changes_only=True)
+            except Exception as e:
+                logger.error(f"Erro ao gravar status do gateway {state.gateway_id}: {e}")
+
+    def describe(self, gateway_id: int) -> Optional[dict]:
+        with self._lock:
+            state = self._states.get(gateway_id)
+            if state is None:
+                return None
+            latencies = state.latency.values()
+            return {
+                "status": state.status,
+                "checks": state.checks,
+                "failures": state.failures,
+                "consecutive_failures": state.consecutive_failures,
+                "last_checked_at": state.last_checked_at,
+                "last_success_at": state.last_success_at,
+                "last_error": state.last_error,
+                "interval_seconds": round(state.interval, 1),
+                "next_check_in": round(max(0.0, state.due - time.monotonic()), 1) if not state.running else 0.0,
+                "latency_ms": {
+                    "count": len(latencies),
+                    "p50": round(percentile(latencies, 50), 1),
+                    "p95": round(percentile(latencies, 95), 1),
+                    "last": round(latencies[-1], 1) if latencies else None,
+                },
+            }
+
+gateway_health = GatewayHealthScheduler(GATEWAY_HEALTH_INTERVAL, GATEWAY_HEALTH_RETRY, GATEWAY_HEALTH_MAX_BACKOFF,
+                                        GATEWAY_HEALTH_SAMPLES, GATEWAY_HEALTH_LOCK_FILE)
+
+# === RECEITA ===
+# Os agregados e o total das estatísticas somam valores: só uma moeda é aceita
+REVENUE_CURRENCY = os.getenv("REVENUE_CURRENCY", "BRL").strip().upper()
+
+ROLLUP_BUCKETS = {
+    "hour": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    "day": lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+def upsert_rollup(db: Session, bucket: str, dimension: str, key_id: int, paid_at: datetime, amount: float):
+    """Soma um pagamento ao agregado do período (INSERT ... ON CONFLICT DO UPDATE)"""
+    dialect_insert = postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+    rollups = RevenueRollup.__table__
+    stmt = dialect_insert(rollups).values(
+        bucket=bucket,
+        dimension=dimension,
+        key_id=key_id,
+        bucket_start=ROLLUP_BUCKETS[bucket](paid_at),
+        revenue=amount,
+        transactions=1,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bucket", "dimension", "key_id", "bucket_start"],
+        set_={
+            "revenue": rollups.c.revenue + stmt.excluded.revenue,
+            "transactions": rollups.c.transactions + stmt.excluded.transactions,
+        },
+    )
+    db.execute(stmt)
+
+def record_transaction(db: Session, transaction: Transaction):
+    """Adiciona o pagamento ao ledger e aos agregados na mesma transação"""
+    db.add(transaction)
+    db.flush()
+    for bucket in ROLLUP_BUCKETS:
+        upsert_rollup(db, bucket, "bot", transaction.bot_id, transaction.paid_at, transaction.amount)
+        if transaction.gateway_id is not None:
+            upsert_rollup(db, bucket, "gateway", transaction.gateway_id, transaction.paid_at, transaction.amount)
+    stats_engine.stage(db, total_revenue=transaction.amount, total_transactions=1)
+
+# === ESCRITA DE LOGS EM LOTE ===
+# "batch" grava os logs numa thread dedicada; "sync" mantém o commit por chamada
+LOG_WRITER_MODE = os.getenv("LOG_WRITER_MODE", "batch")
+LOG_QUEUE_MAX_SIZE = int(os.getenv("LOG_QUEUE_MAX_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+LOG_ENQUEUE_TIMEOUT = float(os.getenv("LOG_ENQUEUE_TIMEOUT", "0.05"))
+LOG_EXPORT_CHUNK_SIZE = int(os.getenv("LOG_EXPORT_CHUNK_SIZE", "2000"))
+
+_LOG_WRITER_STOP = object()
+
+class LogWriter:
+    """Grava logs em lote: uma fila limitada e uma thread que faz um commit por lote"""
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float, enqueue_timeout: float):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Para a thread gravando o que ainda estiver na fila"""
+        if not self.running:
+            return
+        self.queue.put(_LOG_WRITER_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, entry: dict, block: bool = True) -> bool:
+        return bool(self.submit_many([entry], block))
+
+    def submit_many(self, entries: List[dict], block: bool = True) -> List[dict]:
+        """Enfileira os logs e devolve os aceitos.
+
+        Fila cheia: com `block` segura o produtor por até `enqueue_timeout` no total
+        (um prazo para o lote inteiro, não por linha) e descarta o resto; sem
+        `block` descarta na hora. Quem atende vários bots ou o event loop usa
+        `block=False`.
+        """
+        accepted = []
+        deadline = time.monotonic() + self.enqueue_timeout if block else None
+        for entry in entries:
+            try:
+                if deadline is None:
+                    self.queue.put_nowait(entry)
+                else:
+                    self.queue.put(entry, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                # Esgotado o prazo, o resto do lote não espera mais
+                deadline = None
+                continue
+            accepted.append(entry)
+        with self._lock:
+            self.enqueued += len(accepted)
+            self.dropped += len(entries) - len(accepted)
+        return accepted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": LOG_WRITER_MODE,
+                "running": self.running,
+                "queue_depth": self.queue.qsize(),
+                "queue_max_size": self.queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+    def _run(self):
+        batch = []
+        deadline = 0.0
+        stopping = False
+        while not stopping:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _LOG_WRITER_STOP:
+                stopping = True
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                # Esvaziar o que já está na fila sem bloquear
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _LOG_WRITER_STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch: list):
+        try:
+            # Uma lista de parâmetros vira um único executemany
+            with engine.begin() as conn:
+                conn.execute(Log.__table__.insert(), batch)
+        except Exception as e:
+            logger.error(f"Erro ao gravar lote de {len(batch)} logs: {e}")
+            with self._lock:
+                self.failed += len(batch)
+            return
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+
+log_writer = LogWriter(LOG_QUEUE_MAX_SIZE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL, LOG_ENQUEUE_TIMEOUT)
+
+# Funções utilitárias
+def add_log(db: Session, level: str, message: str, bot_id: Optional[int] = None):
+    entry = {"level": level, "message": message, "bot_id": bot_id, "timestamp": datetime.utcnow()}
+    if LOG_WRITER_MODE == "sync" or not log_writer.running:
+        log = Log(**entry)
+        db.add(log)
+        db.commit()
+        event_hub.publish("log", {"id": log.id, **entry})
+    elif log_writer.submit(entry):
+        # O id só existe depois da gravação do lote
+        event_hub.publish("log", {"id": None, **entry})
+    logger.info(f"Log adicionado: {level} - {message}")
+
+async def add_log_async(db: AsyncSession, level: str, message: str, bot_id: Optional[int] = None):
+    """add_log para os endpoints assíncronos"""
+    entry = {"level": level, "message": message, "bot_id": bot_id, "timestamp": datetime.utcnow()}
+    if LOG_WRITER_MODE == "sync" or not log_writer.running:
+        log = Log(**entry)
+        db.add(log)
+        await db.commit()
+        event_hub.publish("log", {"id": log.id, **entry})
+    elif log_writer.submit(entry, block=False):
+        # Sem bloquear: uma fila cheia não pode parar o event loop
+        event_hub.publish("log", {"id": None, **entry})
+    logger.info(f"Log adicionado: {level} - {message}")
+
+def add_logs(entries: List[tuple], block: bool = True):
+    """Registra vários logs (level, message, bot_id) de uma vez, fora de uma requisição.
+
+    `block=False` para quem não pode esperar a fila (a thread que lê a saída dos bots).
+    """
+    now = datetime.utcnow()
+    rows = [{"level": level, "message": message, "bot_id": bot_id, "timestamp": now} for level, message, bot_id in entries]
+    if LOG_WRITER_MODE == "sync" or not log_writer.running:
+        db = SessionLocal()
+        try:
+            logs = [Log(**row) for row in rows]
+            db.add_all(logs)
+            db.commit()
+            for log, row in zip(logs, rows):
+                event_hub.publish("log", {"id": log.id, **row})
+        finally:
+            db.close()
+    else:
+        for row in log_writer.submit_many(rows, block):
+            event_hub.publish("log", {"id": None, **row})
+
+# === RETENÇÃO DE LOGS ===
+# Intervalo entre passadas da retenção (segundos); 0 desativa a limpeza automática
+LOG_RETENTION_INTERVAL = float(os.getenv("LOG_RETENTION_INTERVAL", "3600"))
+LOG_RETENTION_MAX_AGE_DAYS = float(os.getenv("LOG_RETENTION_MAX_AGE_DAYS", "0"))
+LOG_RETENTION_MAX_PER_BOT = int(os.getenv("LOG_RETENTION_MAX_PER_BOT", "0"))
+# TTL por nível, em dias (ex.: "info=7,success=7,warning=30"); vale o menor entre este e o MAX_AGE
+LOG_RETENTION_LEVEL_TTL = os.getenv("LOG_RETENTION_LEVEL_TTL", "")
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "./log-archive")  # vazio: apaga sem arquivar
+LOG_PURGE_CHUNK_SIZE = int(os.getenv("LOG_PURGE_CHUNK_SIZE", "1000"))
+LOG_PURGE_PAUSE = float(os.getenv("LOG_PURGE_PAUSE", "0.05"))
+LOG_VACUUM_PAGES = int(os.getenv("LOG_VACUUM_PAGES", "2000"))
+
+def parse_level_ttl(spec: str) -> dict:
+    ttl = {}
+    for item in spec.split(","):
+        level, _, days = item.partition("=")
+        if level.strip() and days.strip():
+            ttl[level.strip()] = float(days)
+    return ttl
+
+class LogRetention:
+    """Arquiva e apaga logs antigos em pedaços pequenos, numa thread própria.
+
+    Cada pedaço é gravado em JSONL comprimido, um arquivo por dia do log
+    (`AAAA/MM/logs-AAAA-MM-DD.jsonl.gz`), e só então apagado numa transação
+    curta; entre um pedaço e outro os demais escritores usam o banco. Depois
+    de cada passada o SQLite devolve as páginas livres com incremental_vacuum.
+    """
+
+    def __init__(self, interval: float, max_age_days: float, max_per_bot: int, level_ttl: dict,
+                 archive_dir: str, chunk_size: int, pause: float, vacuum_pages: int):
+        self.interval = interval
+        self.max_age_days = max_age_days
+        self.max_per_bot = max_per_bot
+        self.level_ttl = level_ttl
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self.deleted = {}
+        self.archived = 0
+        self.vacuumed_pages = 0
+        self.last_run_at = None
+        self.last_error = None
+        self._clear_up_to = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="log-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def request_clear(self, up_to_id: int):
+        """Apaga (em segundo plano) todos os logs até este id"""
+        with self._lock:
+            self._clear_up_to = max(self._clear_up_to, up_to_id)
+        # Os logs somem da listagem já agora, antes de qualquer DELETE
+        table_versions.bump("logs")
+        self._wake.set()
+
+    def visible_after(self) -> int:
+        """Logs com id até este valor já foram limpos e só esperam a remoção"""
+        return self._clear_up_to
+
+    def policies(self, now: datetime) -> list:
+        """(motivo, condição) de cada política de retenção ativa"""
+        logs_table = Log.__table__
+        policies = []
+        if self.max_age_days > 0:
+            policies.append(("max_age", logs_table.c.timestamp < now - timedelta(days=self.max_age_days)))
+        for level, days in self.level_ttl.items():
+            policies.append((f"ttl_{level}", (logs_table.c.level == level) & (logs_table.c.timestamp < now - timedelta(days=days))))
+        if self.max_per_bot > 0:
+            with read_engine.connect() as conn:
+                crowded = conn.execute(
+                    select(logs_table.c.bot_id).where(logs_table.c.bot_id.isnot(None))
+                    .group_by(logs_table.c.bot_id).having(func.count() > self.max_per_bot)
+                ).scalars().all()
+                for bot_id in crowded:
+                    # O registro mais novo além do limite vira o corte, pelo índice (bot_id, timestamp)
+                    cutoff = conn.execute(
+                        select(logs_table.c.timestamp, logs_table.c.id).where(logs_table.c.bot_id == bot_id)
+                        .order_by(logs_table.c.timestamp.desc(), logs_table.c.id.desc())
+                        .offset(self.max_per_bot).limit(1)
+                    ).first()
+                    if cutoff is not None:
+                        policies.append(("max_per_bot", (logs_table.c.bot_id == bot_id) &
+                                         (tuple_(logs_table.c.timestamp, logs_table.c.id) <= tuple(cutoff))))
+        return policies
+
+    def archive(self, rows: list):
+        by_day = {}
+        for row in rows:
+            by_day.setdefault((row.timestamp or datetime.utcnow()).date(), []).append(row)
+        for day, day_rows in by_day.items():
+            path = self.archive_dir / f"{day:%Y}" / f"{day:%m}" / f"logs-{day.isoformat()}.jsonl.gz"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Cada pedaço vira um membro gzip novo no fim do arquivo
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                for row in day_rows:
+                    f.write(json.dumps({"id": row.id, "level": row.level, "message": row.message,
+                                        "bot_id": row.bot_id, "timestamp": row.timestamp}, default=str) + "\n")
+
+    def purge(self, reason: str, condition) -> int:
+        logs_table = Log.__table__
+        total = 0
+        while not self._stop.is_set():
+            with read_engine.connect() as conn:
+                rows = conn.execute(select(logs_table).where(condition).order_by(logs_table.c.id).limit(self.chunk_size)).all()
+            if not rows:
+                break
+            with engine.begin() as conn:
+                conn.execute(logs_table.delete().where(logs_table.c.id.in_([row.id for row in rows])))
+                # Arquiva só depois do DELETE, antes do commit: se ele falhar (lock, banco),
+                # nada vai para o arquivo e a próxima passada não grava o pedaço de novo
+                if self.archive_dir is not None:
+                    self.archive(rows)
+            total += len(rows)
+            with self._lock:
+                self.deleted[reason] = self.deleted.get(reason, 0) + len(rows)
+                if self.archive_dir is not None:
+                    self.archived += len(rows)
+            if len(rows) < self.chunk_size:
+                break
+            self._stop.wait(self.pause)
+        return total
+
+    def vacuum(self):
+        """Devolve ao sistema as páginas livres (SQLite com auto_vacuum=INCREMENTAL)"""
+        if not IS_SQLITE or self.vacuum_pages <= 0:
+            return
+        with engine.connect() as conn:
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                return
+            before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            # Pelo execute() o sqlite3 dá um único passo no pragma (uma página);
+            # o executescript o executa até o fim
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages})")
+            freed = before - conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        with self._lock:
+            self.vacuumed_pages += freed
+
+    def run_once(self, include_policies: bool = True):
+        purged = {}
+        with self._lock:
+            clear_up_to = self._clear_up_to
+        if clear_up_to:
+            purged["clear"] = self.purge("clear", Log.__table__.c.id <= clear_up_to)
+            with self._lock:
+                # Limpeza concluída: sem corte pendente (com AUTOINCREMENT os ids novos já ficam acima dele)
+                if self._clear_up_to == clear_up_to and not self._stop.is_set():
+                    self._clear_up_to = 0
+        if include_policies:
+            for reason, condition in self.policies(datetime.utcnow()):
+                purged[reason] = purged.get(reason, 0) + self.purge(reason, condition)
+            self.last_run_at = datetime.utcnow()
+        if any(purged.values()):
+            self.vacuum()
+            logger.info(f"Retenção de logs: {purged}")
+        return purged
+
+    def _run(self):
+        next_run = time.monotonic() + min(60.0, self.interval) if self.interval > 0 else None
+        while not self._stop.is_set():
+            timeout = None if next_run is None else max(0.0, next_run - time.monotonic())
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            due = next_run is not None and time.monotonic() >= next_run
+            try:
+                self.run_once(include_policies=due)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Erro na retenção de logs: {e}")
+            if due:
+                next_run = time.monotonic() + self.interval
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "deleted": dict(self.deleted),
+                "archived": self.archived,
+                "vacuumed_pages": self.vacuumed_pages,
+                "pending_clear_up_to": self._clear_up_to or None,
+                "last_run_at": self.last_run_at,
+                "last_error": self.last_error,
+            }
+
+log_retention = LogRetention(LOG_RETENTION_INTERVAL, LOG_RETENTION_MAX_AGE_DAYS, LOG_RETENTION_MAX_PER_BOT,
+                             parse_level_ttl(LOG_RETENTION_LEVEL_TTL), LOG_ARCHIVE_DIR, LOG_PURGE_CHUNK_SIZE,
+                             LOG_PURGE_PAUSE, LOG_VACUUM_PAGES)
+
+# === LEITURA DA SAÍDA DOS BOTS ===
+BOT_OUTPUT_MAX_LINE = int(os.getenv("BOT_OUTPUT_MAX_LINE", "4096"))
+BOT_STARTUP_CHECK_DELAY = float(os.getenv("BOT_STARTUP_CHECK_DELAY", "1"))
+
+LOG_LEVEL_PATTERN = re.compile(r"\b(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL|FATAL)\b")
+LOG_LEVELS = {
+    "DEBUG": "info",
+    "INFO": "info",
+    "WARNING": "warning",
+    "WARN": "warning",
+    "ERROR": "error",
+    "CRITICAL": "error",
+    "FATAL": "error",
+}
+
+def parse_log_level(line: str, default: str) -> str:
+    """Nível do log a partir do formato padrão do logging ("INFO:", "- ERROR -", ...)"""
+    match = LOG_LEVEL_PATTERN.search(line)
+    if match:
+        return LOG_LEVELS[match.group(1)]
+    if line.startswith("Traceback"):
+        return "error"
+    return default
+
+class OutputWatch:
+    def __init__(self, stream, on_lines, on_eof):
+        self.stream = stream
+        self.on_lines = on_lines
+        self.on_eof = on_eof
+        self.partial = b""
+
+class OutputPump:
+    """Uma única thread que drena continuamente os pipes de todos os bots.
+
+    Os pipes ficam em modo não bloqueante num selector; a saída é quebrada
+    em linhas e entregue aos callbacks de cada pipe. A mesma thread executa
+    tarefas agendadas com `call_later` (checagem de inicialização, etc.).
+    """
+
+    def __init__(self, max_line: int):
+        self.max_line = max_line
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._pending = queue.SimpleQueue()
+        self._timers = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="output-pump", daemon=True)
+            self._thread.start()
+
+    def call_soon(self, callback):
+        self.start()
+        self._pending.put(callback)
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            # Pipe de despertar cheio: a thread já vai acordar
+            pass
+
+    def call_later(self, delay: float, callback):
+        deadline = time.monotonic() + delay
+        self.call_soon(lambda: heapq.heappush(self._timers, (deadline, next(self._seq), callback)))
+
+    def watch(self, stream, on_lines, on_eof=None):
+        """Acompanha um pipe binário; `on_lines(lines)` roda na thread do pump"""
+        os.set_blocking(stream.fileno(), False)
+        watch = OutputWatch(stream, on_lines, on_eof)
+        self.call_soon(lambda: self._selector.register(stream.fileno(), selectors.EVENT_READ, watch))
+
+    @property
+    def watched_count(self) -> int:
+        return len(self._selector.get_map()) - 1
+
+    def _run(self):
+        while True:
+            timeout = max(0.0, self._timers[0][0] - time.monotonic()) if self._timers else None
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self._read(key)
+            
+            while True:
+                try:
+                    callback = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                self._invoke(callback)
+            
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                _, _, callback = heapq.heappop(self._timers)
+                self._invoke(callback)
+
+    def _invoke(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"Erro no leitor de saída dos bots: {e}")
+
+    def _read(self, key: selectors.SelectorKey):
+        watch = key.data
+        try:
+            data = os.read(key.fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        
+        if not data:
+            # Fim do pipe: entrega o resto e libera o descritor
+            self._selector.unregister(key.fd)
+            if watch.partial:
+                self._invoke(watch.on_lines, [watch.partial.decode("utf-8", "replace")])
+            watch.stream.close()
+            if watch.on_eof:
+                self._invoke(watch.on_eof)
+            return
+        
+        chunks = (watch.partial + data).split(b"\n")
+        watch.partial = chunks.pop()
+        if len(watch.partial) > self.max_line:
+            # Linha sem fim à vista: corta para não crescer sem limite
+            chunks.append(watch.partial)
+            watch.partial = b""
+        lines = [chunk[:self.max_line].decode("utf-8", "replace").rstrip("\r") for chunk in chunks if chunk.strip()]
+        if lines:
+            self._invoke(watch.on_lines, lines)
+
+output_pump = OutputPump(BOT_OUTPUT_MAX_LINE)
+
+# === ÚLTIMAS LINHAS DE CADA BOT ===
+BOT_TAIL_MAX_BYTES = int(os.getenv("BOT_TAIL_MAX_BYTES", str(256 * 1024)))
+BOT_TAIL_MAX_LINES = int(os.getenv("BOT_TAIL_MAX_LINES", "5000"))
+
+# Custo aproximado de cada entrada (tupla + objeto bytes) além do texto
+TAIL_LINE_OVERHEAD = 120
+TAIL_LEVEL_CODES = {"info": "i", "success": "s", "warning": "w", "error": "e"}
+TAIL_LEVEL_NAMES = {code: level for level, code in TAIL_LEVEL_CODES.items()}
+
+class LogTail:
+    """Buffer circular com as linhas recentes de um bot, limitado em bytes e em linhas"""
+
+    def __init__(self, max_bytes: int, max_lines: int):
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.dropped = 0
+        self._lines = deque()
+        self._bytes = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._followers = set()
+
+    def extend(self, entries: List[tuple]):
+        """Acrescenta linhas (level, line) e repassa o lote a quem acompanha"""
+        now = time.time()
+        added = []
+        with self._lock:
+            for level, line in entries:
+                self._seq += 1
+                item = (self._seq, now, TAIL_LEVEL_CODES.get(level, "i"), line.encode("utf-8"))
+                self._lines.append(item)
+                self._bytes += len(item[3]) + TAIL_LINE_OVERHEAD
+                added.append(item)
+            while self._lines and (self._bytes > self.max_bytes or len(self._lines) > self.max_lines):
+                removed = self._lines.popleft()
+                self._bytes -= len(removed[3]) + TAIL_LINE_OVERHEAD
+                self.dropped += 1
+            followers = list(self._followers)
+        for follower in followers:
+            follower.push(added)
+
+    def lines(self, count: int) -> List[dict]:
+        with self._lock:
+            items = list(itertools.islice(reversed(self._lines), count))
+        items.reverse()
+        return [self.to_dict(item) for item in items]
+
+    def follow(self, count: int):
+        """Assinante para novas linhas, mais as `count` últimas já guardadas"""
+        subscriber = EventSubscriber(asyncio.get_running_loop(), EVENT_SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            backlog = list(itertools.islice(reversed(self._lines), count))
+            self._followers.add(subscriber)
+        backlog.reverse()
+        return subscriber, backlog
+
+    def unfollow(self, subscriber: EventSubscriber):
+        with self._lock:
+            self._followers.discard(subscriber)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"buffered_lines": len(self._lines), "buffered_bytes": self._bytes, "max_bytes": self.max_bytes, "dropped_lines": self.dropped}
+
+    @staticmethod
+    def to_dict(item: tuple) -> dict:
+        seq, timestamp, level, data = item
+        return {
+            "seq": seq,
+            "timestamp": datetime.utcfromtimestamp(timestamp),
+            "level": TAIL_LEVEL_NAMES[level],
+            "line": data.decode("utf-8"),
+        }
+
+# Mantido entre reinícios e depois de uma falha, para depuração; removido com o bot
+bot_tails = {}
+
+def get_bot_tail(bot_id: int) -> LogTail:
+    tail = bot_tails.get(bot_id)
+    if tail is None:
+        tail = bot_tails.setdefault(bot_id, LogTail(BOT_TAIL_MAX_BYTES, BOT_TAIL_MAX_LINES))
+    return tail
+
+def record_bot_output(bot_id: int, lines: List[str], default_level: str):
+    """Leva linhas de saída de um bot para o seu buffer em memória e para os logs"""
+    entries = [(parse_log_level(line, default_level), line) for line in lines]
+    get_bot_tail(bot_id).extend(entries)
+    add_logs([(level, f"Bot {bot_id}: {line}", bot_id) for level, line in entries], block=False)
+
+def watch_bot_process(bot_id: int, process: subprocess.Popen):
+    """Encaminha a saída do bot para os logs e acompanha o fim do processo"""
+    open_pipes = [2]
+    
+    def forward(default_level: str):
+        def on_lines(lines: List[str]):
+            record_bot_output(bot_id, lines, default_level)
+        return on_lines
+    
+    def on_eof():
+        open_pipes[0] -= 1
+        if open_pipes[0] == 0:
+            reap_bot_process(bot_id, process)
+    
+    def startup_check():
+        if process.poll() is None:
+            add_logs([("success", f"Bot {bot_id} iniciado com sucesso", bot_id)])
+    
+    output_pump.watch(process.stdout, forward("info"), on_eof)
+    output_pump.watch(process.stderr, forward("error"), on_eof)
+    output_pump.call_later(BOT_STARTUP_CHECK_DELAY, startup_check)
+
+def reap_bot_process(bot_id: int, process: subprocess.Popen):
+    """Chamado quando os pipes fecham; trata a saída inesperada de um bot"""
+    returncode = process.poll()
+    if returncode is None:
+        # Pipes fechados mas o processo ainda não terminou
+        output_pump.call_later(0.2, lambda: reap_bot_process(bot_id, process))
+        return
+    
+    if bot_processes.get(bot_id) is not process:
+        # Parado pelo painel (stop_bot_process já removeu o registro)
+        return
+    
+    del bot_processes[bot_id]
+    handle_unexpected_exit(bot_id, f"Bot {bot_id} encerrou inesperadamente (código {returncode})")
+
+def handle_unexpected_exit(bot_id: int, message: str):
+    """Registra a falha e marca o bot como inativo"""
+    add_logs([("error", message, bot_id)])
+    metrics.count_bot_crash()
+    
+    db = SessionLocal()
+    try:
+        bot = db.query(Bot).filter(Bot.id == bot_id).first()
+        if bot and bot.is_active:
+            set_bot_active(db, bot, False)
+            db.commit()
+            publish_bot("status", bot)
+    finally:
+        db.close()
+
+# === RUNTIME MULTIPLEXADO ===
+BOT_RUNTIME_DEFAULT = os.getenv("BOT_RUNTIME_DEFAULT", "dedicated")
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "0")) or (os.cpu_count() or 1)
+BOT_WORKER_SCRIPT = str(Path(__file__).with_name("bot_worker.py"))
+
+def process_rss_kb(pid: int) -> Optional[int]:
+    """Memória residente de um processo (Linux)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+class WorkerBotHandle:
+    """Bot hospedado num worker, com a parte da interface de Popen usada pelo painel"""
+
+    def __init__(self, worker: "BotWorker", bot_id: int, artifact: "CodeArtifact", token: str,
+                 requested_at: Optional[float] = None):
+        self.worker = worker
+        self.bot_id = bot_id
+        self.artifact = artifact
+        self.token = token
+        self.requested_at = requested_at or time.monotonic()
+        self.launch = BotLaunch()
+        self.returncode = None
+        self._done = threading.Event()
+
+    @property
+    def pid(self) -> int:
+        return self.worker.process.pid
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def terminate(self):
+        try:
+            self.worker.send({"op": "stop", "bot_id": self.bot_id})
+        except (OSError, ValueError):
+            # Worker já encerrado
+            self.finish(-1)
+
+    kill = terminate
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if not self._done.wait(timeout):
+            raise subprocess.TimeoutExpired(BOT_WORKER_SCRIPT, timeout)
+        return self.returncode
+
+    def finish(self, returncode: int):
+        if self.returncode is None:
+            self.returncode = returncode
+        self._done.set()
+
+class BotWorker:
+    """Processo bot_worker.py que hospeda vários bots"""
+
+    def __init__(self, pool: "WorkerPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.handles = {}
+        self.exited = False
+        self._lock = threading.Lock()
+        self.process = subprocess.Popen(
+            [sys.executable, BOT_WORKER_SCRIPT],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+        output_pump.watch(self.process.stdout, self._on_lines, self._on_exit)
+        output_pump.watch(self.process.stderr, self._on_stderr)
+
+    @property
+    def alive(self) -> bool:
+        return not self.exited and self.process.poll() is None
+
+    def send(self, command: dict):
+        data = (json.dumps(command) + "\n").encode("utf-8")
+        with self._lock:
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+
+    def start_bot(self, bot_id: int, artifact: "CodeArtifact", token: str,
+                  requested_at: Optional[float] = None) -> WorkerBotHandle:
+        handle = WorkerBotHandle(self, bot_id, artifact, token, requested_at)
+        self.handles[bot_id] = handle
+        self.send({"op": "start", "bot_id": bot_id, "artifact": artifact.path, "token": token})
+        return handle
+
+    def _on_lines(self, lines: List[str]):
+        output = {}
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                add_logs([("info", f"Worker {self.index}: {line}", None)], block=False)
+                continue
+            if message.get("event") == "log":
+                if message.get("bot_id") is None:
+                    add_logs([(parse_log_level(message["line"], message["level"]), f"Worker {self.index}: {message['line']}", None)], block=False)
+                else:
+                    output.setdefault((message["bot_id"], message["level"]), []).append(message["line"])
+            else:
+                self.pool.handle_event(self, message)
+        for (bot_id, level), bot_lines in output.items():
+            record_bot_output(bot_id, bot_lines, level)
+
+    def _on_stderr(self, lines: List[str]):
+        add_logs([(parse_log_level(line, "error"), f"Worker {self.index}: {line}", None) for line in lines], block=False)
+
+    def _on_exit(self):
+        self.exited = True
+        self.pool.handle_worker_exit(self)
+
+class WorkerPool:
+    """Distribui bots "shared" entre poucos workers (cerca de um por núcleo)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.workers = []
+        self._next_index = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def live_workers(self) -> List[BotWorker]:
+        return [worker for worker in self.workers if worker.alive]
+
+    def _pick_worker(self) -> BotWorker:
+        with self._lock:
+            live = self.live_workers()
+            least_loaded = min(live, key=lambda worker: len(worker.handles), default=None)
+            # Só abre um worker novo quando todos os existentes já hospedam algum bot
+            if least_loaded is None or (least_loaded.handles and len(live) < self.size):
+                least_loaded = BotWorker(self, next(self._next_index))
+                self.workers = live + [least_loaded]
+            return least_loaded
+
+    def start_bot(self, bot_id: int, artifact: "CodeArtifact", token: str,
+                  requested_at: Optional[float] = None) -> WorkerBotHandle:
+        return self._pick_worker().start_bot(bot_id, artifact, token, requested_at)
+
+    def handle_event(self, worker: BotWorker, message: dict):
+        bot_id = message.get("bot_id")
+        kind = message.get("event")
+        if kind == "started":
+            add_logs([("success", f"Bot {bot_id} iniciado com sucesso (worker {worker.index})", bot_id)])
+            handle = worker.handles.get(bot_id)
+            if handle is not None:
+                handle.launch.mark("loaded")
+        elif kind == "polling":
+            handle = worker.handles.get(bot_id)
+            if handle is not None:
+                handle.launch.mark("polling")
+        elif kind == "ready":
+            handle = worker.handles.get(bot_id)
+            if handle is not None:
+                handle.launch.mark("ready")
+                record_bot_ready(bot_id, handle, "shared", handle.requested_at)
+        elif kind == "failed":
+            handle = worker.handles.pop(bot_id, None)
+            if handle is None:
+                return
+            handle.finish(1)
+            add_logs([("error", f"Bot {bot_id} falhou no worker {worker.index}: {message.get('error')}", bot_id)])
+            if bot_processes.get(bot_id) is handle:
+                # Código incompatível com o worker: volta para um processo dedicado
+                add_logs([("warning", f"Bot {bot_id} será executado em processo dedicado", bot_id)])
+                try:
+                    start_dedicated_process(bot_id, handle.artifact, handle.token, handle.requested_at)
+                except Exception as e:
+                    del bot_processes[bot_id]
+                    handle_unexpected_exit(bot_id, f"Erro ao iniciar bot {bot_id}: {str(e)}")
+        elif kind == "stopped":
+            handle = worker.handles.pop(bot_id, None)
+            if handle is None:
+                return
+            handle.finish(0)
+            if bot_processes.get(bot_id) is handle:
+                del bot_processes[bot_id]
+                handle_unexpected_exit(bot_id, f"Bot {bot_id} parou inesperadamente no worker {worker.index}")
+
+    def handle_worker_exit(self, worker: BotWorker):
+        """Worker encerrado: os bots que ainda deviam rodar vão para outros workers"""
+        returncode = worker.process.wait()
+        handles = list(worker.handles.values())
+        worker.handles.clear()
+        orphans = []
+        for handle in handles:
+            handle.finish(returncode)
+            if bot_processes.get(handle.bot_id) is handle:
+                orphans.append(handle)
+        if not orphans:
+            return
+        
+        add_logs([("warning", f"Worker {worker.index} encerrou (código {returncode}); redistribuindo {len(orphans)} bots", None)])
+        for handle in orphans:
+            try:
+                bot_processes[handle.bot_id] = self.start_bot(handle.bot_id, handle.artifact, handle.token)
+            except Exception as e:
+                del bot_processes[handle.bot_id]
+                handle_unexpected_exit(handle.bot_id, f"Erro ao redistribuir bot {handle.bot_id}: {str(e)}")
+
+    def rebalance(self) -> List[dict]:
+        """Move bots do worker mais cheio para o mais vazio até a diferença ser no máximo 1"""
+        with self._lock:
+            live = self.live_workers()
+            while live and len(live) < self.size and sum(len(worker.handles) for worker in live) > len(live):
+                live.append(BotWorker(self, next(self._next_index)))
+            self.workers = live
+        
+        moves = []
+        while len(live) > 1:
+            live.sort(key=lambda worker: len(worker.handles))
+            source, target = live[-1], live[0]
+            if len(source.handles) - len(target.handles) <= 1:
+                break
+            bot_id, handle = next(iter(source.handles.items()))
+            with bot_start_lock(bot_id):
+                if bot_processes.get(bot_id) is not handle:
+                    # Parado ou reiniciado enquanto isso; o resto fica para o próximo rebalanceamento
+                    break
+                # Mesmo sinal do reinício: a cópia nova precisa carregar o código antes de a antiga parar
+                moved = target.start_bot(bot_id, handle.artifact, handle.token)
+                wait_until(lambda: moved.launch.loaded.is_set() or moved.poll() is not None, BOT_READY_TIMEOUT)
+                if moved.poll() is not None:
+                    add_logs([("warning", f"Bot {bot_id} não subiu no worker {target.index}; continua no worker {source.index}", bot_id)])
+                    break
+                if not moved.launch.loaded.is_set():
+                    add_logs([("warning", f"Bot {bot_id} não sinalizou o polling em {BOT_READY_TIMEOUT:.0f}s; movendo mesmo assim", bot_id)])
+                # Registrar o novo antes de parar o antigo, para a parada não contar como falha
+                bot_processes[bot_id] = moved
+                handle.terminate()
+                source.handles.pop(bot_id, None)
+                handle.finish(0)
+            moves.append({"bot_id": bot_id, "from_worker": source.index, "to_worker": target.index})
+        return moves
+
+    def describe(self) -> List[dict]:
+        return [{
+            "index": worker.index,
+            "pid": worker.process.pid,
+            "alive": worker.alive,
+            "bots": sorted(worker.handles),
+            "rss_kb": process_rss_kb(worker.process.pid),
+        } for worker in self.workers]
+
+worker_pool = WorkerPool(BOT_WORKERS)
+
+BOT_STOP_TIMEOUT = float(os.getenv("BOT_STOP_TIMEOUT", "5"))
+
+def stop_instance(process):
+    """Encerra uma instância sem bloquear: SIGTERM agora e SIGKILL se ainda estiver viva depois de BOT_STOP_TIMEOUT"""
+    try:
+        process.terminate()
+    except OSError:
+        return
+    
+    def force_kill():
+        if process.poll() is None:
+            try:
+                process.kill()
+            except OSError:
+                pass
+    
+    output_pump.call_later(BOT_STOP_TIMEOUT, force_kill)
+
+def stop_bot_process(bot_id: int):
+    """Para o processo de um bot"""
+    # Remover antes de encerrar para a saída não ser tratada como falha
+    process = bot_processes.pop(bot_id, None)
+    if process is not None:
+        stop_instance(process)
+
+# === PARTIDA DOS BOTS ===
+BOT_SPAWN_MODE = os.getenv("BOT_SPAWN_MODE", "exec")  # exec | zygote
+BOT_STARTUP_SAMPLES = int(os.getenv("BOT_STARTUP_SAMPLES", "500"))
+BOT_LAUNCHER_SCRIPT = str(Path(__file__).with_name("bot_launcher.py"))
+BOT_ZYGOTE_SCRIPT = str(Path(__file__).with_name("bot_zygote.py"))
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil por interpolação linear (p entre 0 e 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+class LatencyStats:
+    """Amostras recentes de tempo (segundos) por chave, com p50/p95"""
+
+    def __init__(self, max_samples: int):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, mode: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(mode, deque(maxlen=self.max_samples)).append(seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = {mode: list(values) for mode, values in self._samples.items()}
+        return {mode: {
+            "count": len(values),
+            "p50": round(percentile(values, 50), 4),
+            "p95": round(percentile(values, 95), 4),
+            "max": round(max(values), 4),
+            "last": round(values[-1], 4),
+        } for mode, values in samples.items()}
+
+# Pedido de ativação/reinício até o primeiro getUpdates bem-sucedido, por modo de partida
+startup_metrics = LatencyStats(BOT_STARTUP_SAMPLES)
+
+class BotLaunch:
+    """Sinais de partida de uma instância: "loaded" (chegou ao primeiro getUpdates),
+    "polling" (a requisição saiu) e "ready" (ela terminou com sucesso)"""
+
+    def __init__(self, go_fd: Optional[int] = None):
+        self.loaded = threading.Event()
+        self.ready = threading.Event()
+        self.polling_at = None
+        self.ready_at = None
+        self._go_fd = go_fd
+        self._lock = threading.Lock()
+
+    def mark(self, signal_name: str):
+        now = time.monotonic()
+        if signal_name in ("polling", "ready") and self.polling_at is None:
+            self.polling_at = now
+        if signal_name == "ready":
+            self.ready_at = now
+            self.ready.set()
+        if signal_name in ("loaded", "polling", "ready"):
+            self.loaded.set()
+
+    def release(self):
+        """Libera o primeiro getUpdates de uma instância iniciada em espera"""
+        with self._lock:
+            if self._go_fd is not None:
+                os.close(self._go_fd)
+                self._go_fd = None
+
+def record_bot_ready(bot_id: int, process, mode: str, requested_at: float):
+    """Registra a latência de partida se o processo ainda for o atual do bot"""
+    if bot_processes.get(bot_id) is not process:
+        return
+    elapsed = time.monotonic() - requested_at
+    startup_metrics.record(mode, elapsed)
+    add_logs([("info", f"Bot {bot_id} pronto em {elapsed:.2f}s ({mode})", bot_id)])
+
+def watch_bot_ready(bot_id: int, process, launch: BotLaunch, ready_fd: int, mode: str, requested_at: float):
+    """Acompanha o pipe em que o bot_launcher avisa o primeiro polling"""
+    def on_lines(lines: List[str]):
+        for line in lines:
+            launch.mark(line.strip())
+            if line.strip() == "ready":
+                record_bot_ready(bot_id, process, mode, requested_at)
+    output_pump.watch(os.fdopen(ready_fd, "rb", buffering=0), on_lines)
+
+class ZygoteBotHandle:
+    """Bot criado pelo fork-server, com a parte da interface de Popen usada pelo painel"""
+
+    def __init__(self, zygote: "BotZygote", pid: int, stdout, stderr):
+        self.zygote = zygote
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self._done = threading.Event()
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None and not self.zygote.alive:
+            # Sem o zygote ninguém informa a saída: consulta o pid diretamente
+            try:
+                os.kill(self.pid, 0)
+            except ProcessLookupError:
+                self.finish(-1)
+        return self.returncode
+
+    def _signal(self, signum: int):
+        try:
+            os.kill(self.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._done.wait(0.1):
+            if self.poll() is not None:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                raise subprocess.TimeoutExpired(BOT_ZYGOTE_SCRIPT, timeout)
+        return self.returncode
+
+    def finish(self, returncode: int):
+        if self.returncode is None:
+            self.returncode = returncode
+        self._done.set()
+
+class BotZygote:
+    """Cliente do bot_zygote.py: sobe o fork-server sob demanda e pede um filho por bot"""
+
+    def __init__(self):
+        self.process = None
+        self.control = None
+        self.handles = {}
+        self.early_exits = {}
+        self._lock = threading.Lock()
+        # Separado de _lock: o pump nunca espera por um spawn em andamento
+        self._handles_lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        with self._lock:
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self.alive:
+            return
+        if self.control is not None:
+            self.control.close()
+        self.control, remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, BOT_ZYGOTE_SCRIPT, str(remote.fileno())],
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                pass_fds=(remote.fileno(),), env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            )
+        finally:
+            remote.close()
+        output_pump.watch(self.process.stdout, self._on_events)
+
+    def spawn(self, path: str, token: str, extra_fds: List[int]) -> ZygoteBotHandle:
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            with self._lock:
+                self._ensure_started()
+                socket.send_fds(self.control, [json.dumps({"path": path, "token": token}).encode("utf-8")], [stdout_w, stderr_w, *extra_fds])
+                reply = self.control.recv(65536)
+                if not reply:
+                    raise RuntimeError("fork-server encerrado")
+                reply = json.loads(reply)
+                if "error" in reply:
+                    raise RuntimeError(reply["error"])
+                
+            handle = ZygoteBotHandle(self, reply["pid"], os.fdopen(stdout_r, "rb", buffering=0), os.fdopen(stderr_r, "rb", buffering=0))
+            with self._handles_lock:
+                self.handles[handle.pid] = handle
+                if handle.pid in self.early_exits:
+                    handle.finish(self.early_exits.pop(handle.pid))
+            return handle
+        except BaseException:
+            os.close(stdout_r)
+            os.close(stderr_r)
+            raise
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+
+    def _on_events(self, lines: List[str]):
+        for line in lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get("event") != "exit":
+                continue
+            with self._handles_lock:
+                handle = self.handles.pop(message["pid"], None)
+                if handle is None:
+                    # Saída lida antes de o spawn registrar o pid
+                    self.early_exits[message["pid"]] = message["returncode"]
+                    continue
+            handle.finish(message["returncode"])
 
-class BotCreate(BotBase):
-    pass
+    def stop(self):
+        with self._lock:
+            if self.control is not None:
+                # Fechar o socket encerra o zygote; os bots já criados continuam rodando
+                self.control.close()
+                self.control = None
 
-class BotUpdate(BaseModel):
-    name: Optional[str] = None
-    token: Optional[str] = None
-    code: Optional[str] = None
-    gateway_id: Optional[int] = None
+bot_zygote = BotZygote()
 
-class BotResponse(BaseModel):
-    id: int
-    name: str
-    token: str
-    code: Optional[str]
-    is_active: bool
-    gateway_id: Optional[int]
-    created_at: datetime
-    updated_at: datetime
-    
-    class Config:
-        from_attributes = True
+# === ARTEFATOS DE CÓDIGO ===
+BOT_ARTIFACT_DIR = os.getenv("BOT_ARTIFACT_DIR", "./bot-artifacts")
+BOT_ARTIFACT_MAX_ENTRIES = int(os.getenv("BOT_ARTIFACT_MAX_ENTRIES", "256"))
+BOT_ARTIFACT_MAX_BYTES = int(os.getenv("BOT_ARTIFACT_MAX_BYTES", str(64 * 1024 * 1024)))
 
-class LogCreate(BaseModel):
-    level: str
-    message: str
-    bot_id: Optional[int] = None
+class CodeArtifact:
+    def __init__(self, key: str, path: str, source_path: str, size: int):
+        self.key = key
+        self.path = path
+        self.source_path = source_path
+        self.size = size
 
-class LogResponse(BaseModel):
-    id: int
-    level: str
-    message: str
-    bot_id: Optional[int]
-    timestamp: datetime
-    
-    class Config:
-        from_attributes = True
+class CodeArtifactStore:
+    """Bytecode dos bots compilado uma vez por conteúdo (sha256 do código), com despejo LRU
 
-class StatsResponse(BaseModel):
-    total_revenue: float
-    total_transactions: int
-    active_bots: int
-    total_bots: int
-    connected_gateways: int
-    total_gateways: int
+    O token não entra no artefato: o bot_launcher/bot_worker troca os marcadores
+    SEU_TOKEN_AQUI/YOUR_TOKEN_HERE nas constantes do bytecode ao carregar.
+    O diretório é privado (0700) e só são usados arquivos deste usuário com o
+    número mágico do interpretador atual; a chave também inclui esse número.
+    """
 
-# Dependência para obter sessão do banco
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    def __init__(self, directory: str, max_entries: int, max_bytes: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._prepare_directory()
+        self._load_existing()
 
-# Funções utilitárias
-def add_log(db: Session, level: str, message: str, bot_id: Optional[int] = None):
-    log = Log(level=level, message=message, bot_id=bot_id)
-    db.add(log)
-    db.commit()
-    logger.info(f"Log adicionado: {level} - {message}")
+    def _prepare_directory(self):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        stat = os.lstat(self.directory)
+        if not os.path.isdir(self.directory) or os.path.islink(self.directory) or stat.st_uid != os.geteuid():
+            raise RuntimeError(f"BOT_ARTIFACT_DIR {self.directory} não é um diretório deste usuário")
+        if stat.st_mode & 0o077:
+            os.chmod(self.directory, 0o700)
 
-def stop_bot_process(bot_id: int):
-    """Para o processo de um bot"""
-    if bot_id in bot_processes:
-        process = bot_processes[bot_id]
+    def _valid(self, path: str) -> bool:
+        """Arquivo comum, deste usuário, sem escrita de terceiros e do interpretador atual"""
         try:
-            process.terminate()
-            process.wait(timeout=5)
-        except:
-            try:
-                process.kill()
-            except:
-                pass
+            fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+        except OSError:
+            return False
+        try:
+            stat = os.fstat(fd)
+            if not (stat.st_mode & 0o170000 == 0o100000 and stat.st_uid == os.geteuid() and not stat.st_mode & 0o022):
+                return False
+            magic = importlib.util.MAGIC_NUMBER
+            return os.read(fd, len(magic)) == magic
         finally:
-            del bot_processes[bot_id]
+            os.close(fd)
 
-def start_bot_process(bot_id: int, bot_code: str, bot_token: str, db: Session):
-    """Inicia o processo de um bot"""
-    try:
-        # Criar arquivo temporário com o código do bot
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            # Substituir o token no código
-            code_with_token = bot_code.replace('SEU_TOKEN_AQUI', bot_token)
-            code_with_token = code_with_token.replace('YOUR_TOKEN_HERE', bot_token)
-            code_with_token = code_with_token.replace('BOT_TOKEN = "SEU_TOKEN_AQUI"', f'BOT_TOKEN = "{bot_token}"')
-            f.write(code_with_token)
-            temp_file = f.name
-        
-        # Iniciar processo do bot
-        process = subprocess.Popen([
-            sys.executable, temp_file
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    def _load_existing(self):
+        """Reaproveita artefatos de execuções anteriores, dos mais antigos aos mais recentes"""
+        found = []
+        for name in os.listdir(self.directory):
+            key, ext = os.path.splitext(name)
+            if ext != ".bin":
+                continue
+            artifact = self._artifact(key)
+            if not self._valid(artifact.path):
+                # Outra versão do Python ou arquivo que não foi gravado por este processo
+                for path in (artifact.path, artifact.source_path):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                continue
+            try:
+                stat = os.stat(artifact.path)
+                artifact.size = stat.st_size + os.path.getsize(artifact.source_path)
+            except OSError:
+                continue
+            found.append((stat.st_mtime, artifact))
+        for _, artifact in sorted(found, key=lambda item: item[0]):
+            self._entries[artifact.key] = artifact
+            self._bytes += artifact.size
+        with self._lock:
+            self._evict()
+
+    def _artifact(self, key: str, size: int = 0) -> CodeArtifact:
+        base = os.path.join(self.directory, key)
+        return CodeArtifact(key, base + ".bin", base + ".py", size)
+
+    def get(self, code: str) -> CodeArtifact:
+        """Artefato do código, compilando só na primeira vez (SyntaxError sobe para quem chamou)"""
+        source = code.encode("utf-8")
+        key = hashlib.sha256(importlib.util.MAGIC_NUMBER + source).hexdigest()
+        with self._lock:
+            artifact = self._entries.get(key)
+            if artifact is not None and self._valid(artifact.path):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return artifact
         
-        bot_processes[bot_id] = process
+        artifact = self._artifact(key)
+        # O .py fica ao lado do bytecode para os tracebacks mostrarem as linhas
+        compiled = compile(source, artifact.source_path, "exec")
+        data = importlib.util.MAGIC_NUMBER + marshal.dumps(compiled)
+        self._write(artifact.source_path, source)
+        self._write(artifact.path, data)
+        artifact.size = len(source) + len(data)
         
-        # Thread para monitorar o processo
-        def monitor_process():
-            try:
-                stdout, stderr = process.communicate(timeout=1)
-                if stderr:
-                    add_log(db, "error", f"Bot {bot_id} erro: {stderr}", bot_id)
-                if stdout:
-                    add_log(db, "info", f"Bot {bot_id} output: {stdout}", bot_id)
-            except subprocess.TimeoutExpired:
-                # Bot ainda está rodando
-                add_log(db, "success", f"Bot {bot_id} iniciado com sucesso", bot_id)
-            except Exception as e:
-                add_log(db, "error", f"Bot {bot_id} erro no monitoramento: {str(e)}", bot_id)
-            finally:
-                # Limpar arquivo temporário
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = artifact
+            self._bytes += artifact.size
+            self._evict(keep=key)
+        return artifact
+
+    def _write(self, path: str, data: bytes):
+        # Escrita atômica: um processo lendo o artefato nunca vê o arquivo pela metade
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600)
+        with open(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _evict(self, keep: Optional[str] = None):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, artifact = next(iter(self._entries.items()))
+            if key == keep:
+                break
+            del self._entries[key]
+            self._bytes -= artifact.size
+            self.evictions += 1
+            for path in (artifact.path, artifact.source_path):
                 try:
-                    os.unlink(temp_file)
-                except:
+                    os.unlink(path)
+                except OSError:
                     pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+artifact_store = CodeArtifactStore(BOT_ARTIFACT_DIR, BOT_ARTIFACT_MAX_ENTRIES, BOT_ARTIFACT_MAX_BYTES)
+
+def prepare_bot_code(bot: Bot):
+    """Compila o código novo já no cadastro, para a próxima ativação só reaproveitar"""
+    if not bot.code:
+        return
+    try:
+        artifact_store.get(bot.code)
+    except SyntaxError as e:
+        add_logs([("warning", f"Código do bot '{bot.name}' tem erro de sintaxe na linha {e.lineno}: {e.msg}", bot.id)])
+
+def spawn_bot_instance(bot_id: int, artifact: CodeArtifact, bot_token: str, requested_at: float, hold: bool = False):
+    """Cria um processo do bot (interpretador novo ou filho do fork-server).
+
+    Com `hold=True` a instância carrega o código mas só faz o primeiro
+    getUpdates depois de `launch.release()`, e não é registrada como a
+    instância atual do bot: quem chamou decide quando promovê-la.
+    """
+    ready_r, ready_w = os.pipe()
+    go_r, go_w = os.pipe() if hold else (None, None)
+    child_fds = [ready_w] + ([go_r] if hold else [])
+    process = None
+    mode = BOT_SPAWN_MODE
+    try:
+        if mode == "zygote":
+            try:
+                process = bot_zygote.spawn(artifact.path, bot_token, child_fds)
+            except Exception as e:
+                add_logs([("warning", f"Fork-server indisponível, iniciando bot {bot_id} do zero: {str(e)}", bot_id)])
+                mode = "exec"
+        if process is None:
+            env = {**os.environ, "PYTHONUNBUFFERED": "1", "BOT_READY_FD": str(ready_w), "BOT_TOKEN": bot_token}
+            if hold:
+                env["BOT_GO_FD"] = str(go_r)
+            # Iniciar processo do bot (sem buffer de saída, para os logs chegarem na hora)
+            process = subprocess.Popen([
+                sys.executable, BOT_LAUNCHER_SCRIPT, artifact.path
+            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=child_fds, env=env)
+    except BaseException:
+        os.close(ready_r)
+        if hold:
+            os.close(go_w)
+        raise
+    finally:
+        for fd in child_fds:
+            os.close(fd)
+    
+    launch = BotLaunch(go_w)
+    if not hold:
+        bot_processes[bot_id] = process
+    
+    # A saída é drenada pelo leitor compartilhado
+    watch_bot_process(bot_id, process)
+    watch_bot_ready(bot_id, process, launch, ready_r, mode, requested_at)
+    return process, launch
+
+def start_dedicated_process(bot_id: int, artifact: CodeArtifact, bot_token: str, requested_at: Optional[float] = None):
+    """Inicia o bot num processo próprio e o registra como a instância atual"""
+    process, _ = spawn_bot_instance(bot_id, artifact, bot_token, requested_at or time.monotonic())
+    return process
+
+# === REINÍCIO SEM INTERRUPÇÃO ===
+BOT_READY_TIMEOUT = float(os.getenv("BOT_READY_TIMEOUT", "15"))
+
+# Duração total dos reinícios (até o primeiro getUpdates bem-sucedido) e tempo sem
+# polling (da parada da antiga até a nova enviar o primeiro getUpdates)
+restart_metrics = LatencyStats(BOT_STARTUP_SAMPLES)
+restarting_bots = set()
+restarting_lock = threading.Lock()
+
+def wait_until(condition, timeout: float, interval: float = 0.01) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+def restart_bot_instance(bot_id: int, artifact: CodeArtifact, bot_token: str, runtime: Optional[str],
+                         requested_at: float) -> dict:
+    """Reinício sobreposto (blue-green).
+
+    A nova instância carrega o código enquanto a antiga continua atendendo;
+    só depois que ela chega ao primeiro getUpdates a antiga é encerrada e a
+    nova é liberada para consumir atualizações. Nenhuma atualização se perde:
+    o que a antiga não confirmou é entregue de novo pelo Telegram.
+    """
+    # Sob o lock de ativação: um toggle ou lote não sobe outra instância no meio da troca
+    with bot_start_lock(bot_id):
+        old = bot_processes.get(bot_id)
         
-        threading.Thread(target=monitor_process, daemon=True).start()
+        if runtime == "shared":
+            same_worker = old.worker if isinstance(old, WorkerBotHandle) and old.worker.alive else None
+            if same_worker is not None:
+                # No mesmo worker a troca é atômica: ele cancela a task antiga antes de subir a nova
+                new = same_worker.start_bot(bot_id, artifact, bot_token, requested_at)
+            else:
+                new = worker_pool.start_bot(bot_id, artifact, bot_token, requested_at)
+            launch = new.launch
+            bot_processes[bot_id] = new
+            stopped_at = time.monotonic()
+            if old is not None:
+                if same_worker is not None:
+                    old.finish(0)
+                else:
+                    stop_instance(old)
+        else:
+            new, launch = spawn_bot_instance(bot_id, artifact, bot_token, requested_at, hold=True)
+            wait_until(lambda: launch.loaded.is_set() or new.poll() is not None, BOT_READY_TIMEOUT)
+            if new.poll() is not None:
+                launch.release()
+                raise RuntimeError(f"a nova instância encerrou (código {new.returncode}) antes de ficar pronta; a anterior continua rodando")
+            if not launch.loaded.is_set():
+                add_logs([("warning", f"Bot {bot_id} não sinalizou o polling em {BOT_READY_TIMEOUT:.0f}s; promovendo a nova instância mesmo assim", bot_id)])
         
+            bot_processes[bot_id] = new
+            stopped_at = time.monotonic()
+            if old is not None:
+                stop_instance(old)
+                # A nova só consome atualizações depois que a antiga saiu (evita processar em dobro)
+                if not wait_until(lambda: old.poll() is not None, BOT_STOP_TIMEOUT):
+                    try:
+                        old.kill()
+                    except OSError:
+                        pass
+            launch.release()
+        metrics.count_bot_restart()
+    
+    ready = launch.ready.wait(BOT_READY_TIMEOUT)
+    result = {"duration": time.monotonic() - requested_at, "downtime": None}
+    if ready:
+        result["downtime"] = max(0.0, launch.polling_at - stopped_at)
+        restart_metrics.record("duration", result["duration"])
+        restart_metrics.record("downtime", result["downtime"])
+    return result
+
+bot_start_locks = {}
+bot_start_locks_lock = threading.Lock()
+
+def bot_start_lock(bot_id: int) -> threading.Lock:
+    """Lock de ativação de um bot (toggle, reinício, rebalanceamento e operações em lote disputam o mesmo)"""
+    with bot_start_locks_lock:
+        return bot_start_locks.setdefault(bot_id, threading.Lock())
+
+def launch_bot(bot_id: int, bot_code: str, bot_token: str, runtime: Optional[str] = None,
+               requested_at: Optional[float] = None) -> bool:
+    """Inicia o bot no runtime escolhido; erros sobem para quem chamou.
+
+    Devolve False, sem iniciar nada, se o bot já estiver rodando: a checagem
+    é feita sob o lock do bot, então ativações simultâneas sobem uma instância só.
+    """
+    with bot_start_lock(bot_id):
+        if bot_id in bot_processes:
+            return False
+        artifact = artifact_store.get(bot_code)
+        if runtime == "shared":
+            bot_processes[bot_id] = worker_pool.start_bot(bot_id, artifact, bot_token, requested_at)
+        else:
+            start_dedicated_process(bot_id, artifact, bot_token, requested_at)
+        return True
+
+def start_bot_process(bot_id: int, bot_code: str, bot_token: str, db: Session, runtime: Optional[str] = None,
+                      requested_at: Optional[float] = None):
+    """Inicia o processo de um bot"""
+    try:
+        launch_bot(bot_id, bot_code, bot_token, runtime, requested_at)
         return True
     except Exception as e:
         add_log(db, "error", f"Erro ao iniciar bot {bot_id}: {str(e)}", bot_id)
         return False
 
+# === OPERAÇÕES EM LOTE ===
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "8"))
+BULK_JOBS_KEPT = int(os.getenv("BULK_JOBS_KEPT", "100"))
+
+class BulkItemSkipped(Exception):
+    """O bot já estava no estado pedido quando a operação chegou nele"""
+
+class BulkJob:
+    """Execução de start/stop/restart em vários bots, com progresso por bot"""
+
+    def __init__(self, action: str, bots: List[Bot], concurrency: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.concurrency = concurrency
+        self.bots = {bot.id: bot for bot in bots}
+        self.items = {bot.id: {"bot_id": bot.id, "name": bot.name, "status": "pending", "error": None, "duration": None}
+                      for bot in bots}
+        self.not_found = []
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, bot_id: int, status: str, error: Optional[str] = None, duration: Optional[float] = None):
+        with self._lock:
+            item = self.items[bot_id]
+            item.update(status=status, error=error, duration=None if duration is None else round(duration, 3))
+            item = dict(item)
+        event_hub.publish("bulk_job", {"job_id": self.id, "item": item, "progress": self.progress()})
+
+    def progress(self) -> dict:
+        with self._lock:
+            counts = {}
+            for item in self.items.values():
+                counts[item["status"]] = counts.get(item["status"], 0) + 1
+        return {"total": len(self.items), **counts}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            items = [dict(item) for item in self.items.values()]
+        return {
+            "job_id": self.id,
+            "action": self.action,
+            "concurrency": self.concurrency,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress(),
+            "items": items,
+            "not_found": self.not_found,
+        }
+
+bulk_jobs = OrderedDict()
+bulk_jobs_lock = threading.Lock()
+
+def register_bulk_job(job: BulkJob):
+    with bulk_jobs_lock:
+        bulk_jobs[job.id] = job
+        while len(bulk_jobs) > BULK_JOBS_KEPT:
+            bulk_jobs.popitem(last=False)
+
+def run_bulk_operation(job: BulkJob, bot: Bot, requested_at: float) -> Optional[bool]:
+    """Executa a ação num bot; devolve o novo is_active (None quando não muda)"""
+    if job.action == "stop":
+        stop_bot_process(bot.id)
+        return False
+    
+    if not (bot.code and bot.token):
+        raise RuntimeError("bot precisa ter código e token")
+    
+    if job.action == "start":
+        # Outro toggle ou lote pode ter iniciado o bot depois que o job foi criado
+        if not launch_bot(bot.id, bot.code, bot.token, bot.runtime, requested_at):
+            raise BulkItemSkipped("já estava rodando")
+        return True
+    
+    with restarting_lock:
+        if bot.id in restarting_bots:
+            raise RuntimeError("reinício já em andamento")
+        restarting_bots.add(bot.id)
+    try:
+        result = restart_bot_instance(bot.id, artifact_store.get(bot.code), bot.token, bot.runtime, requested_at)
+    finally:
+        with restarting_lock:
+            restarting_bots.discard(bot.id)
+    if result["downtime"] is None:
+        raise RuntimeError("reiniciado, mas ainda não confirmou o polling")
+    return None
+
+def run_bulk_job(job: BulkJob):
+    """Roda as operações com concorrência limitada e grava os status num único UPDATE"""
+    requested_at = time.monotonic()
+    changes = {}
+    
+    def run_one(bot: Bot):
+        started = time.monotonic()
+        job.update(bot.id, "running")
+        try:
+            new_status = run_bulk_operation(job, bot, requested_at)
+        except BulkItemSkipped as e:
+            job.update(bot.id, "skipped", error=str(e), duration=time.monotonic() - started)
+            return
+        except Exception as e:
+            job.update(bot.id, "failed", error=str(e), duration=time.monotonic() - started)
+            return
+        if new_status is not None:
+            changes[bot.id] = new_status
+        job.update(bot.id, "done", duration=time.monotonic() - started)
+    
+    pending = [bot for bot_id, bot in job.bots.items() if job.items[bot_id]["status"] == "pending"]
+    with ThreadPoolExecutor(max_workers=job.concurrency, thread_name_prefix=f"bulk-{job.id}") as executor:
+        list(executor.map(run_one, pending))
+    
+    updated_at = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for active in (True, False):
+            ids = [bot_id for bot_id, status in changes.items() if status == active]
+            if not ids:
+                continue
+            changed = db.query(Bot).filter(Bot.id.in_(ids), Bot.is_active == (not active)).update(
+                {Bot.is_active: active, Bot.updated_at: updated_at}, synchronize_session=False)
+            if changed:
+                stats_engine.stage(db, active_bots=changed if active else -changed)
+        db.commit()
+        
+        for bot_id, active in changes.items():
+            bot = job.bots[bot_id]
+            bot.is_active = active
+            bot.updated_at = updated_at
+            publish_bot("status", bot)
+        
+        failed = [item for item in job.items.values() if item["status"] == "failed"]
+        entries = [("error", f"Bot '{item['name']}': falha em {job.action} ({item['error']})", item["bot_id"]) for item in failed]
+        entries.append(("success" if not failed else "warning",
+                        f"Operação em lote '{job.action}' concluída: {len(job.items) - len(failed)} de {len(job.items)} bots", None))
+        add_logs(entries)
+    finally:
+        db.close()
+        job.finished_at = datetime.utcnow()
+        event_hub.publish("bulk_job", {"job_id": job.id, "finished": True, "progress": job.progress()})
+
 # Inicializar FastAPI
 app = FastAPI(title="FarmMoneyRich API", version="1.0.0")
 
+# Ordem (de fora para dentro): métricas -> CORS -> cache de respostas -> gzip do JSON -> endpoints.
+# O cache fica por dentro do CORS para que as respostas do cache também passem por ele
+app.add_middleware(JSONGzipMiddleware, minimum_size=JSON_GZIP_MIN_BYTES)
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -247,33 +3397,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if METRICS_ENABLED:
+    metrics.routes = app.router.routes
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
+@app.on_event("startup")
+def startup_event():
+    if LOG_WRITER_MODE != "sync":
+        log_writer.start()
+    stats_engine.start()
+    log_retention.start()
+    gateway_health.start()
+    if BOT_SPAWN_MODE == "zygote":
+        # Pré-aquece o fork-server antes da primeira ativação
+        bot_zygote.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    stats_engine.stop()
+    log_retention.stop()
+    gateway_health.stop()
+    bot_zygote.stop()
+    log_writer.stop()
+
 # Endpoints da API
 
 # === ESTATÍSTICAS ===
 @app.get("/api/stats", response_model=StatsResponse)
-def get_stats(db: Session = Depends(get_db)):
-    total_bots = db.query(Bot).count()
-    active_bots = db.query(Bot).filter(Bot.is_active == True).count()
-    total_gateways = db.query(Gateway).count()
-    connected_gateways = db.query(Gateway).filter(Gateway.status == "Conectado").count()
-    
-    return StatsResponse(
-        total_revenue=1250.75,  # Valor exemplo
-        total_transactions=42,  # Valor exemplo
-        active_bots=active_bots,
-        total_bots=total_bots,
-        connected_gateways=connected_gateways,
-        total_gateways=total_gateways
-    )
+async def get_stats():
+    # Leitura dos contadores em memória, sem consultar o banco
+    return stats_engine.snapshot()
 
 # === GATEWAYS ===
-@app.get("/api/gateways", response_model=List[GatewayResponse])
-def get_gateways(db: Session = Depends(get_db)):
-    gateways = db.query(Gateway).all()
-    return gateways
+@app.get("/api/gateways", response_model=List[GatewaySummary], response_model_exclude_unset=True)
+async def get_gateways(
+    fields: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Gateways em ordem de id; `after_id=<último id recebido>` traz a próxima página.
+
+    `fields=id,name,status` restringe as colunas lidas e devolvidas.
+    """
+    return FastJSONResponse(await list_page(db, Gateway, GATEWAY_LIST_FIELDS, GATEWAY_SUMMARY_FIELDS, fields, after_id, limit))
+
+@app.get("/api/gateways/{gateway_id}", response_model=GatewayResponse)
+async def get_gateway(gateway_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_gateway = await db.get(Gateway, gateway_id)
+    if not db_gateway:
+        raise HTTPException(status_code=404, detail="Gateway não encontrado")
+    return db_gateway
 
 @app.post("/api/gateways", response_model=GatewayResponse)
-def create_gateway(gateway: GatewayCreate, db: Session = Depends(get_db)):
+async def create_gateway(gateway: GatewayCreate, db: AsyncSession = Depends(get_async_db)):
     db_gateway = Gateway(
         name=gateway.name,
         type=gateway.type,
@@ -282,16 +3459,19 @@ def create_gateway(gateway: GatewayCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_gateway)
-    db.commit()
-    db.refresh(db_gateway)
+    stats_engine.stage(db, total_gateways=1)
+    await db.commit()
+    await db.refresh(db_gateway)
     
-    add_log(db, "success", f"Gateway '{gateway.name}' criado com sucesso")
+    await add_log_async(db, "success", f"Gateway '{gateway.name}' criado com sucesso")
+    publish_gateway("created", db_gateway)
+    gateway_health.refresh()
     
     return db_gateway
 
 @app.put("/api/gateways/{gateway_id}", response_model=GatewayResponse)
-def update_gateway(gateway_id: int, gateway: GatewayUpdate, db: Session = Depends(get_db)):
-    db_gateway = db.query(Gateway).filter(Gateway.id == gateway_id).first()
+async def update_gateway(gateway_id: int, gateway: GatewayUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_gateway = await db.get(Gateway, gateway_id)
     if not db_gateway:
         raise HTTPException(status_code=404, detail="Gateway não encontrado")
     
@@ -304,92 +3484,183 @@ def update_gateway(gateway_id: int, gateway: GatewayUpdate, db: Session = Depend
     if gateway.api_key is not None:
         db_gateway.api_key = gateway.api_key
     
-    db.commit()
-    db.refresh(db_gateway)
+    await db.commit()
+    await db.refresh(db_gateway)
     
-    add_log(db, "success", f"Gateway '{db_gateway.name}' atualizado com sucesso")
+    await add_log_async(db, "success", f"Gateway '{db_gateway.name}' atualizado com sucesso")
+    publish_gateway("updated", db_gateway)
+    if gateway.api_url is not None:
+        gateway_health.refresh()
     
     return db_gateway
 
 @app.delete("/api/gateways/{gateway_id}")
-def delete_gateway(gateway_id: int, db: Session = Depends(get_db)):
-    db_gateway = db.query(Gateway).filter(Gateway.id == gateway_id).first()
+async def delete_gateway(gateway_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_gateway = await db.get(Gateway, gateway_id)
     if not db_gateway:
         raise HTTPException(status_code=404, detail="Gateway não encontrado")
     
     gateway_name = db_gateway.name
-    db.delete(db_gateway)
-    db.commit()
+    set_gateway_status(db, db_gateway, "Erro")
+    stats_engine.stage(db, total_gateways=-1)
+    await db.delete(db_gateway)
+    await db.commit()
     
-    add_log(db, "warning", f"Gateway '{gateway_name}' excluído")
+    gateway_checker.forget(gateway_id)
+    gateway_health.refresh()
+    await add_log_async(db, "warning", f"Gateway '{gateway_name}' excluído")
+    event_hub.publish("gateway", {"action": "deleted", "gateway": {"id": gateway_id}})
     
     return {"message": "Gateway excluído com sucesso"}
 
+@app.post("/api/gateways/test-all")
+def test_all_gateways(force: bool = False, db: Session = Depends(get_db)):
+    """Testa todos os gateways em paralelo e devolve o resultado de cada um.
+
+    Resultados com menos de GATEWAY_CHECK_CACHE_TTL segundos são reaproveitados,
+    a não ser com `force=true`.
+    """
+    gateways = db.query(Gateway.id, Gateway.name, Gateway.api_url).all()
+    results = gateway_checker.check([(gateway.id, gateway.api_url) for gateway in gateways], use_cache=not force)
+    persist_gateway_results([result for result in results if not result["cached"]])
+    
+    names = {gateway.id: gateway.name for gateway in gateways}
+    return [{**result, "name": names[result["gateway_id"]]} for result in results]
+
+@app.get("/api/gateways/{gateway_id}/health")
+async def get_gateway_health(gateway_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Histórico do monitoramento em segundo plano (lido da memória)"""
+    db_gateway = await db.get(Gateway, gateway_id)
+    if not db_gateway:
+        raise HTTPException(status_code=404, detail="Gateway não encontrado")
+    
+    return {
+        "gateway_id": gateway_id,
+        "monitoring": "active" if gateway_health.leader else ("standby" if GATEWAY_HEALTH_INTERVAL > 0 else "disabled"),
+        "health": gateway_health.describe(gateway_id),
+    }
+
 @app.post("/api/gateways/{gateway_id}/test")
-def test_gateway_connection(gateway_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    db_gateway = db.query(Gateway).filter(Gateway.id == gateway_id).first()
+async def test_gateway_connection(gateway_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    db_gateway = await db.get(Gateway, gateway_id)
     if not db_gateway:
         raise HTTPException(status_code=404, detail="Gateway não encontrado")
     
+    cached = gateway_checker.cached(gateway_id, db_gateway.api_url)
+    if cached is not None:
+        # Teste recente: não bate de novo no gateway
+        return {"message": "Resultado recente reaproveitado", "cached": True, "result": cached,
+                "gateway": GatewayResponse.model_validate(db_gateway).model_dump()}
+    
     # Atualizar status para "Testando"
-    db_gateway.status = "Testando"
-    db.commit()
+    set_gateway_status(db, db_gateway, "Testando")
+    await db.commit()
+    publish_gateway("status", db_gateway)
     
-    add_log(db, "info", f"Testando conexão com gateway '{db_gateway.name}'...")
+    await add_log_async(db, "info", f"Testando conexão com gateway '{db_gateway.name}'...")
+    api_url = db_gateway.api_url
     
+    # Função síncrona: o BackgroundTasks a executa no pool de threads
     def test_connection():
-        time.sleep(2)  # Simular tempo de teste
-        
-        db_session = SessionLocal()
         try:
-            gateway = db_session.query(Gateway).filter(Gateway.id == gateway_id).first()
-            if gateway:
-                # Tentar fazer uma requisição para testar a conexão
-                try:
-                    response = requests.get(gateway.api_url, timeout=5)
-                    success = response.status_code < 500
-                except:
-                    success = False
-                
-                gateway.status = "Conectado" if success else "Erro"
-                db_session.commit()
-                
-                add_log(db_session, 
-                       "success" if success else "error",
-                       f"Gateway '{gateway.name}' {'conectado com sucesso' if success else 'falhou na conexão'}")
-        finally:
-            db_session.close()
+            results = gateway_checker.check([(gateway_id, api_url)], use_cache=False)
+        except Exception as e:
+            # O gateway não pode ficar em "Testando": grava a falha
+            logger.error(f"Erro ao testar gateway {gateway_id}: {e}")
+            results = [{"gateway_id": gateway_id, "success": False, "status_code": None, "error": e.__class__.__name__}]
+        persist_gateway_results(results)
     
     background_tasks.add_task(test_connection)
     
     return {"message": "Teste de conexão iniciado"}
 
 # === BOTS ===
-@app.get("/api/bots", response_model=List[BotResponse])
-def get_bots(db: Session = Depends(get_db)):
-    bots = db.query(Bot).all()
-    return bots
+@app.get("/api/bots", response_model=List[BotSummary], response_model_exclude_unset=True)
+async def get_bots(
+    fields: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Resumo dos bots em ordem de id, sem o código e com o token mascarado.
+
+    `fields=id,name,is_active` restringe as colunas lidas e devolvidas;
+    `after_id=<último id recebido>` traz a próxima página. Código e token
+    completos só em `GET /api/bots/{id}`.
+    """
+    return FastJSONResponse(await list_page(db, Bot, BOT_LIST_FIELDS, BOT_SUMMARY_FIELDS, fields, after_id, limit))
+
+@app.post("/api/bots/bulk", status_code=202)
+async def bulk_bot_action(request: BulkBotAction, db: AsyncSession = Depends(get_async_db)):
+    """Start/stop/restart de vários bots (por ids ou gateway) com concorrência limitada.
+
+    Responde na hora com o job; o progresso de cada bot sai em
+    `GET /api/bots/bulk/{job_id}` e nos eventos `bulk_job` de `/api/stream`.
+    """
+    if request.bot_ids is None and request.gateway_id is None:
+        raise HTTPException(status_code=400, detail="Informe bot_ids ou gateway_id")
+    
+    # Uma única consulta para carregar todos os bots do lote
+    query = select(Bot)
+    if request.bot_ids is not None:
+        query = query.where(Bot.id.in_(request.bot_ids))
+    if request.gateway_id is not None:
+        query = query.where(Bot.gateway_id == request.gateway_id)
+    bots = (await db.scalars(query)).all()
+    # Os objetos seguem para a thread do job desanexados desta sessão
+    db.expunge_all()
+    
+    job = BulkJob(request.action, bots, request.concurrency or BULK_CONCURRENCY)
+    if request.bot_ids is not None:
+        job.not_found = sorted(set(request.bot_ids) - set(job.bots))
+    for bot in bots:
+        if request.action == "start" and bot.is_active and bot.id in bot_processes:
+            job.items[bot.id]["status"] = "skipped"
+        elif request.action == "restart" and not bot.is_active:
+            job.items[bot.id]["status"] = "skipped"
+    register_bulk_job(job)
+    
+    threading.Thread(target=run_bulk_job, args=(job,), name=f"bulk-{job.id}", daemon=True).start()
+    return job.to_dict()
+
+@app.get("/api/bots/bulk/{job_id}")
+async def get_bulk_job(job_id: str):
+    job = bulk_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Operação em lote não encontrada")
+    return job.to_dict()
+
+@app.get("/api/bots/{bot_id}", response_model=BotResponse)
+async def get_bot(bot_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_bot = await db.get(Bot, bot_id)
+    if not db_bot:
+        raise HTTPException(status_code=404, detail="Bot não encontrado")
+    return db_bot
 
 @app.post("/api/bots", response_model=BotResponse)
-def create_bot(bot: BotCreate, db: Session = Depends(get_db)):
+async def create_bot(bot: BotCreate, db: AsyncSession = Depends(get_async_db)):
     db_bot = Bot(
         name=bot.name,
         token=bot.token,
         code=bot.code,
-        gateway_id=bot.gateway_id
+        gateway_id=bot.gateway_id,
+        runtime=bot.runtime or BOT_RUNTIME_DEFAULT
     )
     
     db.add(db_bot)
-    db.commit()
-    db.refresh(db_bot)
+    stats_engine.stage(db, total_bots=1)
+    await db.commit()
+    await db.refresh(db_bot)
     
-    add_log(db, "success", f"Bot '{bot.name}' criado com sucesso", db_bot.id)
+    await add_log_async(db, "success", f"Bot '{bot.name}' criado com sucesso", db_bot.id)
+    await run_in_threadpool(prepare_bot_code, db_bot)
+    publish_bot("created", db_bot)
     
     return db_bot
 
 @app.put("/api/bots/{bot_id}", response_model=BotResponse)
-def update_bot(bot_id: int, bot: BotUpdate, db: Session = Depends(get_db)):
-    db_bot = db.query(Bot).filter(Bot.id == bot_id).first()
+async def update_bot(bot_id: int, bot: BotUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_bot = await db.get(Bot, bot_id)
     if not db_bot:
         raise HTTPException(status_code=404, detail="Bot não encontrado")
     
@@ -401,19 +3672,24 @@ def update_bot(bot_id: int, bot: BotUpdate, db: Session = Depends(get_db)):
         db_bot.code = bot.code
     if bot.gateway_id is not None:
         db_bot.gateway_id = bot.gateway_id
+    if bot.runtime is not None:
+        db_bot.runtime = bot.runtime
     
     db_bot.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(db_bot)
+    await db.commit()
+    await db.refresh(db_bot)
     
-    add_log(db, "success", f"Bot '{db_bot.name}' atualizado com sucesso", bot_id)
+    await add_log_async(db, "success", f"Bot '{db_bot.name}' atualizado com sucesso", bot_id)
+    if bot.code is not None:
+        await run_in_threadpool(prepare_bot_code, db_bot)
+    publish_bot("updated", db_bot)
     
     return db_bot
 
 @app.delete("/api/bots/{bot_id}")
-def delete_bot(bot_id: int, db: Session = Depends(get_db)):
-    db_bot = db.query(Bot).filter(Bot.id == bot_id).first()
+async def delete_bot(bot_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_bot = await db.get(Bot, bot_id)
     if not db_bot:
         raise HTTPException(status_code=404, detail="Bot não encontrado")
     
@@ -422,16 +3698,20 @@ def delete_bot(bot_id: int, db: Session = Depends(get_db)):
         stop_bot_process(bot_id)
     
     bot_name = db_bot.name
-    db.delete(db_bot)
-    db.commit()
+    set_bot_active(db, db_bot, False)
+    stats_engine.stage(db, total_bots=-1)
+    await db.delete(db_bot)
+    await db.commit()
+    bot_tails.pop(bot_id, None)
     
-    add_log(db, "warning", f"Bot '{bot_name}' excluído")
+    await add_log_async(db, "warning", f"Bot '{bot_name}' excluído")
+    event_hub.publish("bot", {"action": "deleted", "bot": {"id": bot_id}})
     
     return {"message": "Bot excluído com sucesso"}
 
 @app.post("/api/bots/{bot_id}/toggle")
-def toggle_bot_status(bot_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    db_bot = db.query(Bot).filter(Bot.id == bot_id).first()
+async def toggle_bot_status(bot_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
+    db_bot = await db.get(Bot, bot_id)
     if not db_bot:
         raise HTTPException(status_code=404, detail="Bot não encontrado")
     
@@ -440,72 +3720,412 @@ def toggle_bot_status(bot_id: int, background_tasks: BackgroundTasks, db: Sessio
     if new_status:
         # Ativar bot
         if db_bot.code and db_bot.token:
+            requested_at = time.monotonic()
+            
             def start_bot():
                 db_session = SessionLocal()
                 try:
-                    success = start_bot_process(bot_id, db_bot.code, db_bot.token, db_session)
+                    bot = db_session.query(Bot).filter(Bot.id == bot_id).first()
+                    success = bot is not None and start_bot_process(bot_id, bot.code, bot.token, db_session, bot.runtime, requested_at)
                     if success:
-                        bot = db_session.query(Bot).filter(Bot.id == bot_id).first()
                         if bot:
-                            bot.is_active = True
+                            set_bot_active(db_session, bot, True)
                             db_session.commit()
+                            publish_bot("status", bot)
                 finally:
                     db_session.close()
             
             background_tasks.add_task(start_bot)
-            add_log(db, "info", f"Ativando bot '{db_bot.name}'...", bot_id)
+            await add_log_async(db, "info", f"Ativando bot '{db_bot.name}'...", bot_id)
         else:
             raise HTTPException(status_code=400, detail="Bot precisa ter código e token para ser ativado")
     else:
         # Desativar bot
         stop_bot_process(bot_id)
-        db_bot.is_active = False
-        add_log(db, "info", f"Bot '{db_bot.name}' desativado", bot_id)
+        set_bot_active(db, db_bot, False)
+        await add_log_async(db, "info", f"Bot '{db_bot.name}' desativado", bot_id)
     
     if not new_status:  # Só atualizar se for desativar (ativar é feito no background)
-        db_bot.is_active = new_status
-        db.commit()
+        await db.commit()
+        publish_bot("status", db_bot)
     
     return {"message": f"Bot {'sendo ativado' if new_status else 'desativado'} com sucesso"}
 
 @app.post("/api/bots/{bot_id}/restart")
-def restart_bot(bot_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    db_bot = db.query(Bot).filter(Bot.id == bot_id).first()
+async def restart_bot(bot_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_bot = await db.get(Bot, bot_id)
     if not db_bot:
         raise HTTPException(status_code=404, detail="Bot não encontrado")
     
-    add_log(db, "info", f"Reiniciando bot '{db_bot.name}'...", bot_id)
+    with restarting_lock:
+        if bot_id in restarting_bots:
+            raise HTTPException(status_code=409, detail="Reinício já em andamento")
+        restarting_bots.add(bot_id)
     
     def restart_process():
         db_session = SessionLocal()
         try:
-            # Parar processo atual
-            stop_bot_process(bot_id)
-            time.sleep(1)
-            
-            # Reiniciar se estiver ativo e tiver código
+            # Reiniciar se estiver ativo e tiver código; senão só garantir que está parado
             bot = db_session.query(Bot).filter(Bot.id == bot_id).first()
-            if bot and bot.is_active and bot.code and bot.token:
-                success = start_bot_process(bot_id, bot.code, bot.token, db_session)
-                if success:
-                    add_log(db_session, "success", f"Bot '{bot.name}' reiniciado com sucesso", bot_id)
-                else:
-                    add_log(db_session, "error", f"Falha ao reiniciar bot '{bot.name}'", bot_id)
+            if not (bot and bot.is_active and bot.code and bot.token):
+                stop_bot_process(bot_id)
+                return
+            
+            try:
+                result = restart_bot_instance(bot_id, artifact_store.get(bot.code), bot.token, bot.runtime, requested_at)
+            except Exception as e:
+                add_log(db_session, "error", f"Falha ao reiniciar bot '{bot.name}': {str(e)}", bot_id)
+                return
+            
+            if result["downtime"] is not None:
+                add_log(db_session, "success", f"Bot '{bot.name}' reiniciado em {result['duration']:.2f}s ({result['downtime']:.2f}s sem polling)", bot_id)
+            else:
+                add_log(db_session, "warning", f"Bot '{bot.name}' reiniciado, mas ainda não confirmou o polling", bot_id)
         finally:
             db_session.close()
+            with restarting_lock:
+                restarting_bots.discard(bot_id)
     
-    background_tasks.add_task(restart_process)
+    try:
+        await add_log_async(db, "info", f"Reiniciando bot '{db_bot.name}'...", bot_id)
+        requested_at = time.monotonic()
+        # Thread própria: o pipeline espera sinais de prontidão e não deve ocupar o pool de BackgroundTasks
+        threading.Thread(target=restart_process, name=f"restart-bot-{bot_id}", daemon=True).start()
+    except BaseException:
+        # A thread não chegou a rodar (e é ela quem libera o bot); sem isso o bot ficaria em 409 para sempre
+        with restarting_lock:
+            restarting_bots.discard(bot_id)
+        raise
     
     return {"message": "Reinício do bot iniciado"}
 
+@app.get("/api/bots/{bot_id}/tail")
+async def get_bot_tail_lines(bot_id: int, lines: int = Query(200, ge=1, le=BOT_TAIL_MAX_LINES), follow: bool = False):
+    """Últimas linhas de saída do bot direto da memória.
+
+    Com `follow=true` a resposta vira um stream SSE: primeiro as últimas
+    `lines` linhas e depois cada nova linha (evento `line`).
+    """
+    tail = bot_tails.get(bot_id)
+    if tail is None:
+        raise HTTPException(status_code=404, detail="Nenhuma saída registrada para este bot")
+    
+    if not follow:
+        return {"bot_id": bot_id, "lines": tail.lines(lines), **tail.stats()}
+    
+    subscriber, backlog = tail.follow(lines)
+    
+    async def line_stream():
+        try:
+            for item in backlog:
+                yield format_sse((item[0], "line", json.dumps(LogTail.to_dict(item), default=str)))
+            while True:
+                try:
+                    batch = await asyncio.wait_for(subscriber.queue.get(), EVENT_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if batch is None:
+                    break
+                yield "".join(format_sse((item[0], "line", json.dumps(LogTail.to_dict(item), default=str))) for item in batch)
+        finally:
+            tail.unfollow(subscriber)
+    
+    return StreamingResponse(line_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+# === RUNTIME ===
+@app.get("/api/runtime")
+def get_runtime():
+    """Workers multiplexados, bots em processo dedicado e memória de cada um"""
+    dedicated = [
+        {"bot_id": bot_id, "pid": process.pid, "rss_kb": process_rss_kb(process.pid)}
+        for bot_id, process in list(bot_processes.items())
+        if not isinstance(process, WorkerBotHandle)
+    ]
+    return {
+        "default_runtime": BOT_RUNTIME_DEFAULT,
+        "max_workers": worker_pool.size,
+        "workers": worker_pool.describe(),
+        "dedicated": dedicated,
+        "artifacts": artifact_store.stats(),
+    }
+
+@app.get("/api/runtime/startup")
+def get_startup_latency():
+    """Latência do pedido de ativação até o primeiro polling, por modo de partida"""
+    return {
+        "spawn_mode": BOT_SPAWN_MODE,
+        "zygote_pid": bot_zygote.process.pid if bot_zygote.alive else None,
+        "modes": startup_metrics.summary(),
+        "restarts": restart_metrics.summary(),
+    }
+
+@app.post("/api/runtime/rebalance")
+def rebalance_workers(db: Session = Depends(get_db)):
+    moves = worker_pool.rebalance()
+    if moves:
+        add_log(db, "info", f"Workers rebalanceados: {len(moves)} bots movidos")
+    return {"moved": moves}
+
+# === TRANSAÇÕES ===
+@app.post("/api/transactions", response_model=TransactionResponse)
+async def create_transaction(transaction: TransactionCreate, db: AsyncSession = Depends(get_async_db)):
+    """Registra um evento de pagamento; reenvios com o mesmo external_id são ignorados"""
+    by_external_id = select(Transaction).where(Transaction.external_id == transaction.external_id)
+    if transaction.external_id is not None:
+        existing = (await db.scalars(by_external_id)).first()
+        if existing:
+            return existing
+    
+    currency = transaction.currency.strip().upper()
+    if currency != REVENUE_CURRENCY:
+        # Somar moedas diferentes no mesmo agregado daria um total sem sentido
+        raise HTTPException(status_code=422, detail=f"Moeda {transaction.currency} não aceita; a receita é registrada em {REVENUE_CURRENCY}")
+    
+    db_bot = await db.get(Bot, transaction.bot_id)
+    if not db_bot:
+        raise HTTPException(status_code=404, detail="Bot não encontrado")
+    if transaction.gateway_id is not None and not await db.get(Gateway, transaction.gateway_id):
+        raise HTTPException(status_code=404, detail="Gateway não encontrado")
+    
+    db_transaction = Transaction(
+        external_id=transaction.external_id,
+        bot_id=transaction.bot_id,
+        gateway_id=transaction.gateway_id if transaction.gateway_id is not None else db_bot.gateway_id,
+        amount=transaction.amount,
+        currency=currency,
+        paid_at=transaction.paid_at or datetime.utcnow(),
+    )
+    
+    try:
+        await db.run_sync(record_transaction, db_transaction)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        if transaction.external_id is not None:
+            # Mesmo external_id gravado em paralelo
+            existing = (await db.scalars(by_external_id)).first()
+            if existing:
+                return existing
+        # Outra violação (ex.: bot ou gateway removido no meio do caminho)
+        raise HTTPException(status_code=409, detail="Transação em conflito com os dados atuais; confira bot_id e gateway_id")
+    await db.refresh(db_transaction)
+    
+    await add_log_async(db, "success", f"Pagamento de {transaction.amount:.2f} {currency} recebido pelo bot '{db_bot.name}'", db_bot.id)
+    
+    return db_transaction
+
+@app.get("/api/revenue", response_model=List[RevenuePoint])
+async def get_revenue(
+    group_by: str = Query("bot", pattern="^(bot|gateway)$"),
+    bucket: str = Query("day", pattern="^(hour|day)$"),
+    key_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Receita por período lida apenas dos agregados"""
+    query = select(RevenueRollup.key_id, RevenueRollup.bucket_start, RevenueRollup.revenue, RevenueRollup.transactions).where(RevenueRollup.bucket == bucket, RevenueRollup.dimension == group_by)
+    if key_id is not None:
+        query = query.where(RevenueRollup.key_id == key_id)
+    if since is not None:
+        query = query.where(RevenueRollup.bucket_start >= ROLLUP_BUCKETS[bucket](since))
+    if until is not None:
+        query = query.where(RevenueRollup.bucket_start < until)
+    query = query.order_by(RevenueRollup.bucket_start.desc(), RevenueRollup.key_id).limit(limit)
+    return FastJSONResponse(row_dicts(await db.execute(query)))
+
 # === LOGS ===
 @app.get("/api/logs", response_model=List[LogResponse])
-def get_logs(limit: int = 100, db: Session = Depends(get_db)):
-    logs = db.query(Log).order_by(Log.timestamp.desc()).limit(limit).all()
-    return logs
+async def get_logs(
+    limit: int = Query(100, ge=1, le=5000),
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    bot_id: Optional[int] = None,
+    level: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Logs do mais recente para o mais antigo, paginados por cursor.
+
+    `before_id` traz a página seguinte (mais antiga) a partir do último id
+    recebido; `after_id` traz apenas o que chegou depois daquele id.
+    """
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use apenas before_id ou after_id")
+    
+    query = select(*LOG_RESPONSE_COLUMNS)
+    if log_retention.visible_after():
+        # Limpeza pedida mas ainda em andamento
+        query = query.where(Log.id > log_retention.visible_after())
+    if bot_id is not None:
+        query = query.where(Log.bot_id == bot_id)
+    if level is not None:
+        query = query.where(Log.level == level)
+    if since is not None:
+        query = query.where(Log.timestamp >= since)
+    if until is not None:
+        query = query.where(Log.timestamp < until)
+    
+    if before_id is not None:
+        # O cursor é resolvido pela chave primária e vira uma faixa no índice (timestamp, id)
+        cursor_ts = await db.scalar(select(Log.timestamp).where(Log.id == before_id))
+        if cursor_ts is None:
+            raise HTTPException(status_code=400, detail="Cursor de log inválido")
+        query = query.where(tuple_(Log.timestamp, Log.id) < (cursor_ts, before_id))
+    
+    if after_id is not None:
+        # Só pelo id, que segue a ordem de gravação: um lote gravado depois pode trazer
+        # timestamps anteriores (do momento em que cada log entrou na fila) e ficaria
+        # abaixo de um cursor (timestamp, id). Os mais próximos do cursor primeiro;
+        # a página volta em ordem decrescente de id
+        logs = row_dicts(await db.execute(query.where(Log.id > after_id).order_by(Log.id.asc()).limit(limit)))
+        logs.reverse()
+    else:
+        logs = row_dicts(await db.execute(query.order_by(Log.timestamp.desc(), Log.id.desc()).limit(limit)))
+    return FastJSONResponse(logs)
+
+@app.get("/api/logs/export")
+async def export_logs(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bot_id: Optional[int] = None,
+    level: Optional[str] = None,
+    compress: bool = Query(False, alias="gzip"),
+):
+    """Exporta logs em NDJSON ou CSV, do mais antigo para o mais novo.
+
+    As linhas vêm de um cursor no servidor em blocos de LOG_EXPORT_CHUNK_SIZE e
+    são escritas direto na resposta, sem objetos ORM: a memória não cresce com
+    o número de linhas. Com `gzip=true` o arquivo sai comprimido (.gz).
+    """
+    logs_table = Log.__table__
+    query = select(logs_table.c.id, logs_table.c.timestamp, logs_table.c.level, logs_table.c.bot_id, logs_table.c.message)
+    if log_retention.visible_after():
+        query = query.where(logs_table.c.id > log_retention.visible_after())
+    if bot_id is not None:
+        query = query.where(logs_table.c.bot_id == bot_id)
+    if level is not None:
+        query = query.where(logs_table.c.level == level)
+    if since is not None:
+        query = query.where(logs_table.c.timestamp >= since)
+    if until is not None:
+        query = query.where(logs_table.c.timestamp < until)
+    query = query.order_by(logs_table.c.timestamp, logs_table.c.id)
+    
+    def encode_chunk(rows) -> str:
+        if format == "ndjson":
+            return "".join(json.dumps({"id": row.id, "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+                                       "level": row.level, "bot_id": row.bot_id, "message": row.message},
+                                      ensure_ascii=False) + "\n" for row in rows)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            (row.id, row.timestamp.isoformat() if row.timestamp else "", row.level,
+             "" if row.bot_id is None else row.bot_id, row.message) for row in rows
+        )
+        return buffer.getvalue()
+    
+    async def export_stream():
+        # wbits=31: formato gzip, comprimido bloco a bloco
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        
+        def output(text: str) -> bytes:
+            data = text.encode("utf-8")
+            return compressor.compress(data) if compressor else data
+        
+        if format == "csv":
+            yield output("id,timestamp,level,bot_id,message\r\n")
+        async with async_read_engine.connect() as conn:
+            result = await conn.stream(query.execution_options(yield_per=LOG_EXPORT_CHUNK_SIZE))
+            async for rows in result.partitions(LOG_EXPORT_CHUNK_SIZE):
+                chunk = output(encode_chunk(rows))
+                if chunk:
+                    yield chunk
+        if compressor:
+            yield compressor.flush()
+    
+    filename = f"logs-{datetime.utcnow():%Y%m%dT%H%M%S}.{format}" + (".gz" if compress else "")
+    media_type = "application/gzip" if compress else ("application/x-ndjson" if format == "ndjson" else "text/csv")
+    return StreamingResponse(export_stream(), media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    })
+
+logs_fts = table("logs_fts", column("rowid", Integer), column("rank", Float))
+
+@app.get("/api/logs/search", response_model=List[LogSearchResult])
+async def search_logs(
+    q: str = Query(..., min_length=1, max_length=500),
+    bot_id: Optional[int] = None,
+    level: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    sort: str = Query("rank", pattern="^(rank|recent)$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0, le=10000),
+    before_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Busca textual nos logs (chat IDs, usernames, trechos de erro).
+
+    Todos os termos precisam aparecer; "frases entre aspas" e `prefixo*` são
+    aceitos. `sort=rank` ordena por relevância (paginação por `offset`), exceto
+    buscas com mais de LOG_SEARCH_RANK_MAX_HITS resultados, que vêm do mais novo
+    ao mais antigo e sem `rank`; `sort=recent` sempre do mais novo ao mais antigo,
+    com `before_id=<menor id recebido>` para a próxima página. Sem FTS5
+    (ex.: Postgres) cai para LIKE, sem rank.
+    """
+    terms = search_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Busca vazia")
+    match = fts_query(terms)
+
+    ranked = sort == "rank"
+    if LOG_SEARCH_FTS and ranked and LOG_SEARCH_RANK_MAX_HITS:
+        # O bm25 conta todos os documentos de cada termo: em termos muito comuns
+        # custa uma varredura e quase não distingue os resultados
+        common = await db.scalar(select(logs_fts.c.rowid).where(text("logs_fts MATCH :match").bindparams(match=match))
+                                 .order_by(logs_fts.c.rowid.desc()).offset(LOG_SEARCH_RANK_MAX_HITS).limit(1))
+        ranked = common is None
+
+    if LOG_SEARCH_FTS:
+        query = select(*LOG_RESPONSE_COLUMNS, (logs_fts.c.rank if ranked else null()).label("rank")).join(logs_fts, logs_fts.c.rowid == Log.id).where(
+            text("logs_fts MATCH :match").bindparams(match=match)
+        )
+        newest_first = logs_fts.c.rowid.desc()
+    else:
+        escaped = (term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") for term, _ in terms)
+        query = select(*LOG_RESPONSE_COLUMNS, null().label("rank")).where(*(Log.message.ilike(f"%{term}%", escape="\\") for term in escaped))
+        newest_first = Log.id.desc()
+        ranked = False
+    if log_retention.visible_after():
+        query = query.where(Log.id > log_retention.visible_after())
+    if bot_id is not None:
+        query = query.where(Log.bot_id == bot_id)
+    if level is not None:
+        query = query.where(Log.level == level)
+    if since is not None:
+        query = query.where(Log.timestamp >= since)
+    if until is not None:
+        query = query.where(Log.timestamp < until)
+    if sort == "recent":
+        if before_id is not None:
+            query = query.where(Log.id < before_id)
+        query = query.order_by(newest_first).limit(limit)
+    else:
+        query = query.order_by(logs_fts.c.rank if ranked else newest_first).limit(limit).offset(offset)
+    rows = row_dicts(await db.execute(query))
+    for row in rows:
+        row["snippet"] = log_snippet(row["message"], terms)
+    return FastJSONResponse(rows)
 
 @app.post("/api/logs", response_model=LogResponse)
-def create_log(log: LogCreate, db: Session = Depends(get_db)):
+async def create_log(log: LogCreate, db: AsyncSession = Depends(get_async_db)):
     db_log = Log(
         level=log.level,
         message=log.message,
@@ -513,32 +4133,160 @@ def create_log(log: LogCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
+    await db.commit()
+    await db.refresh(db_log)
+    event_hub.publish("log", LogResponse.model_validate(db_log).model_dump())
     
     return db_log
 
 @app.delete("/api/logs")
-def clear_logs(db: Session = Depends(get_db)):
-    db.query(Log).delete()
-    db.commit()
+async def clear_logs(db: AsyncSession = Depends(get_async_db)):
+    # Some da listagem na hora; a remoção (com arquivamento) segue em pedaços em segundo plano
+    up_to_id = await db.scalar(select(func.max(Log.id)))
+    if up_to_id:
+        log_retention.request_clear(up_to_id)
+    event_hub.publish("logs_cleared", {})
     
-    add_log(db, "info", "Logs limpos pelo usuário")
+    await add_log_async(db, "info", "Logs limpos pelo usuário")
     
     return {"message": "Logs limpos com sucesso"}
 
+# === STREAM DE EVENTOS ===
+@app.get("/api/stream")
+async def stream_events(last_event_id: Optional[int] = Header(None)):
+    """Server-Sent Events com logs e mudanças de status de bots e gateways.
+
+    O navegador reenvia o cabeçalho Last-Event-ID ao reconectar e recebe os
+    eventos perdidos a partir do buffer em memória; se eles já saíram do
+    buffer, um evento `reset` avisa o cliente para recarregar tudo.
+    """
+    subscriber, replay, reset = event_hub.subscribe(last_event_id)
+    
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            if reset:
+                yield format_sse((event_hub.last_id, "reset", "{}"))
+            for entry in replay:
+                yield format_sse(entry)
+            while True:
+                try:
+                    entry = await asyncio.wait_for(subscriber.queue.get(), EVENT_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if entry is None:
+                    break
+                yield format_sse(entry)
+        finally:
+            event_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
 # Endpoint de saúde
 @app.get("/api/health")
-def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+async def health_check():
+    return {"status": "healthy", "timestamp": datetime.utcnow(), "log_writer": log_writer.stats(),
+            "log_retention": log_retention.stats(), "response_cache": response_cache.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Métricas no formato texto do Prometheus"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métricas desativadas (METRICS_ENABLED=false)")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# === ARQUIVOS ESTÁTICOS ===
+STATIC_DIR = os.getenv("STATIC_DIR", "static")
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+class StaticAsset:
+    """Um arquivo do dashboard com as variantes pré-comprimidas (gzip e, se disponível, brotli)"""
+
+    def __init__(self, name: str, body: bytes):
+        self.name = name
+        self.content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        self.hashed_name = f"{stem}.{self.digest}{ext}"
+        self.variants = {"identity": body}
+        compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(body, quality=11)
+        for encoding, data in compressed.items():
+            if len(data) < len(body):
+                self.variants[encoding] = data
+
+class StaticAssets:
+    """Arquivos de STATIC_DIR lidos e comprimidos uma vez, na inicialização.
 
-# Servir arquivos estáticos do React
-@app.mount("/static", StaticFiles(directory="static"), name="static")
+    Cada arquivo também é servido num nome com o hash do conteúdo
+    (`app.<hash>.js`), com cache imutável de um ano; o index.html é reescrito
+    para apontar para esses nomes e sempre revalidado (`no-cache` + ETag).
+    Alterações nos arquivos só aparecem depois de reiniciar o servidor.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.assets = {}
+        self.index = None
+        self.load()
+
+    def load(self):
+        assets, index_body = {}, None
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+                if name == "index.html":
+                    index_body = body
+                    continue
+                asset = StaticAsset(name, body)
+                assets[name] = assets[asset.hashed_name] = asset
+
+        if index_body is not None:
+            html_text = index_body.decode("utf-8")
+            for name, asset in assets.items():
+                if name == asset.name:
+                    html_text = re.sub(rf'(src|href)="(?:/?static/)?{re.escape(name)}"', rf'\1="/static/{asset.hashed_name}"', html_text)
+            self.index = StaticAsset("index.html", html_text.encode("utf-8"))
+            assets["index.html"] = self.index
+        self.assets = assets
 
-# Endpoint raiz - servir o React app
-@app.get("/")
-def read_root():
-    return FileResponse('static/index.html')
+    def response(self, asset: StaticAsset, request: Request, immutable: bool) -> Response:
+        accepted = accepted_encodings(request.scope["headers"])
+        encoding = next((encoding for encoding in ("br", "gzip") if encoding in accepted and encoding in asset.variants), "identity")
+        headers = {
+            "ETag": f'"{asset.digest}-{encoding}"',
+            "Vary": "Accept-Encoding",
+            "Cache-Control": f"public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable" if immutable else "no-cache",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if headers["ETag"] in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return Response(asset.variants[encoding], media_type=asset.content_type, headers=headers)
+
+static_assets = StaticAssets(STATIC_DIR)
+
+@app.api_route("/static/{name:path}", methods=["GET", "HEAD"])
+def get_static_file(name: str, request: Request):
+    asset = static_assets.assets.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Arquivo não encontrado")
+    return static_assets.response(asset, request, immutable=name == asset.hashed_name)
+
+# Endpoint raiz - servir o dashboard
+@app.api_route("/", methods=["GET", "HEAD"])
+def read_root(request: Request):
+    if static_assets.index is None:
+        raise HTTPException(status_code=404, detail="index.html não encontrado")
+    return static_assets.response(static_assets.index, request, immutable=False)
 
 # Inicializar dados de exemplo
 def init_sample_data():
@@ -702,6 +4450,11 @@ if __name__ == '__main__':
 if __name__ == "__main__":
     import uvicorn
     
+    # python app.py rebuild-log-search: reindexa os logs e sai
+    if sys.argv[1:2] == ["rebuild-log-search"]:
+        rebuild_log_search()
+        sys.exit(0)
+    
     # Inicializar dados de exemplo
     init_sample_data()
     
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Carga da API: muitos dashboards abertos + clientes gravando ao mesmo tempo
+
+Sobe o app (uvicorn, um processo) num diretório temporário com banco novo,
+cadastra bots e gateways e então mantém:
+
+- `--clients` dashboards lendo /api/stats, /api/bots, /api/gateways e /api/logs;
+- `--writers` clientes gravando logs e pagamentos;
+- uma sonda chamando /api/health a cada 50 ms.
+
+Ao final imprime vazão e latência (p50/p99) por grupo em JSON. Para comparar
+antes/depois, rode contra outra versão do código com `--app-dir`:
+
+    git worktree add /tmp/farm-antes <commit>
+    python benchmarks/bench_api_load.py --app-dir /tmp/farm-antes --label antes
+    python benchmarks/bench_api_load.py --label depois
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+READS = ["/api/stats", "/api/bots", "/api/gateways", "/api/logs?limit=50"]
+
+def start_app(app_dir: Path, port: int) -> subprocess.Popen:
+    workdir = tempfile.mkdtemp(prefix="bench_api_")
+    os.symlink(app_dir / "static", os.path.join(workdir, "static"))
+    env = {**os.environ, "PYTHONPATH": str(app_dir), "GATEWAY_HEALTH_INTERVAL": "0"}
+    return subprocess.Popen(
+        [sys.executable, "-c", f"import uvicorn, app; uvicorn.run(app.app, host='127.0.0.1', port={port}, log_level='warning')"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+async def wait_ready(session: aiohttp.ClientSession, base: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(base + "/api/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("App não respondeu a tempo")
+
+async def seed(session: aiohttp.ClientSession, base: str, bots: int, logs: int) -> list:
+    async def post(path: str, payload: dict) -> dict:
+        async with session.post(base + path, json=payload) as response:
+            return await response.json()
+
+    gateway = await post("/api/gateways", {"name": "bench", "type": "BTCPay Server",
+                                           "api_url": "http://127.0.0.1:1/", "api_key": "k"})
+    bot_ids = []
+    for i in range(bots):
+        bot = await post("/api/bots", {"name": f"bench-{i}", "token": f"{100000 + i}:bench",
+                                       "code": "x = 1", "gateway_id": gateway["id"]})
+        bot_ids.append(bot["id"])
+    # Lotes pequenos: a versão síncrona esgota o pool de conexões com muitos POSTs simultâneos
+    for start in range(0, logs, 10):
+        await asyncio.gather(*(post("/api/logs", {"level": "info", "message": f"seed {i}", "bot_id": random.choice(bot_ids)})
+                               for i in range(start, min(start + 10, logs))))
+    return bot_ids
+
+async def timed(session: aiohttp.ClientSession, method: str, url: str, samples: dict, group: str, **kwargs):
+    started = time.perf_counter()
+    try:
+        async with session.request(method, url, **kwargs) as response:
+            await response.read()
+            ok = response.status < 400
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        ok = False
+    samples.setdefault(group, {"latencies": [], "errors": 0})
+    if ok:
+        samples[group]["latencies"].append(time.perf_counter() - started)
+    else:
+        samples[group]["errors"] += 1
+
+async def run_load(base: str, args, bot_ids: list) -> dict:
+    samples = {}
+    deadline = time.monotonic() + args.duration
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def reader():
+            while time.monotonic() < deadline:
+                await timed(session, "GET", base + random.choice(READS), samples, "reads")
+
+        async def writer(i: int):
+            n = 0
+            while time.monotonic() < deadline:
+                n += 1
+                bot_id = random.choice(bot_ids)
+                if n % 2:
+                    await timed(session, "POST", base + "/api/logs", samples, "writes",
+                                json={"level": "info", "message": f"load {i}-{n}", "bot_id": bot_id})
+                else:
+                    await timed(session, "POST", base + "/api/transactions", samples, "writes",
+                                json={"bot_id": bot_id, "amount": 9.9, "external_id": f"bench-{i}-{n}"})
+
+        async def probe():
+            while time.monotonic() < deadline:
+                await timed(session, "GET", base + "/api/health", samples, "health")
+                await asyncio.sleep(0.05)
+
+        started = time.monotonic()
+        await asyncio.gather(*(reader() for _ in range(args.clients)),
+                             *(writer(i) for i in range(args.writers)),
+                             probe())
+        elapsed = time.monotonic() - started
+
+    return {group: {
+        "requests": len(data["latencies"]),
+        "errors": data["errors"],
+        "rps": round(len(data["latencies"]) / elapsed, 1),
+        "p50_ms": round(percentile(data["latencies"], 50) * 1000, 1),
+        "p99_ms": round(percentile(data["latencies"], 99) * 1000, 1),
+    } for group, data in sorted(samples.items())}
+
+async def bench(args) -> dict:
+    base = f"http://127.0.0.1:{args.port}"
+    process = start_app(Path(args.app_dir).resolve(), args.port)
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session, base)
+            bot_ids = await seed(session, base, args.bots, args.seed_logs)
+        results = await run_load(base, args, bot_ids)
+    finally:
+        process.terminate()
+        process.wait()
+    return {"label": args.label, "clients": args.clients, "writers": args.writers,
+            "duration_seconds": args.duration, "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=str(ROOT))
+    parser.add_argument("--label", default="atual")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--bots", type=int, default=50)
+    parser.add_argument("--seed-logs", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8931)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(bench(args)), indent=2))
+
+if __name__ == '__main__':
+    main()
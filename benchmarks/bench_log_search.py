@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Busca nos logs: latência de GET /api/logs/search (FTS5) x LIKE '%...%'
+
+Cria um banco novo com `--rows` logs parecidos com os dos bots (chat IDs,
+usernames, erros da Bot API, pagamentos), gravados com o índice FTS5 ativo,
+sobe o app (uvicorn) e mede p50/p99 de cada tipo de busca. Como referência,
+a mesma busca rara é feita com LIKE direto no SQLite (varredura da tabela).
+
+    python benchmarks/bench_log_search.py --rows 10000000
+
+Popular 10M de logs leva vários minutos; `--db` reaproveita um banco já
+criado por uma execução anterior (o caminho aparece no relatório).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TEMPLATES = [
+    ("info", "Comando /start recebido de @{user} (chat {chat})"),
+    ("info", "Mensagem enviada para o chat {chat}"),
+    ("success", "Pagamento de {amount} BRL recebido pelo bot 'bot-{bot}'"),
+    ("error", "Erro ao enviar mensagem para {chat}: Forbidden: bot was blocked by the user"),
+    ("warning", "Timeout no getUpdates, tentando novamente em {delay}s"),
+    ("error", "Traceback: KeyError: 'callback_data' no handler de @{user}"),
+]
+
+def generate(rows: int, bots: int, rng: random.Random):
+    for _ in range(rows):
+        level, template = rng.choice(TEMPLATES)
+        message = template.format(user=f"user_{rng.randrange(200000)}", chat=rng.randrange(10 ** 9, 10 ** 10),
+                                  amount=f"{rng.randrange(1, 500)}.90", bot=rng.randrange(bots), delay=rng.randrange(1, 60))
+        yield level, message, rng.randrange(1, bots + 1)
+
+def seed(db_path: str, args) -> dict:
+    """Grava os logs pelo engine do app, com os triggers do FTS5 ativos"""
+    sys.path.insert(0, str(ROOT))
+    import app
+
+    insert = app.Log.__table__.insert()
+    rng = random.Random(42)
+    rows = generate(args.rows, args.bots, rng)
+    started = time.monotonic()
+    written = 0
+    while written < args.rows:
+        batch = [{"level": level, "message": message, "bot_id": bot_id}
+                 for level, message, bot_id in (next(rows) for _ in range(min(args.batch, args.rows - written)))]
+        with app.engine.begin() as conn:
+            conn.execute(insert, batch)
+        written += len(batch)
+    elapsed = time.monotonic() - started
+    # Um termo raro e conhecido para as buscas
+    with app.engine.begin() as conn:
+        conn.execute(insert, [{"level": "error", "message": "Erro ao enviar mensagem para 7777777777: chat not found", "bot_id": 1}])
+    app.engine.dispose()
+    app.read_engine.dispose()
+    return {"rows": args.rows, "seed_seconds": round(elapsed, 1), "seed_rows_per_second": round(args.rows / elapsed),
+            "db_mb": round(os.path.getsize(db_path) / 2 ** 20, 1)}
+
+async def measure(session: aiohttp.ClientSession, url: str, params: dict, repeat: int) -> dict:
+    latencies = []
+    hits = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        async with session.get(url, params=params) as response:
+            hits = len(await response.json())
+        latencies.append(time.perf_counter() - started)
+    return {"hits": hits, "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1)}
+
+async def run_queries(base: str, args) -> dict:
+    queries = {
+        "chat_id_rara": {"q": "7777777777"},
+        "username": {"q": "@user_4242"},
+        "frase_comum": {"q": '"bot was blocked"'},
+        "frase_comum_por_bot": {"q": '"bot was blocked"', "bot_id": 7},
+        "frase_comum_recentes": {"q": '"bot was blocked"', "sort": "recent"},
+        "prefixo": {"q": "Tracebac*", "level": "error"},
+    }
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300)) as session:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                async with session.get(base + "/api/health") as response:
+                    if response.status == 200:
+                        break
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("App não respondeu a tempo")
+            await asyncio.sleep(0.2)
+        return {name: await measure(session, base + "/api/logs/search", params, args.repeat)
+                for name, params in queries.items()}
+
+def like_baseline(db_path: str, repeat: int) -> dict:
+    conn = sqlite3.connect(db_path)
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute("SELECT id FROM logs WHERE message LIKE ? ORDER BY id DESC LIMIT 50", ("%7777777777%",)).fetchall()
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+    return {"p50_ms": round(percentile(latencies, 50) * 1000, 1), "p99_ms": round(percentile(latencies, 99) * 1000, 1)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--bots", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--like-repeat", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8932)
+    parser.add_argument("--db", help="banco já populado (pula a criação dos logs)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_search_")
+    os.symlink(ROOT / "static", os.path.join(workdir, "static"))
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(workdir, "bench.db")
+    env = {"DATABASE_URL": f"sqlite:///{db_path}", "GATEWAY_HEALTH_INTERVAL": "0", "LOG_RETENTION_INTERVAL": "0"}
+    os.environ.update(env)
+    os.chdir(workdir)
+    if args.db:
+        with sqlite3.connect(db_path) as conn:
+            rows = conn.execute("SELECT count(*) FROM logs").fetchone()[0]
+        report = {"rows": rows, "db_mb": round(os.path.getsize(db_path) / 2 ** 20, 1)}
+    else:
+        report = seed(db_path, args)
+    report["db"] = db_path
+
+    process = subprocess.Popen(
+        [sys.executable, "-c", f"import uvicorn, app; uvicorn.run(app.app, host='127.0.0.1', port={args.port}, log_level='warning')"],
+        cwd=workdir, env={**os.environ, "PYTHONPATH": str(ROOT)}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        report["fts5"] = asyncio.run(run_queries(f"http://127.0.0.1:{args.port}", args))
+    finally:
+        process.terminate()
+        process.wait()
+    report["like_chat_id_rara"] = like_baseline(db_path, args.like_repeat)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
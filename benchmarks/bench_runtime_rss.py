@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memória dos bots: processo dedicado por bot x worker multiplexado
+
+Sobe N bots simples contra uma Bot API local (FakeTelegram), espera todos
+fazerem o primeiro getUpdates e mede a RSS somada dos processos em cada modo.
+
+    python benchmarks/bench_runtime_rss.py --bots 50 --workers 1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import rss_kb
+from fake_telegram import FakeTelegram
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BOT_CODE = '''import os
+import telebot
+from telebot import apihelper
+
+bot = telebot.TeleBot("{token}")
+
+@bot.message_handler(commands=['start'])
+def start(message):
+    bot.reply_to(message, "Olá!")
+
+if __name__ == '__main__':
+    apihelper.API_URL = os.environ["TELEGRAM_API_BASE"] + "/bot{{0}}/{{1}}"
+    bot.infinity_polling(timeout=20)
+'''
+
+def token_for(i: int) -> str:
+    return f"{100000 + i}:bench{i:06d}"
+
+def wait_for(stub: FakeTelegram, expected: int, timeout: float) -> float:
+    started = time.monotonic()
+    while stub.seen() < expected:
+        if time.monotonic() - started > timeout:
+            raise RuntimeError(f"Só {stub.seen()} de {expected} bots chegaram ao getUpdates")
+        time.sleep(0.1)
+    return time.monotonic() - started
+
+def run_dedicated(stub: FakeTelegram, bots: int, timeout: float) -> dict:
+    env = {**os.environ, "TELEGRAM_API_BASE": stub.base_url}
+    workdir = tempfile.mkdtemp(prefix="bench_rss_")
+    processes = []
+    try:
+        for i in range(bots):
+            path = os.path.join(workdir, f"bot_{i}.py")
+            with open(path, "w") as f:
+                f.write(BOT_CODE.format(token=token_for(i)))
+            processes.append(subprocess.Popen([sys.executable, path], env=env,
+                                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        elapsed = wait_for(stub, bots, timeout)
+        time.sleep(1)
+        total = sum(rss_kb(p.pid) or 0 for p in processes)
+        return {"mode": "dedicated", "processes": len(processes), "startup_seconds": round(elapsed, 2),
+                "rss_total_kb": total, "rss_per_bot_kb": round(total / bots, 1)}
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.wait()
+
+def run_shared(stub: FakeTelegram, bots: int, workers: int, timeout: float) -> dict:
+    env = {**os.environ, "TELEGRAM_API_BASE": stub.base_url, "PYTHONUNBUFFERED": "1"}
+    processes = [
+        subprocess.Popen([sys.executable, str(ROOT / "bot_worker.py")], env=env,
+                         stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(workers)
+    ]
+    try:
+        for i in range(bots):
+            command = {"op": "start", "bot_id": i, "code": BOT_CODE.format(token=token_for(i))}
+            worker = processes[i % workers]
+            worker.stdin.write((json.dumps(command) + "\n").encode())
+            worker.stdin.flush()
+        elapsed = wait_for(stub, bots, timeout)
+        time.sleep(1)
+        total = sum(rss_kb(p.pid) or 0 for p in processes)
+        return {"mode": "shared", "processes": len(processes), "startup_seconds": round(elapsed, 2),
+                "rss_total_kb": total, "rss_per_bot_kb": round(total / bots, 1)}
+    finally:
+        for p in processes:
+            p.stdin.close()
+        for p in processes:
+            try:
+                p.wait(10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bots", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    results = []
+    for run in (lambda stub: run_dedicated(stub, args.bots, args.timeout),
+                lambda stub: run_shared(stub, args.bots, args.workers, args.timeout)):
+        stub = FakeTelegram(max_poll=1.0)
+        try:
+            results.append(run(stub))
+        finally:
+            stub.close()
+
+    dedicated, shared = results
+    print(json.dumps({
+        "bots": args.bots,
+        "results": results,
+        "memory_ratio": round(dedicated["rss_total_kb"] / max(shared["rss_total_kb"], 1), 2),
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serialização das listagens: tempo de cada endpoint chamado direto no ASGI
+
+Num banco novo com `--rows` bots, gateways, logs e agregados de receita,
+chama cada listagem (sem rede, sem cache de respostas e sem gzip) e mede
+p50/p99, o tamanho e o sha256 do corpo. O hash permite conferir que duas
+versões do código devolvem exatamente o mesmo JSON:
+
+    git worktree add /tmp/farm-antes <commit>
+    python benchmarks/bench_serialization.py --app-dir /tmp/farm-antes --label antes
+    python benchmarks/bench_serialization.py --label depois
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ENDPOINTS = {
+    "logs_100": ("/api/logs", "limit=100"),
+    "logs_5000": ("/api/logs", "limit=5000"),
+    "logs_search": ("/api/logs/search", "q=pagamento&sort=recent&limit=500"),
+    "bots": ("/api/bots", "limit=5000"),
+    "gateways": ("/api/gateways", "limit=5000"),
+    "revenue": ("/api/revenue", "limit=5000"),
+}
+
+def seed(app, rows: int):
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    with app.engine.begin() as conn:
+        conn.execute(app.Gateway.__table__.insert(), [
+            {"name": f"gateway-{i}", "type": "BTCPay Server", "api_url": f"https://pay{i}.example.com/api",
+             "api_key": "k", "status": "Ativo", "created_at": start + timedelta(seconds=i)}
+            for i in range(rows)
+        ])
+        conn.execute(app.Bot.__table__.insert(), [
+            {"name": f"bot-{i}", "token": f"{1000000 + i}:AAH{i:030d}", "code": "x = 1", "is_active": i % 3 == 0,
+             "gateway_id": i % rows + 1, "runtime": "dedicated", "created_at": start + timedelta(seconds=i),
+             "updated_at": start + timedelta(minutes=i)}
+            for i in range(rows)
+        ])
+        conn.execute(app.Log.__table__.insert(), [
+            {"level": rng.choice(["info", "success", "error"]), "bot_id": rng.randrange(1, rows + 1),
+             "timestamp": start + timedelta(milliseconds=37 * i),
+             "message": rng.choice([f"Pagamento de {rng.randrange(1, 500)}.90 BRL recebido pelo bot 'bot-{i % rows}'",
+                                    f"Comando /start recebido de @user_{i} (chat {rng.randrange(10 ** 9, 10 ** 10)})",
+                                    f"Bot não respondeu: Forbidden: bot was blocked by the user {i}"])}
+            for i in range(rows)
+        ])
+        conn.execute(app.RevenueRollup.__table__.insert(), [
+            {"bucket": "day", "dimension": "bot", "key_id": i % 50 + 1, "bucket_start": datetime(2024, 1, 1) + timedelta(days=i // 50),
+             "revenue": round(rng.uniform(1, 5000), 2), "transactions": rng.randrange(1, 300)}
+            for i in range(rows)
+        ])
+
+async def call(app, path: str, query: str) -> bytes:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    chunks = []
+    status = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    if status["code"] != 200:
+        raise RuntimeError(f"{path}?{query}: HTTP {status['code']}")
+    return b"".join(chunks)
+
+async def measure(app, repeat: int) -> dict:
+    results = {}
+    for name, (path, query) in ENDPOINTS.items():
+        body = await call(app, path, query)  # aquecimento
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = await call(app, path, query)
+            latencies.append(time.perf_counter() - started)
+        results[name] = {
+            "items": len(json.loads(body)),
+            "bytes": len(body),
+            "sha256": hashlib.sha256(body).hexdigest()[:16],
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        }
+    return results
+
+def run(args) -> dict:
+    """Executado no subprocesso, com o app da versão escolhida no PYTHONPATH"""
+    import app
+    seed(app, args.rows)
+    return asyncio.run(measure(app.app, args.repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=str(ROOT))
+    parser.add_argument("--label", default="atual")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args)))
+        return
+
+    app_dir = Path(args.app_dir).resolve()
+    workdir = tempfile.mkdtemp(prefix="bench_serialization_")
+    os.symlink(app_dir / "static", os.path.join(workdir, "static"))
+    env = {**os.environ, "PYTHONPATH": str(app_dir), "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+           "RESPONSE_CACHE_MAX_BYTES": "0", "GATEWAY_HEALTH_INTERVAL": "0", "LOG_RETENTION_INTERVAL": "0"}
+    output = subprocess.run(
+        [sys.executable, __file__, "--run", "--rows", str(args.rows), "--repeat", str(args.repeat)],
+        cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+    ).stdout
+    results = json.loads(output.decode().strip().splitlines()[-1])
+    print(json.dumps({"label": args.label, "rows": args.rows, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Leitura e escrita simultâneas no SQLite: perfil "compat" x "performance"
+
+Para cada perfil (STORAGE_PROFILE), num banco novo, threads leitoras paginam
+os logs como o dashboard (/api/logs) enquanto threads escritoras gravam um
+log por commit (como add_log no modo sync). Mede latência das leituras,
+vazão das escritas e erros ("database is locked").
+
+    python benchmarks/bench_storage.py --readers 16 --writers 4 --duration 10
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def run_profile(args) -> dict:
+    """Executado no subprocesso: o perfil é lido na importação do app"""
+    sys.path.insert(0, str(ROOT))
+    import app
+    from sqlalchemy import select
+
+    db = app.SessionLocal()
+    try:
+        db.add_all(app.Log(level="info", message=f"seed {i}", bot_id=i % 50) for i in range(args.seed_logs))
+        db.commit()
+    finally:
+        db.close()
+
+    deadline = time.monotonic() + args.duration
+    reads, writes = [], []
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+
+    def reader():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            db = app.SessionLocal()
+            try:
+                query = select(app.Log).where(app.Log.bot_id == random.randrange(50))
+                db.scalars(query.order_by(app.Log.timestamp.desc(), app.Log.id.desc()).limit(50)).all()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    reads.append(elapsed)
+            except Exception:
+                with lock:
+                    errors["read"] += 1
+            finally:
+                db.close()
+
+    def writer(n: int):
+        i = 0
+        while time.monotonic() < deadline:
+            i += 1
+            started = time.perf_counter()
+            db = app.SessionLocal()
+            try:
+                db.add(app.Log(level="info", message=f"write {n}-{i}", bot_id=i % 50))
+                db.commit()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    writes.append(elapsed)
+            except Exception:
+                with lock:
+                    errors["write"] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(args.writers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    def summary(samples: list, errors: int) -> dict:
+        return {
+            "ops": len(samples),
+            "errors": errors,
+            "ops_per_second": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        }
+
+    return {"profile": app.STORAGE_PROFILE, "reads": summary(reads, errors["read"]),
+            "writes": summary(writes, errors["write"])}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--seed-logs", type=int, default=20000)
+    parser.add_argument("--profiles", default="compat,performance")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_profile(args)))
+        return
+
+    results = []
+    for profile in args.profiles.split(","):
+        workdir = tempfile.mkdtemp(prefix="bench_storage_")
+        os.symlink(ROOT / "static", os.path.join(workdir, "static"))
+        env = {**os.environ, "STORAGE_PROFILE": profile, "LOG_WRITER_MODE": "sync",
+               "DATABASE_URL": f"sqlite:///{workdir}/bench.db"}
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", profile, "--readers", str(args.readers), "--writers", str(args.writers),
+             "--duration", str(args.duration), "--seed-logs", str(args.seed_logs)],
+            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+        ).stdout
+        results.append(json.loads(output.decode().strip().splitlines()[-1]))
+
+    print(json.dumps({"readers": args.readers, "writers": args.writers, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
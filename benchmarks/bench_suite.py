@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suíte de carga do FarmMoneyRich, toda local (sem Telegram nem gateways reais)
+
+Cada cenário sobe o app (uvicorn, um processo) num diretório temporário com
+banco novo, com os bots apontados para a Bot API falsa (fake_telegram.py) e
+os gateways para o gateway falso (fake_gateway.py):
+
+- dashboard_reads: dashboards abertos lendo stats, bots, gateways, logs e
+  receita, revalidando com ETag como o navegador;
+- log_storm: rajada de POST /api/logs com o painel lendo ao mesmo tempo;
+  confere quantos logs aceitos chegaram ao banco;
+- bot_toggle: start, restart e stop em lote e toggle individual de N bots,
+  medindo até todos estarem (de novo) no getUpdates;
+- bot_messages: mensagens para cada bot pela Bot API falsa, latência até a
+  resposta e vazão total e por bot;
+- gateway_checks: teste de conexão dos gateways (test-all e individual).
+
+Latências p50/p95/p99, vazão e RSS (app e processos filhos, como os bots)
+vão para um relatório JSON. Para comparar versões, gere um relatório de cada
+e use compare.py:
+
+    python benchmarks/bench_suite.py --output depois.json
+    git worktree add /tmp/farm-antes <commit>
+    python benchmarks/bench_suite.py --app-dir /tmp/farm-antes --label antes --output antes.json
+    python benchmarks/compare.py antes.json depois.json
+
+`--quick` reduz tamanhos e durações (verificação rápida); `--scenarios`
+escolhe os cenários. Os bots usam o bot_example.py (`--bot-code example`)
+ou um eco mínimo (`--bot-code minimal`).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import aiohttp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import latency_summary, process_tree, rss_kb
+from fake_gateway import FakeGateway
+from fake_telegram import FakeTelegram
+
+ROOT = Path(__file__).resolve().parent.parent
+
+REPORT_VERSION = 1
+
+# Tamanhos (completo, --quick) dos parâmetros não informados na linha de comando
+DEFAULTS = {
+    "duration": (20, 5),
+    "clients": (100, 20),
+    "bots": (50, 10),
+    "seed_logs": (2000, 200),
+    "storm_writers": (50, 10),
+    "storm_readers": (10, 3),
+    "toggle_bots": (20, 3),
+    "message_bots": (10, 2),
+    "messages": (50, 10),
+    "message_rate": (10, 10),
+    "gateways": (50, 10),
+    "gateway_rounds": (5, 2),
+}
+
+DASHBOARD_READS = ["/api/stats", "/api/bots", "/api/gateways", "/api/logs?limit=50", "/api/revenue?limit=100"]
+
+MESSAGE_TEXTS = ["/start", "/help", "/status", "/info", "oi", "obrigado", "mensagem de teste"]
+
+# Vale para o bot_example.py e para versões do painel que ainda não repassam TELEGRAM_API_BASE
+API_BASE_PREAMBLE = '''import os as _bench_os
+from telebot import apihelper as _bench_apihelper
+if _bench_os.getenv("TELEGRAM_API_BASE"):
+    _bench_apihelper.API_URL = _bench_os.environ["TELEGRAM_API_BASE"].rstrip("/") + "/bot{0}/{1}"
+'''
+
+MINIMAL_BOT = '''import telebot
+
+bot = telebot.TeleBot("{token}")
+
+@bot.message_handler(func=lambda message: True)
+def echo(message):
+    bot.reply_to(message, message.text)
+
+if __name__ == '__main__':
+    bot.infinity_polling(timeout=20)
+'''
+
+def bot_code(kind: str, token: str) -> str:
+    if kind == "minimal":
+        return API_BASE_PREAMBLE + MINIMAL_BOT.replace("{token}", token)
+    source = (ROOT / "bot_example.py").read_text(encoding="utf-8")
+    # O token fica no código, como no exemplo: cada bot com o seu
+    return API_BASE_PREAMBLE + re.sub(r'BOT_TOKEN = "[^"]*"', f'BOT_TOKEN = "{token}"', source, count=1)
+
+def token_for(i: int) -> str:
+    return f"{700000 + i}:AAbench{i:06d}"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def git_commit(app_dir: Path) -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "-C", str(app_dir), "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "-C", str(app_dir), "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+dirty" if dirty else "")
+
+class RSSSampler:
+    """Amostra a RSS do app e da árvore de processos (bots, workers) a cada 0,5 s"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.app = []
+        self.total = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(0.5):
+            app = rss_kb(self.pid)
+            if app is None:
+                continue
+            self.app.append(app)
+            self.total.append(sum(rss_kb(pid) or 0 for pid in process_tree(self.pid)))
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        return {
+            "app_peak_kb": max(self.app, default=0),
+            "app_end_kb": self.app[-1] if self.app else 0,
+            "total_peak_kb": max(self.total, default=0),
+            "total_end_kb": self.total[-1] if self.total else 0,
+        }
+
+class AppProcess:
+    """O app num subprocesso, com banco novo num diretório temporário"""
+
+    def __init__(self, app_dir: Path, env: dict):
+        self.workdir = tempfile.mkdtemp(prefix="bench_suite_")
+        os.symlink(app_dir / "static", os.path.join(self.workdir, "static"))
+        self.db_path = os.path.join(self.workdir, "bench.db")
+        self.port = free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        env = {**os.environ, "PYTHONPATH": str(app_dir), "DATABASE_URL": f"sqlite:///{self.db_path}",
+               "GATEWAY_HEALTH_INTERVAL": "0", "LOG_RETENTION_INTERVAL": "0", **env}
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", f"import uvicorn, app; uvicorn.run(app.app, host='127.0.0.1', port={self.port}, log_level='warning')"],
+            cwd=self.workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        self.rss = RSSSampler(self.process.pid)
+
+    def stop(self) -> dict:
+        rss = self.rss.stop()
+        # Os bots continuam vivos quando o app sai: encerrar a árvore inteira
+        tree = process_tree(self.process.pid)
+        self.process.terminate()
+        try:
+            self.process.wait(15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            alive = [pid for pid in tree[1:] if rss_kb(pid) is not None]
+            for pid in alive:
+                try:
+                    os.kill(pid, sig)
+                except ProcessLookupError:
+                    pass
+            if alive and sig == signal.SIGTERM:
+                time.sleep(1)
+        return rss
+
+    def count_logs(self, pattern: str) -> int:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            return conn.execute("SELECT count(*) FROM logs WHERE message LIKE ?", (pattern,)).fetchone()[0]
+
+class Recorder:
+    """Latências por grupo (ex.: "GET /api/stats"), com um total opcional"""
+
+    def __init__(self):
+        self.samples = {}
+        self.started = time.monotonic()
+
+    def add(self, group: str, elapsed: Optional[float]):
+        data = self.samples.setdefault(group, {"latencies": [], "errors": 0, "started": time.monotonic()})
+        if elapsed is None:
+            data["errors"] += 1
+        else:
+            data["latencies"].append(elapsed)
+
+    async def request(self, session: aiohttp.ClientSession, group: str, method: str, url: str,
+                      total: Optional[str] = None, **kwargs):
+        """Faz a requisição e devolve (status, headers, corpo JSON ou None); None em erro"""
+        started = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                body = await response.read()
+                status, headers = response.status, response.headers
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status = None
+        elapsed = time.perf_counter() - started if status is not None and status < 400 else None
+        for name in filter(None, (group, total)):
+            self.add(name, elapsed)
+        if elapsed is None:
+            return None
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+        return status, headers, payload
+
+    def summary(self) -> dict:
+        now = time.monotonic()
+        return {group: latency_summary(data["latencies"], data["errors"], now - data["started"])
+                for group, data in sorted(self.samples.items())}
+
+class Context:
+    """Estado de um cenário: app, Bot API falsa, sessão HTTP e parâmetros"""
+
+    def __init__(self, args, app: AppProcess, telegram: FakeTelegram, session: aiohttp.ClientSession):
+        self.args = args
+        self.app = app
+        self.base = app.base
+        self.telegram = telegram
+        self.session = session
+        self.values = {}
+
+    async def post(self, path: str, payload: dict) -> dict:
+        async with self.session.post(self.base + path, json=payload) as response:
+            if response.status >= 400:
+                raise RuntimeError(f"POST {path}: HTTP {response.status} {await response.text()}")
+            return await response.json()
+
+    async def wait_ready(self, timeout: float = 60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.app.process.poll() is not None:
+                raise RuntimeError("O app encerrou durante a inicialização")
+            try:
+                async with self.session.get(self.base + "/api/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+        raise RuntimeError("App não respondeu a tempo")
+
+    async def create_bots(self, count: int, code_kind: Optional[str], gateway_id: Optional[int] = None) -> tuple:
+        """Cadastra `count` bots (sem ativar); devolve (ids, tokens)"""
+        ids, tokens = [], []
+        for start in range(0, count, 10):
+            payloads = []
+            for i in range(start, min(start + 10, count)):
+                token = token_for(i)
+                payload = {"name": f"bench-{i}", "token": token, "gateway_id": gateway_id,
+                           "code": bot_code(code_kind, token) if code_kind else "x = 1"}
+                if self.args.runtime:
+                    payload["runtime"] = self.args.runtime
+                payloads.append(payload)
+                tokens.append(token)
+            ids += [bot["id"] for bot in await asyncio.gather(*(self.post("/api/bots", p) for p in payloads))]
+        return ids, tokens
+
+    async def bulk(self, action: str, ids: List[int]) -> Optional[float]:
+        """Operação em lote; devolve os segundos até o job terminar (None se falhar)"""
+        started = time.monotonic()
+        async with self.session.post(self.base + "/api/bots/bulk", json={"action": action, "bot_ids": ids}) as response:
+            if response.status >= 400:
+                return None
+            job = await response.json()
+        deadline = started + self.args.timeout
+        while time.monotonic() < deadline:
+            async with self.session.get(f"{self.base}/api/bots/bulk/{job['job_id']}") as response:
+                job = await response.json()
+            if job.get("finished_at"):
+                failed = job["progress"].get("failed", 0)
+                self.values[f"bulk_{action}_failed"] = failed
+                return round(time.monotonic() - started, 3)
+            await asyncio.sleep(0.05)
+        return None
+
+    async def wait_polling(self, tokens: List[str], since: float, fresh: bool = False) -> Optional[float]:
+        elapsed = await asyncio.to_thread(self.telegram.wait_polling, tokens, since, self.args.timeout, fresh)
+        return None if elapsed is None else round(elapsed, 3)
+
+# === CENÁRIOS ===
+async def dashboard_reads(ctx: Context) -> dict:
+    gateway = await ctx.post("/api/gateways", {"name": "bench", "type": "BTCPay Server",
+                                                "api_url": "http://127.0.0.1:1/", "api_key": "k"})
+    bot_ids, _ = await ctx.create_bots(ctx.args.bots, None, gateway["id"])
+    for start in range(0, ctx.args.seed_logs, 20):
+        await asyncio.gather(*(ctx.post("/api/logs", {"level": "info", "message": f"seed {i}", "bot_id": random.choice(bot_ids)})
+                               for i in range(start, min(start + 20, ctx.args.seed_logs))))
+    for i in range(0, 200, 20):
+        await asyncio.gather(*(ctx.post("/api/transactions", {"bot_id": random.choice(bot_ids), "amount": 9.9,
+                                                              "external_id": f"seed-{j}"})
+                               for j in range(i, i + 20)))
+
+    recorder = Recorder()
+    deadline = time.monotonic() + ctx.args.duration
+
+    async def dashboard():
+        # O navegador revalida com If-None-Match (Cache-Control: no-cache)
+        etags = {}
+        while time.monotonic() < deadline:
+            path = random.choice(DASHBOARD_READS)
+            headers = {"If-None-Match": etags[path]} if path in etags else {}
+            result = await recorder.request(ctx.session, f"GET {path.split('?')[0]}", "GET", ctx.base + path,
+                                            total="reads", headers=headers)
+            if result and result[1].get("ETag"):
+                etags[path] = result[1]["ETag"]
+
+    await asyncio.gather(*(dashboard() for _ in range(ctx.args.clients)))
+    return recorder.summary()
+
+async def log_storm(ctx: Context) -> dict:
+    recorder = Recorder()
+    deadline = time.monotonic() + ctx.args.duration
+    accepted = 0
+
+    async def writer(i: int):
+        nonlocal accepted
+        n = 0
+        while time.monotonic() < deadline:
+            n += 1
+            result = await recorder.request(ctx.session, "POST /api/logs", "POST", ctx.base + "/api/logs",
+                                            json={"level": random.choice(["info", "warning", "error"]),
+                                                  "message": f"storm {i}-{n}: mensagem de carga"})
+            accepted += result is not None
+
+    async def reader():
+        while time.monotonic() < deadline:
+            await recorder.request(ctx.session, "GET /api/logs", "GET", ctx.base + "/api/logs?limit=50")
+            await recorder.request(ctx.session, "GET /api/stats", "GET", ctx.base + "/api/stats")
+
+    await asyncio.gather(*(writer(i) for i in range(ctx.args.storm_writers)), *(reader() for _ in range(ctx.args.storm_readers)))
+
+    # Logs aceitos podem estar na fila da escrita em lote: esperar chegarem ao banco
+    finished = time.monotonic()
+    persisted = 0
+    while time.monotonic() - finished < ctx.args.timeout:
+        persisted = await asyncio.to_thread(ctx.app.count_logs, "storm %")
+        if persisted >= accepted:
+            break
+        await asyncio.sleep(0.2)
+    ctx.values.update(accepted_writes=accepted, persisted_writes=persisted, lost_writes=max(0, accepted - persisted),
+                      flush_seconds=round(time.monotonic() - finished, 3))
+    return recorder.summary()
+
+async def bot_toggle(ctx: Context) -> dict:
+    telegram = ctx.telegram
+    ids, tokens = await ctx.create_bots(ctx.args.toggle_bots, ctx.args.bot_code)
+    recorder = Recorder()
+
+    started = time.monotonic()
+    ctx.values["bulk_start_job_seconds"] = await ctx.bulk("start", ids)
+    ctx.values["bulk_start_polling_seconds"] = await ctx.wait_polling(tokens, started)
+
+    # Uma mensagem por bot: confirma que respondem e fixa o offset de cada processo,
+    # o que permite reconhecer o getUpdates do processo novo após o restart
+    for token in tokens:
+        telegram.push(token, "/start")
+    ctx.values["first_reply_unanswered"] = await asyncio.to_thread(telegram.wait_replies, ctx.args.timeout)
+    telegram.take_latencies()
+
+    # Restart com os bots recebendo mensagens (2 por segundo cada): nenhuma pode se perder
+    restarting = True
+
+    async def traffic():
+        while restarting:
+            for token in tokens:
+                telegram.push(token, "/ping")
+            await asyncio.sleep(0.5)
+
+    pusher = asyncio.create_task(traffic())
+    started = time.monotonic()
+    ctx.values["bulk_restart_job_seconds"] = await ctx.bulk("restart", ids)
+    ctx.values["bulk_restart_polling_seconds"] = await ctx.wait_polling(tokens, started, fresh=True)
+    restarting = False
+    await pusher
+    unanswered = await asyncio.to_thread(telegram.wait_replies, ctx.args.timeout)
+    ctx.values["restart_unanswered_messages"] = unanswered
+    metrics = {"reply_latency_during_restart": latency_summary(telegram.take_latencies(), unanswered,
+                                                                time.monotonic() - started)}
+
+    ctx.values["bulk_stop_job_seconds"] = await ctx.bulk("stop", ids)
+
+    # Toggle individual, todos ao mesmo tempo: liga e depois desliga
+    started = time.monotonic()
+    await asyncio.gather(*(recorder.request(ctx.session, "POST /api/bots/{id}/toggle (start)", "POST",
+                                            f"{ctx.base}/api/bots/{bot_id}/toggle") for bot_id in ids))
+    ctx.values["toggle_start_polling_seconds"] = await ctx.wait_polling(tokens, started, fresh=True)
+    await asyncio.gather(*(recorder.request(ctx.session, "POST /api/bots/{id}/toggle (stop)", "POST",
+                                            f"{ctx.base}/api/bots/{bot_id}/toggle") for bot_id in ids))
+    return {**metrics, **recorder.summary()}
+
+async def bot_messages(ctx: Context) -> dict:
+    telegram = ctx.telegram
+    ids, tokens = await ctx.create_bots(ctx.args.message_bots, ctx.args.bot_code)
+    started = time.monotonic()
+    ctx.values["bulk_start_job_seconds"] = await ctx.bulk("start", ids)
+    ctx.values["bulk_start_polling_seconds"] = await ctx.wait_polling(tokens, started)
+    replies_before = dict(telegram.replies)
+
+    # `message_rate` mensagens por segundo para cada bot (0 = todas de uma vez)
+    started = time.monotonic()
+    interval = 1 / ctx.args.message_rate if ctx.args.message_rate else 0
+    for n in range(ctx.args.messages):
+        for token in tokens:
+            telegram.push(token, MESSAGE_TEXTS[n % len(MESSAGE_TEXTS)])
+        if interval:
+            await asyncio.sleep(max(0.0, started + (n + 1) * interval - time.monotonic()))
+    unanswered = await asyncio.to_thread(telegram.wait_replies, ctx.args.timeout)
+    elapsed = time.monotonic() - started
+
+    per_bot = sorted((telegram.replies.get(token, 0) - replies_before.get(token, 0)) / elapsed for token in tokens)
+    answered = ctx.args.messages * len(tokens) - unanswered
+    ctx.values.update(
+        messages_sent=ctx.args.messages * len(tokens),
+        unanswered_messages=unanswered,
+        messages_per_second=round(answered / elapsed, 1),
+        per_bot_min_messages_per_second=round(per_bot[0], 2) if per_bot else 0.0,
+        per_bot_median_messages_per_second=round(per_bot[len(per_bot) // 2], 2) if per_bot else 0.0,
+    )
+    return {"reply_latency": latency_summary(telegram.take_latencies(), unanswered, elapsed)}
+
+async def gateway_checks(ctx: Context) -> dict:
+    fake = FakeGateway(delay_ms=ctx.args.gateway_delay_ms, failure_rate=ctx.args.gateway_failure_rate)
+    try:
+        ids = []
+        for start in range(0, ctx.args.gateways, 10):
+            gateways = await asyncio.gather(*(ctx.post("/api/gateways", {
+                "name": f"gateway-{i}", "type": "BTCPay Server", "api_url": f"{fake.base_url}/gw/{i}", "api_key": "k",
+            }) for i in range(start, min(start + 10, ctx.args.gateways))))
+            ids += [gateway["id"] for gateway in gateways]
+
+        # Testes individuais (antes do test-all, que deixaria os resultados em cache):
+        # a resposta volta na hora e a verificação segue em segundo plano
+        recorder = Recorder()
+        started = time.monotonic()
+        await asyncio.gather(*(recorder.request(ctx.session, "POST /api/gateways/{id}/test", "POST",
+                                                f"{ctx.base}/api/gateways/{gateway_id}/test") for gateway_id in ids))
+        while fake.stats()["requests"] < len(ids) and time.monotonic() - started < ctx.args.timeout:
+            await asyncio.sleep(0.05)
+        ctx.values["individual_checks_seconds"] = round(time.monotonic() - started, 3)
+
+        for _ in range(ctx.args.gateway_rounds):
+            await recorder.request(ctx.session, "POST /api/gateways/test-all", "POST",
+                                   ctx.base + "/api/gateways/test-all?force=true")
+        ctx.values["gateway_requests"] = fake.stats()["requests"]
+        return recorder.summary()
+    finally:
+        fake.close()
+
+SCENARIOS = {
+    "dashboard_reads": dashboard_reads,
+    "log_storm": log_storm,
+    "bot_toggle": bot_toggle,
+    "bot_messages": bot_messages,
+    "gateway_checks": gateway_checks,
+}
+
+async def run_in_app(name: str, args, app: AppProcess, telegram: FakeTelegram) -> tuple:
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        ctx = Context(args, app, telegram, session)
+        await ctx.wait_ready()
+        started = time.monotonic()
+        metrics = await SCENARIOS[name](ctx)
+        return metrics, ctx.values, round(time.monotonic() - started, 1)
+
+def run_scenario(name: str, args) -> dict:
+    telegram = FakeTelegram()
+    app = AppProcess(Path(args.app_dir).resolve(), {"TELEGRAM_API_BASE": telegram.base_url})
+    try:
+        metrics, values, duration = asyncio.run(run_in_app(name, args, app, telegram))
+    finally:
+        rss = app.stop()
+        telegram.close()
+    return {"duration_seconds": duration, "metrics": metrics, "values": values, "rss_kb": rss}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=str(ROOT))
+    parser.add_argument("--label", default="atual")
+    parser.add_argument("--output", help="arquivo do relatório JSON (padrão: só imprime)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--quick", action="store_true", help="tamanhos e durações reduzidos")
+    parser.add_argument("--bot-code", choices=["example", "minimal"], default="example")
+    parser.add_argument("--runtime", choices=["dedicated", "shared"], help="runtime dos bots (padrão: o do app)")
+    parser.add_argument("--gateway-delay-ms", type=float, default=50)
+    parser.add_argument("--gateway-failure-rate", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=120, help="limite (segundos) de cada espera")
+    parser.add_argument("--seed", type=int, default=42)
+    for name in DEFAULTS:
+        parser.add_argument("--" + name.replace("_", "-"), type=float if name == "duration" else int)
+    args = parser.parse_args()
+    for name, (full, quick) in DEFAULTS.items():
+        if getattr(args, name) is None:
+            setattr(args, name, quick if args.quick else full)
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(unknown)}")
+
+    random.seed(args.seed)
+    report = {
+        "report_version": REPORT_VERSION,
+        "label": args.label,
+        "commit": git_commit(Path(args.app_dir).resolve()),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "scenarios", "app_dir")},
+        "scenarios": {},
+    }
+    for name in names:
+        print(f"[{name}]", file=sys.stderr, flush=True)
+        report["scenarios"][name] = run_scenario(name, args)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Relatório salvo em {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
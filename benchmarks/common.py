@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Utilitários compartilhados pelos benchmarks do FarmMoneyRich
+"""
+
+import os
+from typing import List, Optional
+
+def rss_kb(pid: int) -> Optional[int]:
+    """Memória residente de um processo, em KB (Linux)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def process_tree(pid: int) -> List[int]:
+    """O processo e todos os seus descendentes (Linux)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil por interpolação linear (p entre 0 e 100)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+def latency_summary(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Vazão e p50/p95/p99 (ms) de um grupo de operações"""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
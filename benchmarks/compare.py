@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara dois relatórios do bench_suite.py (ex.: antes e depois de um commit)
+
+Para cada cenário mostra vazão, latências, valores medidos e RSS lado a lado,
+com a variação percentual. Variações piores que `--threshold` (%) são
+marcadas; com `--fail-on-regression` o script sai com código 1 nesse caso.
+
+    python benchmarks/compare.py antes.json depois.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+def direction(name: str) -> int:
+    """+1 quando maior é melhor, -1 quando menor é melhor, 0 quando é só informativo"""
+    if name == "rps" or name.endswith("_per_second"):
+        return 1
+    if name == "errors" or name.endswith(("_ms", "_seconds", "_kb", "_failed")) or name.startswith("lost_") or "unanswered" in name:
+        return -1
+    return 0
+
+def compare(name: str, before, after, threshold: float) -> tuple:
+    """(linha formatada, piorou?)"""
+    if before is None or after is None:
+        return f"  {name:<44} {fmt(before):>12} {fmt(after):>12}  {'(sem dado)':>9}", False
+    sign = direction(name)
+    if before:
+        change = (after - before) / abs(before) * 100
+        delta = f"{change:+.1f}%"
+    else:
+        change = 0.0 if after == before else float("inf") * (1 if after > before else -1)
+        delta = "=" if after == before else "novo"
+    worse = sign != 0 and after != before and (sign * change < -threshold)
+    better = sign != 0 and after != before and (sign * change > threshold)
+    mark = "  PIOR" if worse else ("  melhor" if better else "")
+    return f"  {name:<44} {fmt(before):>12} {fmt(after):>12}  {delta:>9}{mark}", worse
+
+def fmt(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return str(value)
+
+def header(report: dict) -> str:
+    return f"{report.get('label')} ({report.get('commit') or 'sem commit'}, {report.get('created_at')})"
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="variação (%%) a partir da qual algo conta como pior/melhor")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"antes:  {header(before)}")
+    print(f"depois: {header(after)}")
+    if before.get("params", {}).get("quick") != after.get("params", {}).get("quick"):
+        print("aviso: um relatório usou --quick e o outro não; os números não são comparáveis")
+
+    regressions = []
+    for scenario in [name for name in after["scenarios"] if name in before["scenarios"]]:
+        old, new = before["scenarios"][scenario], after["scenarios"][scenario]
+        print(f"\n[{scenario}]")
+        for group in sorted(set(old.get("metrics", {})) | set(new.get("metrics", {}))):
+            old_group = old.get("metrics", {}).get(group) or {}
+            new_group = new.get("metrics", {}).get(group) or {}
+            print(f" {group}")
+            for key in ("rps", "p50_ms", "p95_ms", "p99_ms", "errors"):
+                line, worse = compare(key, old_group.get(key), new_group.get(key), args.threshold)
+                print(line)
+                if worse:
+                    regressions.append(f"{scenario} / {group} / {key}")
+        for section in ("values", "rss_kb"):
+            keys = sorted(set(old.get(section, {})) | set(new.get(section, {})))
+            if keys:
+                print(f" {section}")
+            for key in keys:
+                line, worse = compare(key, old.get(section, {}).get(key), new.get(section, {}).get(key), args.threshold)
+                print(line)
+                if worse:
+                    regressions.append(f"{scenario} / {key}")
+
+    skipped = sorted(set(before["scenarios"]) ^ set(after["scenarios"]))
+    if skipped:
+        print(f"\nCenários presentes em só um relatório: {', '.join(skipped)}")
+    if regressions:
+        print(f"\n{len(regressions)} piora(s) acima de {args.threshold:g}%:")
+        for item in regressions:
+            print(f"  - {item}")
+    else:
+        print(f"\nNenhuma piora acima de {args.threshold:g}%")
+    return 1 if regressions and args.fail_on_regression else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
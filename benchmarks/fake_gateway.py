@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gateway de pagamento local, alvo do teste de conexão dos gateways
+
+Responde qualquer caminho com JSON após `delay_ms` (± `jitter_ms`) e, numa
+fração `failure_rate` das requisições, com 503. Cada gateway cadastrado pode
+apontar para um caminho diferente (/gw/1, /gw/2...) do mesmo servidor.
+
+    python benchmarks/fake_gateway.py --port 8082 --delay-ms 80 --failure-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeGateway:
+    def __init__(self, port: int = 0, delay_ms: float = 50, jitter_ms: float = 0, failure_rate: float = 0):
+        self.delay_ms = delay_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(42)
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._handle()
+
+            def do_POST(self):
+                self._handle()
+
+            def do_HEAD(self):
+                self._handle()
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                with fake._lock:
+                    fake.requests += 1
+                    failed = fake._random.random() < fake.failure_rate
+                    fake.failures += failed
+                    delay = max(0.0, fake.delay_ms + fake._random.uniform(-fake.jitter_ms, fake.jitter_ms)) / 1000
+                time.sleep(delay)
+                data = json.dumps({"ok": not failed, "path": self.path}).encode()
+                try:
+                    self.send_response(503 if failed else 200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    if self.command != "HEAD":
+                        self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-gateway", daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "failures": self.failures}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--delay-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--failure-rate", type=float, default=0)
+    args = parser.parse_args()
+    fake = FakeGateway(args.port, args.delay_ms, args.jitter_ms, args.failure_rate)
+    print(f"Gateway falso em {fake.base_url}", flush=True)
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(fake.stats()), flush=True)
+    except KeyboardInterrupt:
+        fake.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bot API do Telegram local, para benchmarks sem rede
+
+Responde getMe, getUpdates (long polling de verdade, com fila e offset por
+token), sendMessage/editMessageText e aceita os demais métodos. Mensagens
+injetadas com `push()` chegam ao bot pelo getUpdates; a resposta do bot
+(sendMessage para o mesmo chat) fecha a medição de latência.
+
+Os bots do painel usam este servidor com TELEGRAM_API_BASE:
+
+    python benchmarks/fake_telegram.py --port 8081
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 python app.py
+
+Rodando sozinho, aceita também POST /_fake/push (token e text, em JSON)
+e GET /_fake/stats.
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, List, Optional
+from urllib.parse import parse_qs
+
+# Métodos que devolvem uma Message
+MESSAGE_METHODS = {"sendMessage", "editMessageText", "sendPhoto", "sendDocument", "sendSticker", "forwardMessage"}
+
+class FakeTelegram:
+    """Bot API em memória; cada getUpdates pendente ocupa uma thread do servidor"""
+
+    def __init__(self, port: int = 0, max_poll: Optional[float] = None):
+        self.max_poll = max_poll
+        self.closed = False
+        self._cond = threading.Condition()
+        self._updates = {}        # token -> updates ainda não confirmados pelo offset
+        self._update_ids = itertools.count(1000)
+        self._message_ids = itertools.count(1)
+        self._chat_ids = itertools.count(10 ** 9)
+        self._pushed = {}         # chat_id -> (token, instante do push)
+        self.latencies = []       # segundos entre o push e a resposta do bot
+        self.replies = {}         # token -> respostas recebidas
+        self.last_poll = {}       # token -> início do último getUpdates
+        self.fresh_poll = {}      # token -> último getUpdates sem offset (processo novo)
+        self.calls = {}           # método -> chamadas
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self._handle()
+
+            def do_POST(self):
+                self._handle()
+
+            def _handle(self):
+                path, _, query = self.path.partition("?")
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                params = {key: values[0] for key, values in parse_qs(query).items()}
+                if body and self.headers.get("Content-Type", "").startswith("application/json"):
+                    params.update(json.loads(body))
+                elif body:
+                    params.update({key: values[0] for key, values in parse_qs(body.decode("utf-8", "replace")).items()})
+
+                if path.startswith("/_fake/"):
+                    status, payload = fake._control(path[len("/_fake/"):], params)
+                else:
+                    # /bot<token>/<método>
+                    _, token, method = path.split("/", 2)
+                    status, payload = 200, {"ok": True, "result": fake._call(token[3:], method, params)}
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Bot encerrado no meio do long polling
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-telegram", daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _call(self, token: str, method: str, params: dict):
+        now = time.monotonic()
+        with self._cond:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getUpdates":
+            return self._get_updates(token, params, now)
+        if method == "getMe":
+            return {"id": int(token.split(":")[0]) if token.split(":")[0].isdigit() else 1,
+                    "is_bot": True, "first_name": "fake", "username": "fake_bot"}
+        if method in MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id") or 0)
+            with self._cond:
+                self.replies[token] = self.replies.get(token, 0) + 1
+                pushed = self._pushed.pop(chat_id, None)
+                if pushed is not None and pushed[0] == token:
+                    self.latencies.append(now - pushed[1])
+                self._cond.notify_all()
+            return {"message_id": next(self._message_ids), "date": int(time.time()), "text": params.get("text", ""),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": 1, "is_bot": True, "first_name": "fake"}}
+        return True
+
+    def _get_updates(self, token: str, params: dict, now: float) -> list:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        if self.max_poll is not None:
+            timeout = min(timeout, self.max_poll)
+        limit = int(params.get("limit") or 100)
+        deadline = now + timeout
+        with self._cond:
+            self.last_poll[token] = now
+            if offset <= 1:
+                # Os update_id começam em 1000: offset vazio ou 1 é de um processo que acabou de subir
+                self.fresh_poll[token] = now
+            self._cond.notify_all()
+            queue = self._updates.setdefault(token, [])
+            queue[:] = [update for update in queue if update["update_id"] >= offset]
+            while not queue and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return queue[:limit]
+
+    def _control(self, action: str, params: dict):
+        if action == "push":
+            return 200, {"chat_id": self.push(params["token"], params.get("text", "/start"))}
+        if action == "stats":
+            return 200, self.stats()
+        return 404, {"error": "ação desconhecida"}
+
+    def push(self, token: str, text: str) -> int:
+        """Entrega uma mensagem ao bot (num chat novo) e devolve o chat_id"""
+        chat_id = next(self._chat_ids)
+        message = {
+            "message_id": next(self._message_ids),
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Bench", "username": f"bench_{chat_id}", "language_code": "pt-br"},
+            "chat": {"id": chat_id, "type": "private", "first_name": "Bench"},
+            "date": int(time.time()),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        with self._cond:
+            self._pushed[chat_id] = (token, time.monotonic())
+            self._updates.setdefault(token, []).append({"update_id": next(self._update_ids), "message": message})
+            self._cond.notify_all()
+        return chat_id
+
+    def seen(self) -> int:
+        """Tokens que já chamaram getUpdates"""
+        with self._cond:
+            return len(self.last_poll)
+
+    def wait_polling(self, tokens: Iterable[str], since: float, timeout: float, fresh: bool = False) -> Optional[float]:
+        """Espera todos os tokens chamarem getUpdates depois de `since`.
+
+        Com `fresh=True` só conta o getUpdates de um processo novo (sem offset),
+        o que separa um bot reiniciado do antigo ainda em long polling.
+        Devolve os segundos desde `since`, ou None se o tempo acabar.
+        """
+        tokens = list(tokens)
+        polls = self.fresh_poll if fresh else self.last_poll
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                times = [polls.get(token) for token in tokens]
+                if all(t is not None and t >= since for t in times):
+                    return max(times, default=since) - since
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(min(remaining, 0.5))
+
+    def wait_replies(self, timeout: float) -> int:
+        """Espera as respostas das mensagens injetadas; devolve quantas ficaram sem resposta"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pushed and time.monotonic() < deadline:
+                self._cond.wait(min(deadline - time.monotonic(), 0.5))
+            return len(self._pushed)
+
+    def take_latencies(self) -> List[float]:
+        with self._cond:
+            latencies, self.latencies = self.latencies, []
+            return latencies
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"bots_polling": len(self.last_poll), "pending_messages": len(self._pushed),
+                    "replies": sum(self.replies.values()), "calls": dict(self.calls)}
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--max-poll", type=float, help="limite (segundos) do long polling")
+    args = parser.parse_args()
+    fake = FakeTelegram(args.port, args.max_poll)
+    print(f"Bot API falsa em {fake.base_url} (TELEGRAM_API_BASE)", flush=True)
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(fake.stats()), flush=True)
+    except KeyboardInterrupt:
+        fake.close()
+
+if __name__ == '__main__':
+    main()
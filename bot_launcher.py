@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ponto de entrada dos bots em processo dedicado
+
+    BOT_TOKEN=... python bot_launcher.py /caminho/do/artefato.bin
+
+Carrega o bytecode já compilado pelo painel (CodeArtifactStore), troca os
+marcadores de token pelas constantes reais, executa o código como `__main__`
+e conversa com o painel pelo descritor BOT_READY_FD: "loaded" quando o bot
+chega ao primeiro getUpdates, "polling" quando a requisição sai e "ready"
+quando ela termina com sucesso. Com
+BOT_GO_FD (reinício sem interrupção) o primeiro getUpdates espera o painel
+liberar, depois que a instância antiga parou de consumir atualizações. É usado tanto no modo `exec` (um interpretador novo
+por bot) quanto pelos filhos do bot_zygote.py e pelo bot_worker.py.
+"""
+
+import importlib.util
+import marshal
+import os
+import sys
+import threading
+import traceback
+import types
+
+# Marcadores aceitos no código dos bots no lugar do token
+TOKEN_PLACEHOLDERS = ("SEU_TOKEN_AQUI", "YOUR_TOKEN_HERE")
+
+def inject_token(code: types.CodeType, token: str) -> types.CodeType:
+    """Substitui os marcadores nas constantes de texto, inclusive de funções e classes aninhadas"""
+    consts = []
+    for const in code.co_consts:
+        if isinstance(const, str):
+            for placeholder in TOKEN_PLACEHOLDERS:
+                const = const.replace(placeholder, token)
+        elif isinstance(const, types.CodeType):
+            const = inject_token(const, token)
+        consts.append(const)
+    return code.replace(co_consts=tuple(consts))
+
+def load_artifact(path: str, token: str = None) -> types.CodeType:
+    """Lê um artefato gravado pelo painel: número mágico do interpretador + marshal"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic = importlib.util.MAGIC_NUMBER
+    if data[:len(magic)] != magic:
+        raise RuntimeError(f"Artefato {path} foi compilado por outra versão do Python")
+    code = marshal.loads(data[len(magic):])
+    return inject_token(code, token) if token else code
+
+def install_ready_hook(ready_fd: int, go_fd: int = None):
+    """Envolve apihelper.get_updates para sinalizar o primeiro polling bem-sucedido"""
+    from telebot import apihelper
+
+    original = apihelper.get_updates
+    pending = ["loaded", "ready"]
+
+    def notify(message: str, close: bool = False):
+        try:
+            os.write(ready_fd, message.encode() + b"\n")
+            if close:
+                os.close(ready_fd)
+        except OSError:
+            pass
+
+    def get_updates(*args, **kwargs):
+        if pending and pending[0] == "loaded":
+            pending.pop(0)
+            notify("loaded")
+            if go_fd is not None:
+                # Bloqueia até o painel liberar (um byte ou o pipe fechado)
+                try:
+                    os.read(go_fd, 1)
+                    os.close(go_fd)
+                except OSError:
+                    pass
+            notify("polling")
+        result = original(*args, **kwargs)
+        if pending:
+            pending.pop()
+            notify("ready", close=True)
+        return result
+
+    apihelper.get_updates = get_updates
+
+def configure_api_base():
+    """Permite apontar os bots para outro servidor da Bot API (ex.: benchmarks)"""
+    if os.getenv("TELEGRAM_API_BASE"):
+        from telebot import apihelper
+        apihelper.API_URL = os.environ["TELEGRAM_API_BASE"].rstrip("/") + "/bot{0}/{1}"
+
+def main(path: str, ready_fd: int = None, go_fd: int = None) -> int:
+    """Roda o bot e devolve o código de saída"""
+    try:
+        compiled = load_artifact(path, os.getenv("BOT_TOKEN"))
+        if ready_fd is not None:
+            install_ready_hook(ready_fd, go_fd)
+        configure_api_base()
+        
+        module = types.ModuleType("__main__")
+        module.__file__ = compiled.co_filename
+        sys.modules["__main__"] = module
+        sys.argv = [compiled.co_filename]
+        exec(compiled, module.__dict__)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    return 0
+
+def join_threads():
+    """Espera threads não-daemon, como o interpretador faria ao sair"""
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join()
+
+if __name__ == '__main__':
+    ready_fd = os.getenv("BOT_READY_FD")
+    go_fd = os.getenv("BOT_GO_FD")
+    sys.exit(main(sys.argv[1], int(ready_fd) if ready_fd else None, int(go_fd) if go_fd else None))
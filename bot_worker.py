@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Worker multiplexado do FarmMoneyRich
+
+Hospeda vários bots num único processo asyncio, em vez de um interpretador
+por bot. O painel (app.py) envia comandos em JSON, um por linha, pelo stdin:
+
+    {"op": "start", "bot_id": 1, "artifact": "/caminho/artefato.bin", "token": "..."}
+    {"op": "start", "bot_id": 1, "code": "..."}
+    {"op": "stop", "bot_id": 1}
+
+e recebe pelo stdout os eventos de cada bot, também um JSON por linha:
+started, polling (primeiro getUpdates enviado), ready (primeiro getUpdates
+bem-sucedido), failed, stopped e log.
+
+Cada bot é carregado no seu próprio módulo, sem executar o bloco
+`if __name__ == '__main__'`. O worker busca as atualizações de todos os bots
+com o cliente assíncrono do pyTelegramBotAPI e executa os handlers num pool
+de threads compartilhado: um handler lento ou com erro afeta só o seu bot.
+Código que bloqueia na importação (ex.: bot.polling() fora do `if __name__`)
+não é compatível e deve usar o modo dedicado.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import traceback
+import types as pytypes
+from concurrent.futures import ThreadPoolExecutor
+
+import bot_launcher
+import telebot
+from telebot import apihelper, asyncio_helper, types
+from telebot.async_telebot import AsyncTeleBot
+
+LOAD_TIMEOUT = float(os.getenv("BOT_WORKER_LOAD_TIMEOUT", "10"))
+HANDLER_THREADS = int(os.getenv("BOT_WORKER_HANDLER_THREADS", "32"))
+POLL_TIMEOUT = int(os.getenv("BOT_WORKER_POLL_TIMEOUT", "20"))
+
+# Bot em execução no contexto atual (task asyncio ou thread de handler)
+current_bot = contextvars.ContextVar("current_bot", default=None)
+
+class Channel:
+    """Saída do protocolo: um JSON por linha no stdout original do processo"""
+
+    def __init__(self):
+        self._out = os.fdopen(os.dup(1), "wb", buffering=0)
+        self._lock = threading.Lock()
+
+    def send(self, **event):
+        data = (json.dumps(event, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            self._out.write(data)
+
+channel = Channel()
+
+class BotOutput:
+    """Substitui sys.stdout/sys.stderr: cada linha vira um log do bot atual"""
+
+    def __init__(self, level: str):
+        self.level = level
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        *lines, rest = (getattr(self._local, "buffer", "") + text).split("\n")
+        self._local.buffer = rest
+        for line in lines:
+            if line.strip():
+                channel.send(event="log", bot_id=current_bot.get(), level=self.level, line=line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+sys.stdout = BotOutput("info")
+sys.stderr = BotOutput("error")
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s", stream=sys.stderr)
+logger = logging.getLogger("bot_worker")
+
+# Permite apontar todos os bots para outro servidor da Bot API (ex.: benchmarks)
+if os.getenv("TELEGRAM_API_BASE"):
+    apihelper.API_URL = os.environ["TELEGRAM_API_BASE"].rstrip("/") + "/bot{0}/{1}"
+    asyncio_helper.API_URL = apihelper.API_URL
+
+# Cada bot mantém um long polling aberto; 0 = sem limite de conexões
+asyncio_helper.REQUEST_LIMIT = int(os.getenv("BOT_WORKER_MAX_CONNECTIONS", "0"))
+
+executor = ThreadPoolExecutor(max_workers=HANDLER_THREADS, thread_name_prefix="bot-handler")
+
+class HostedBot:
+    """Um bot carregado no worker: módulo isolado + tarefa de polling"""
+
+    def __init__(self, bot_id: int, command: dict):
+        self.bot_id = bot_id
+        self.command = command
+        self.module = None
+        self.bot = None
+        self.task = None
+
+    async def load(self):
+        loop = asyncio.get_running_loop()
+        self.module = pytypes.ModuleType(f"farm_bot_{self.bot_id}")
+        if "artifact" in self.command:
+            # Bytecode compilado pelo painel; o token entra nas constantes
+            compiled = bot_launcher.load_artifact(self.command["artifact"], self.command.get("token"))
+        else:
+            compiled = compile(self.command["code"], f"<bot {self.bot_id}>", "exec")
+        self.module.__file__ = compiled.co_filename
+
+        # A importação roda numa thread para não travar os outros bots
+        context = contextvars.copy_context()
+        await asyncio.wait_for(
+            loop.run_in_executor(executor, context.run, exec, compiled, self.module.__dict__),
+            LOAD_TIMEOUT,
+        )
+
+        candidates = [value for value in vars(self.module).values() if isinstance(value, (telebot.TeleBot, AsyncTeleBot))]
+        preferred = vars(self.module).get("bot")
+        if isinstance(preferred, (telebot.TeleBot, AsyncTeleBot)):
+            self.bot = preferred
+        elif candidates:
+            self.bot = candidates[0]
+        else:
+            raise RuntimeError("Nenhuma instância de TeleBot encontrada no código")
+
+        if isinstance(self.bot, telebot.TeleBot):
+            # Handlers rodam no pool do worker, não num pool próprio do bot
+            self.bot.threaded = False
+
+    async def poll(self):
+        loop = asyncio.get_running_loop()
+        offset = None
+        ready = False
+        errors = 0
+        channel.send(event="polling", bot_id=self.bot_id)
+        while True:
+            try:
+                updates = await asyncio_helper.get_updates(
+                    self.bot.token, offset=offset, timeout=POLL_TIMEOUT, request_timeout=POLL_TIMEOUT + 5
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                errors += 1
+                logger.error(f"Erro no getUpdates: {e}")
+                await asyncio.sleep(min(60, 2 ** min(errors, 6)))
+                continue
+
+            errors = 0
+            if not ready:
+                ready = True
+                channel.send(event="ready", bot_id=self.bot_id)
+            if not updates:
+                continue
+
+            offset = updates[-1]["update_id"] + 1
+            parsed = [types.Update.de_json(update) for update in updates]
+            try:
+                if isinstance(self.bot, AsyncTeleBot):
+                    await self.bot.process_new_updates(parsed)
+                else:
+                    await loop.run_in_executor(executor, contextvars.copy_context().run, self.bot.process_new_updates, parsed)
+            except Exception:
+                # Erro num handler fica restrito a este bot
+                logger.error(f"Erro ao processar atualizações:\n{traceback.format_exc()}")
+
+class Worker:
+    def __init__(self):
+        self.bots = {}
+
+    async def start_bot(self, bot_id: int, command: dict):
+        current_bot.set(bot_id)
+        await self.stop_bot(bot_id, notify=False)
+        hosted = HostedBot(bot_id, command)
+        self.bots[bot_id] = hosted
+        try:
+            await hosted.load()
+        except asyncio.TimeoutError:
+            # A thread presa na importação não pode ser interrompida: o worker
+            # sai e o painel redistribui os outros bots
+            channel.send(event="failed", bot_id=bot_id, fatal=True,
+                         error=f"Código não terminou de carregar em {LOAD_TIMEOUT:.0f}s; use o modo dedicado")
+            os._exit(3)
+        except Exception as e:
+            self.bots.pop(bot_id, None)
+            channel.send(event="failed", bot_id=bot_id, fatal=False, error=f"{e.__class__.__name__}: {e}")
+            return
+
+        if self.bots.get(bot_id) is not hosted:
+            # Parado enquanto carregava
+            return
+        hosted.task = asyncio.current_task()
+        channel.send(event="started", bot_id=bot_id)
+        try:
+            await hosted.poll()
+        except asyncio.CancelledError:
+            pass
+
+    async def stop_bot(self, bot_id: int, notify: bool = True):
+        hosted = self.bots.pop(bot_id, None)
+        if hosted is not None and hosted.task is not None:
+            hosted.task.cancel()
+            try:
+                await hosted.task
+            except asyncio.CancelledError:
+                pass
+        if notify:
+            channel.send(event="stopped", bot_id=bot_id)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=16 * 1024 * 1024)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                # Painel fechou o stdin: encerrar
+                break
+            try:
+                command = json.loads(line)
+            except ValueError:
+                logger.error(f"Comando inválido: {line[:200]!r}")
+                continue
+
+            bot_id = command.get("bot_id")
+            if command.get("op") == "start":
+                # Cada bot numa task com o seu próprio contexto (current_bot)
+                asyncio.create_task(self.start_bot(bot_id, command), context=contextvars.copy_context())
+            elif command.get("op") == "stop":
+                await self.stop_bot(bot_id)
+
+        for bot_id in list(self.bots):
+            await self.stop_bot(bot_id)
+
+if __name__ == '__main__':
+    asyncio.run(Worker().run())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fork-server dos bots do FarmMoneyRich
+
+Processo de longa duração que importa uma vez as dependências comuns dos bots
+(telebot, requests...) e cria cada bot com os.fork(), evitando a partida a
+frio do interpretador a cada ativação ou reinício.
+
+O painel (app.py) conversa pelo socket unix (SOCK_SEQPACKET) recebido em
+argv[1]. Cada pedido é um JSON {"path": "<artefato>", "token": "..."}
+acompanhado dos descritores do bot: stdout, stderr, o pipe de prontidão e,
+opcionalmente, o de liberação do primeiro polling (reinício sem interrupção).
+A resposta é {"pid": N} ou {"error": "..."}. O fim de cada filho é informado no stdout, um JSON por linha:
+{"event": "exit", "pid": N, "returncode": C}.
+"""
+
+import importlib
+import io
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+
+PRELOAD = os.getenv("BOT_ZYGOTE_PRELOAD", "telebot,telebot.types,telebot.util,requests")
+
+for module_name in filter(None, (name.strip() for name in PRELOAD.split(","))):
+    try:
+        importlib.import_module(module_name)
+    except Exception as e:
+        print(f"Não foi possível pré-carregar {module_name}: {e}", file=sys.stderr)
+
+import bot_launcher
+
+def report(**event):
+    # Uma única escrita por evento: linhas curtas chegam inteiras ao painel
+    os.write(1, (json.dumps(event) + "\n").encode("utf-8"))
+
+class Zygote:
+    def __init__(self, control: socket.socket):
+        self.control = control
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        os.set_blocking(self.wake_w, False)
+        signal.set_wakeup_fd(self.wake_w)
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.control, selectors.EVENT_READ)
+        self.selector.register(self.wake_r, selectors.EVENT_READ)
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select():
+                if key.fileobj is self.control:
+                    if not self.handle_request():
+                        # Painel fechou o socket: os bots já criados continuam
+                        return
+                else:
+                    self.reap()
+
+    def handle_request(self) -> bool:
+        message, fds, _, _ = socket.recv_fds(self.control, 65536, 4)
+        if not message:
+            return False
+        try:
+            request = json.loads(message)
+            if len(fds) not in (3, 4):
+                raise ValueError("pedido sem os descritores do bot")
+            reply = {"pid": self.spawn(request["path"], request.get("token"), fds)}
+        except Exception as e:
+            reply = {"error": f"{e.__class__.__name__}: {e}"}
+        finally:
+            for fd in fds:
+                os.close(fd)
+        self.control.send(json.dumps(reply).encode("utf-8"))
+        return True
+
+    def spawn(self, path: str, token: str, fds: list) -> int:
+        pid = os.fork()
+        if pid:
+            return pid
+
+        # Filho: sai sempre por os._exit, nunca volta para o laço do zygote
+        code = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            self.selector.close()
+            self.control.close()
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+
+            stdout_fd, stderr_fd, ready_fd = fds[:3]
+            go_fd = fds[3] if len(fds) > 3 else None
+            os.dup2(stdout_fd, 1)
+            os.dup2(stderr_fd, 2)
+            os.close(stdout_fd)
+            os.close(stderr_fd)
+            # Sem buffer, como PYTHONUNBUFFERED=1 no modo exec
+            sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), write_through=True)
+            sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), write_through=True)
+            if token:
+                os.environ["BOT_TOKEN"] = token
+
+            code = bot_launcher.main(path, ready_fd, go_fd)
+            bot_launcher.join_threads()
+        except BaseException:
+            pass
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code)
+
+    def reap(self):
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            report(event="exit", pid=pid, returncode=os.waitstatus_to_exitcode(status))
+
+if __name__ == '__main__':
+    Zygote(socket.socket(fileno=int(sys.argv[1]))).run()
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { NotificationProvider, useNotification } from './components/NotificationProvider';
 import { useStats, useBots, useGateways, useLogs } from './hooks/useApi';
-import { BotData, GatewayData } from './services/api';
+import { apiService, BotData, BotSummary, GatewayData } from './services/api';
 import { 
   LayoutDashboard, 
   Bot, 
@@ -73,8 +73,16 @@ function AppContent() {
   const [gatewayKey, setGatewayKey] = useState('');
 
   // Bot functions
-  const openBotModal = (bot?: BotData) => {
-    if (bot) {
+  const openBotModal = async (summary?: BotSummary) => {
+    if (summary) {
+      // A listagem não traz código nem token completo
+      let bot: BotData;
+      try {
+        bot = await apiService.getBot(summary.id);
+      } catch (error) {
+        showNotification('error', 'Erro ao carregar bot');
+        return;
+      }
       setEditingBot(bot);
       setBotName(bot.name);
       setBotToken(bot.token);
@@ -477,7 +485,7 @@ function AppContent() {
                             </label>
                           </div>
                           <p className="text-sm text-gray-500 dark:text-gray-400">
-                            Token: <span className="font-mono">{bot.token.substring(0, 4)}...{bot.token.slice(-4)}</span>
+                            Token: <span className="font-mono">{bot.token_masked}</span>
                           </p>
                           <div className="mt-2">
                             <span className={`inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium ${
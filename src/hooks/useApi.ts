@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from 'react';
-import { apiService, BotData, GatewayData, LogEntry, StatsData } from '../services/api';
+import { apiService, BotData, BotSummary, GatewayData, LogEntry, StatsData } from '../services/api';
 
 export const useStats = () => {
   const [stats, setStats] = useState<StatsData | null>(null);
@@ -27,7 +27,7 @@ export const useStats = () => {
 };
 
 export const useBots = () => {
-  const [bots, setBots] = useState<BotData[]>([]);
+  const [bots, setBots] = useState<BotSummary[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -14,6 +14,17 @@ export interface BotData {
   updated_at: string;
 }
 
+// Item da listagem de bots: sem código e com o token mascarado
+export interface BotSummary {
+  id: number;
+  name: string;
+  token_masked: string;
+  is_active: boolean;
+  gateway_id?: number;
+  created_at: string;
+  updated_at: string;
+}
+
 export interface GatewayData {
   id: number;
   name: string;
@@ -70,9 +81,24 @@ class ApiService {
     return this.request<StatsData>('/stats');
   }
 
+  // Listagens paginadas por cursor (after_id): busca até a última página
+  private async requestAll<T extends { id: number }>(endpoint: string, limit: number = 500): Promise<T[]> {
+    let items: T[] = [];
+    for (;;) {
+      const cursor = items.length ? `&after_id=${items[items.length - 1].id}` : '';
+      const page = await this.request<T[]>(`${endpoint}?limit=${limit}${cursor}`);
+      items = items.concat(page);
+      if (page.length < limit) return items;
+    }
+  }
+
   // Bots
-  async getBots(): Promise<BotData[]> {
-    return this.request<BotData[]>('/bots');
+  async getBots(): Promise<BotSummary[]> {
+    return this.requestAll<BotSummary>('/bots');
+  }
+
+  async getBot(id: number): Promise<BotData> {
+    return this.request<BotData>(`/bots/${id}`);
   }
 
   async createBot(bot: Omit<BotData, 'id' | 'created_at' | 'updated_at' | 'is_active'>): Promise<BotData> {
@@ -109,7 +135,7 @@ class ApiService {
 
   // Gateways
   async getGateways(): Promise<GatewayData[]> {
-    return this.request<GatewayData[]>('/gateways');
+    return this.requestAll<GatewayData>('/gateways');
   }
 
   async createGateway(gateway: Omit<GatewayData, 'id' | 'created_at' | 'status'> & { api_key: string }): Promise<GatewayData> {
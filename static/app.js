@@ -74,6 +74,17 @@ const utils = {
         }
     },
     
+    // Listagens paginadas por cursor (after_id): busca até a última página
+    async apiRequestAll(endpoint, limit = 500) {
+        let items = [];
+        while (true) {
+            const cursor = items.length ? `&after_id=${items[items.length - 1].id}` : '';
+            const page = await this.apiRequest(`${endpoint}?limit=${limit}${cursor}`);
+            items = items.concat(page);
+            if (page.length < limit) return items;
+        }
+    },
+    
     // Mostrar notificações
     showNotification(message, type = 'info') {
         // Criar elemento de notificação
@@ -156,7 +167,7 @@ const dataManager = {
     // Carregar bots
     async loadBots() {
         try {
-            bots = await utils.apiRequest('/bots');
+            bots = await utils.apiRequestAll('/bots');
             this.renderBots();
             utils.updateConnectionStatus(true);
         } catch (error) {
@@ -168,7 +179,7 @@ const dataManager = {
     // Carregar gateways
     async loadGateways() {
         try {
-            gateways = await utils.apiRequest('/gateways');
+            gateways = await utils.apiRequestAll('/gateways');
             this.renderGateways();
             this.updateGatewaySelect();
             utils.updateConnectionStatus(true);
@@ -235,7 +246,7 @@ const dataManager = {
                             </label>
                         </div>
                         <p class="text-sm text-gray-500 dark:text-gray-400">
-                            Token: <span class="font-mono">${bot.token}</span>
+                            Token: <span class="font-mono">${bot.token_masked}</span>
                         </p>
                         <div class="mt-2">
                             <span class="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium ${
@@ -409,6 +420,69 @@ const dataManager = {
     }
 };
 
+// Atualizações em tempo real (Server-Sent Events)
+const liveUpdates = {
+    source: null,
+    
+    // Retorna false quando o navegador não suporta SSE (cai no polling)
+    start() {
+        if (!window.EventSource) return false;
+        
+        this.source = new EventSource(`${API_BASE_URL}/stream`);
+        this.source.onopen = () => utils.updateConnectionStatus(true);
+        this.source.onerror = () => utils.updateConnectionStatus(false);
+        
+        this.source.addEventListener('log', (e) => {
+            logs.unshift(JSON.parse(e.data));
+            if (logs.length > 100) logs.length = 100;
+            if (currentSection === 'logs') dataManager.renderLogs();
+            if (currentSection === 'dashboard') dataManager.updateDashboard();
+        });
+        
+        this.source.addEventListener('logs_cleared', () => {
+            logs = [];
+            dataManager.renderLogs();
+            dataManager.updateDashboard();
+        });
+        
+        this.source.addEventListener('bot', (e) => {
+            const { action, bot } = JSON.parse(e.data);
+            bots = this.applyChange(bots, action, bot);
+            dataManager.renderBots();
+        });
+        
+        this.source.addEventListener('gateway', (e) => {
+            const { action, gateway } = JSON.parse(e.data);
+            gateways = this.applyChange(gateways, action, gateway);
+            dataManager.renderGateways();
+            dataManager.updateGatewaySelect();
+        });
+        
+        // O servidor envia o snapshot completo sempre que um contador muda
+        this.source.addEventListener('stats', (e) => {
+            stats = JSON.parse(e.data);
+            dataManager.updateDashboard();
+        });
+        
+        // Eventos perdidos durante a desconexão não estão mais no servidor
+        this.source.addEventListener('reset', () => {
+            eventManager.loadSectionData(currentSection);
+        });
+        
+        return true;
+    },
+    
+    applyChange(items, action, item) {
+        if (action === 'deleted') return items.filter(i => i.id != item.id);
+        const existing = items.find(i => i.id == item.id);
+        if (existing) {
+            Object.assign(existing, item);
+            return items;
+        }
+        return [...items, item];
+    }
+};
+
 // Gerenciamento de eventos
 const eventManager = {
     init() {
@@ -704,8 +778,12 @@ const eventManager = {
                     e.target.checked = !e.target.checked; // Reverter toggle
                 }
             } else if (e.target.closest('.edit-btn')) {
-                // Editar bot
-                this.openBotModal(bot);
+                // Editar bot: a listagem não traz código nem token completo
+                try {
+                    this.openBotModal(await utils.apiRequest(`/bots/${botId}`));
+                } catch (error) {
+                    utils.showNotification('Erro ao carregar bot', 'error');
+                }
             } else if (e.target.closest('.delete-btn')) {
                 // Excluir bot
                 if (confirm(`Excluir o bot "${bot.name}"?`)) {
@@ -741,18 +819,29 @@ const eventManager = {
             if (e.target.closest('.test-connection-btn')) {
                 // Testar conexão
                 try {
-                    await utils.apiRequest(`/gateways/${gatewayId}/test`, { method: 'POST' });
+                    const response = await utils.apiRequest(`/gateways/${gatewayId}/test`, { method: 'POST' });
+                    
+                    if (response.cached) {
+                        // Teste recente: o servidor devolve o resultado sem testar de novo
+                        Object.assign(gateway, response.gateway);
+                        dataManager.renderGateways();
+                        utils.showNotification('Resultado do último teste reaproveitado', 'info');
+                        return;
+                    }
+                    
                     utils.showNotification('Teste de conexão iniciado', 'info');
                     
                     // Atualizar status para "Testando"
                     gateway.status = 'Testando';
                     dataManager.renderGateways();
                     
-                    // Recarregar gateways após alguns segundos
-                    setTimeout(async () => {
-                        await dataManager.loadGateways();
-                        await dataManager.loadStats();
-                    }, 3000);
+                    // Sem stream, recarregar gateways após alguns segundos
+                    if (!liveUpdates.source) {
+                        setTimeout(async () => {
+                            await dataManager.loadGateways();
+                            await dataManager.loadStats();
+                        }, 3000);
+                    }
                 } catch (error) {
                     utils.showNotification('Erro ao testar conexão', 'error');
                 }
@@ -873,14 +962,16 @@ document.addEventListener('DOMContentLoaded', async () => {
     // Carregar dados iniciais
     await eventManager.loadSectionData('dashboard');
     
-    // Configurar atualização automática
-    setInterval(async () => {
-        if (currentSection === 'dashboard') {
-            await dataManager.loadStats();
-            await dataManager.loadLogs();
-            dataManager.updateDashboard();
-        }
-    }, 30000); // Atualizar a cada 30 segundos
+    // Atualização em tempo real; sem suporte a SSE, volta ao polling
+    if (!liveUpdates.start()) {
+        setInterval(async () => {
+            if (currentSection === 'dashboard') {
+                await dataManager.loadStats();
+                await dataManager.loadLogs();
+                dataManager.updateDashboard();
+            }
+        }, 30000); // Atualizar a cada 30 segundos
+    }
     
     console.log('FarmMoneyRich Dashboard inicializado com sucesso!');
 });
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+Ambiente dos testes: o app cria o banco, o cache de artefatos e os arquivos
+de estado na importação, então tudo vai para um diretório temporário antes
+de `import app`.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+WORKDIR = tempfile.mkdtemp(prefix="farm_tests_")
+
+TEST_ENV = {
+    "DATABASE_URL": f"sqlite:///{WORKDIR}/test.db",
+    "BOT_ARTIFACT_DIR": os.path.join(WORKDIR, "artifacts"),
+    "LOG_ARCHIVE_DIR": os.path.join(WORKDIR, "log-archive"),
+    "GATEWAY_HEALTH_LOCK_FILE": os.path.join(WORKDIR, "health.lock"),
+    "STATIC_DIR": str(ROOT / "static"),
+    "GATEWAY_HEALTH_INTERVAL": "0",
+    "LOG_RETENTION_INTERVAL": "0",
+}
+os.environ.update(TEST_ENV)
+sys.path.insert(0, str(ROOT))
+
+def run_app(database_path: str, code: str, **env) -> str:
+    """Roda `code` num processo novo com o app importado sobre outro banco; devolve o stdout"""
+    result = subprocess.run(
+        [sys.executable, "-c", "import app\n" + code],
+        cwd=WORKDIR, capture_output=True, text=True, timeout=120,
+        env={**os.environ, **TEST_ENV, "DATABASE_URL": f"sqlite:///{database_path}", "PYTHONPATH": str(ROOT), **env},
+    )
+    assert result.returncode == 0, result.stderr[-3000:]
+    return result.stdout
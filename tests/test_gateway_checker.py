@@ -0,0 +1,115 @@
+"""
+GatewayChecker contra um gateway local (http.server), sem rede externa
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app
+
+class StubGateway:
+    """/ok responde 200, /down 503 e /slow demora `slow_seconds`"""
+
+    slow_seconds = 1.0
+
+    def __init__(self):
+        self.hits = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                if self.path == "/slow":
+                    time.sleep(stub.slow_seconds)
+                status = 503 if self.path == "/down" else 200
+                body = b'{"ok": true}'
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub():
+    server = StubGateway()
+    yield server
+    server.close()
+
+@pytest.fixture
+def checker():
+    return app.GatewayChecker(timeout=0.2, concurrency=4, pool_maxsize=4, cache_ttl=60)
+
+def test_success(stub, checker):
+    [result] = checker.check([(1, stub.url("/ok"))])
+    assert result["success"] is True
+    assert result["status_code"] == 200
+    assert result["cached"] is False
+    assert result["latency_ms"] >= 0
+
+def test_server_error_is_failure(stub, checker):
+    [result] = checker.check([(1, stub.url("/down"))])
+    assert result["success"] is False
+    assert result["status_code"] == 503
+
+def test_timeout(stub, checker):
+    started = time.monotonic()
+    [result] = checker.check([(1, stub.url("/slow"))])
+    assert result["success"] is False
+    assert result["status_code"] is None
+    assert result["error"] == "ReadTimeout"
+    assert time.monotonic() - started < StubGateway.slow_seconds
+
+def test_cache_hit(stub, checker):
+    checker.check([(1, stub.url("/ok"))])
+    [result] = checker.check([(1, stub.url("/ok"))])
+    assert result["cached"] is True
+    assert stub.hits["/ok"] == 1
+    # Sem cache (ou com outra URL) o gateway é testado de novo
+    checker.check([(1, stub.url("/ok"))], use_cache=False)
+    assert stub.hits["/ok"] == 2
+
+def test_unexpected_error_is_failure(checker, monkeypatch):
+    def broken_probe(url):
+        raise ValueError("url inválida")
+
+    monkeypatch.setattr(checker, "probe", broken_probe)
+    [result] = checker.check([(1, "http://gateway")])
+    assert result["success"] is False
+    assert result["error"] == "ValueError"
+    # O teste seguinte não reaproveita um future preso
+    assert checker._inflight == {}
+
+def test_endpoint_records_failure_when_check_raises(monkeypatch):
+    from starlette.testclient import TestClient
+
+    def broken_check(gateways, use_cache=True):
+        raise RuntimeError("pool encerrado")
+
+    monkeypatch.setattr(app.gateway_checker, "check", broken_check)
+    client = TestClient(app.app)
+    gateway = client.post("/api/gateways", json={"name": "stub", "type": "BTCPay Server",
+                                                 "api_url": "http://127.0.0.1:9/", "api_key": "k"}).json()
+    assert client.post(f"/api/gateways/{gateway['id']}/test").status_code == 200
+    assert client.get(f"/api/gateways/{gateway['id']}").json()["status"] == "Erro"
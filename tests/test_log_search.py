@@ -0,0 +1,58 @@
+"""
+Índice FTS5 dos logs num banco que já tinha logs antes do índice existir
+"""
+
+import json
+import os
+import sqlite3
+
+from conftest import WORKDIR, run_app
+
+def create_legacy_database(path: str, messages: list):
+    """Banco de uma versão sem busca: só a tabela logs, já com linhas"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY, level VARCHAR, message TEXT, "
+                 "bot_id INTEGER, timestamp DATETIME)")
+    conn.executemany("INSERT INTO logs (level, message, timestamp) VALUES ('info', ?, '2024-01-01 12:00:00')",
+                     [(message,) for message in messages])
+    conn.commit()
+    conn.close()
+
+def test_upgraded_database_is_indexed_and_deletes_work():
+    path = os.path.join(WORKDIR, "legacy_search.db")
+    create_legacy_database(path, [f"Pagamento antigo {i}" for i in range(10)])
+
+    output = run_app(path, """
+import json
+with app.engine.begin() as conn:
+    found = conn.exec_driver_sql("SELECT count(*) FROM logs_fts WHERE logs_fts MATCH 'antigo'").scalar()
+    conn.exec_driver_sql("DELETE FROM logs WHERE id <= 5")
+    conn.exec_driver_sql("INSERT INTO logs_fts(logs_fts, rank) VALUES ('integrity-check', 1)")
+    left = conn.exec_driver_sql("SELECT count(*) FROM logs_fts WHERE logs_fts MATCH 'antigo'").scalar()
+print(json.dumps({"found": found, "left": left}))
+""")
+    assert json.loads(output.splitlines()[-1]) == {"found": 10, "left": 5}
+
+def test_clear_on_upgraded_database():
+    path = os.path.join(WORKDIR, "legacy_clear.db")
+    create_legacy_database(path, [f"Log antigo {i}" for i in range(10)])
+
+    output = run_app(path, """
+import json
+app.log_retention.request_clear(10)
+purged = app.log_retention.run_once(include_policies=False)
+with app.engine.connect() as conn:
+    remaining = conn.exec_driver_sql("SELECT count(*) FROM logs").scalar()
+print(json.dumps({"purged": purged, "remaining": remaining, "pending": app.log_retention.stats()["pending_clear_up_to"]}))
+""")
+    assert json.loads(output.splitlines()[-1]) == {"purged": {"clear": 10}, "remaining": 0, "pending": None}
+
+def test_second_start_does_not_rebuild_again():
+    path = os.path.join(WORKDIR, "legacy_restart.db")
+    create_legacy_database(path, ["Primeira mensagem"])
+    run_app(path, "")
+    output = run_app(path, """
+with app.engine.connect() as conn:
+    print(conn.exec_driver_sql("SELECT count(*) FROM logs_fts WHERE logs_fts MATCH 'primeira'").scalar())
+""")
+    assert output.split()[-1] == "1"
@@ -0,0 +1,50 @@
+"""
+LogWriter: gravação em lote, ordem dos ids e descarte com a fila cheia
+"""
+
+import time
+from datetime import datetime
+
+import app
+
+def entries(prefix: str, count: int) -> list:
+    now = datetime.utcnow()
+    return [{"level": "info", "message": f"{prefix} {i}", "bot_id": None, "timestamp": now} for i in range(count)]
+
+def stored(prefix: str) -> list:
+    with app.engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT id, message FROM logs WHERE message LIKE ? ORDER BY id", (prefix + " %",)).all()
+
+def test_batches_keep_submission_order():
+    writer = app.LogWriter(max_size=100, batch_size=3, flush_interval=60, enqueue_timeout=0.05)
+    assert len(writer.submit_many(entries("ordem", 7))) == 7
+    writer.start()
+    writer.stop()
+
+    assert [message for _, message in stored("ordem")] == [f"ordem {i}" for i in range(7)]
+    stats = writer.stats()
+    assert (stats["written"], stats["batches"], stats["queue_depth"]) == (7, 3, 0)
+
+def test_partial_batch_is_flushed_after_interval():
+    writer = app.LogWriter(max_size=100, batch_size=100, flush_interval=0.05, enqueue_timeout=0.05)
+    writer.start()
+    try:
+        writer.submit_many(entries("intervalo", 2))
+        assert app.wait_until(lambda: writer.stats()["written"] == 2, 2)
+        assert len(stored("intervalo")) == 2
+    finally:
+        writer.stop()
+
+def test_full_queue_drops_without_blocking():
+    writer = app.LogWriter(max_size=2, batch_size=10, flush_interval=60, enqueue_timeout=0.05)
+    accepted = writer.submit_many(entries("sem espera", 5), block=False)
+    assert [entry["message"] for entry in accepted] == ["sem espera 0", "sem espera 1"]
+    assert (writer.stats()["enqueued"], writer.stats()["dropped"]) == (2, 3)
+
+def test_full_queue_blocks_once_per_batch():
+    writer = app.LogWriter(max_size=1, batch_size=10, flush_interval=60, enqueue_timeout=0.2)
+    started = time.monotonic()
+    assert len(writer.submit_many(entries("com espera", 10))) == 1
+    # O prazo vale para o lote inteiro, não para cada linha descartada
+    assert time.monotonic() - started < 1.0
+    assert writer.stats()["dropped"] == 9
@@ -0,0 +1,57 @@
+"""
+Escrita de logs em lote e paginação da listagem
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from starlette.testclient import TestClient
+
+import app
+
+@pytest.fixture
+def client():
+    return TestClient(app.app)
+
+def log_entry(message: str, timestamp: datetime) -> dict:
+    return {"level": "info", "message": message, "bot_id": None, "timestamp": timestamp}
+
+def latest_id() -> int:
+    with app.engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM logs").scalar()
+
+def test_after_id_returns_batch_flushed_after_newer_rows(client):
+    """Logs que esperaram na fila ganham ids depois de logs com timestamp mais novo"""
+    queued_at = datetime.utcnow() - timedelta(seconds=5)
+    assert len(app.log_writer.submit_many([log_entry(f"na fila {i}", queued_at) for i in range(3)])) == 3
+
+    # Com o writer parado, add_logs grava na hora (ids menores, timestamps mais novos)
+    app.add_logs([("info", f"direto {i}", None) for i in range(2)])
+    cursor = latest_id()
+
+    app.log_writer.start()
+    app.log_writer.stop()
+
+    newer = client.get(f"/api/logs?after_id={cursor}").json()
+    assert [log["message"] for log in newer] == ["na fila 2", "na fila 1", "na fila 0"]
+    assert [log["id"] for log in newer] == sorted((log["id"] for log in newer), reverse=True)
+    assert client.get(f"/api/logs?after_id={newer[0]['id']}").json() == []
+
+def test_after_id_pages_in_id_order(client):
+    cursor = latest_id()
+    app.add_logs([("info", f"página {i}", None) for i in range(5)])
+
+    first = client.get(f"/api/logs?after_id={cursor}&limit=2").json()
+    second = client.get(f"/api/logs?after_id={first[0]['id']}&limit=2").json()
+    third = client.get(f"/api/logs?after_id={second[0]['id']}&limit=2").json()
+    assert [log["message"] for log in first + second + third] == ["página 1", "página 0", "página 3", "página 2", "página 4"]
+
+def test_before_id_walks_back_without_repeats(client):
+    app.add_logs([("info", f"antigo {i}", None) for i in range(7)])
+    seen = []
+    page = client.get("/api/logs?limit=3").json()
+    while page:
+        seen.extend(log["id"] for log in page)
+        page = client.get(f"/api/logs?limit=3&before_id={page[-1]['id']}").json()
+    assert len(seen) == len(set(seen))
+    assert client.get("/api/logs?before_id=999999999").status_code == 400
@@ -0,0 +1,47 @@
+"""
+Cache de respostas: ETag pelas versões das tabelas, 304 e invalidação nas escritas
+"""
+
+import pytest
+from starlette.testclient import TestClient
+
+import app
+
+@pytest.fixture
+def client():
+    return TestClient(app.app)
+
+def test_if_none_match_returns_304(client):
+    first = client.get("/api/gateways")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+
+    not_modified = app.response_cache.not_modified
+    again = client.get("/api/gateways", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert app.response_cache.not_modified == not_modified + 1
+
+def test_repeated_read_is_served_from_cache(client):
+    client.get("/api/bots?limit=5&skip=0")
+    hits = app.response_cache.hits
+    # Mesma chave com os parâmetros em outra ordem
+    response = client.get("/api/bots?skip=0&limit=5")
+    assert response.status_code == 200
+    assert app.response_cache.hits == hits + 1
+
+def test_write_invalidates_etag_and_body(client):
+    before = client.get("/api/gateways")
+    gateway = client.post("/api/gateways", json={"name": "cache", "type": "BTCPay Server",
+                                                 "api_url": "http://127.0.0.1:9/", "api_key": "k"}).json()
+
+    after = client.get("/api/gateways", headers={"If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert gateway["id"] in [item["id"] for item in after.json()]
+
+def test_other_routes_are_not_cached(client):
+    entries = app.response_cache.stats()["entries"]
+    response = client.get("/api/health")
+    assert "etag" not in response.headers
+    assert app.response_cache.stats()["entries"] == entries
@@ -0,0 +1,44 @@
+"""
+Reinício de bots: marcação de reinício em andamento e lock de ativação
+"""
+
+import pytest
+from starlette.testclient import TestClient
+
+import app
+from test_worker_pool import FakeWorker
+
+@pytest.fixture
+def bot_id():
+    client = TestClient(app.app)
+    bot = client.post("/api/bots", json={"name": "reinício", "token": "123:abc"}).json()
+    yield bot["id"]
+    app.bot_processes.pop(bot["id"], None)
+
+def test_failed_restart_request_releases_the_bot(bot_id, monkeypatch):
+    async def broken_log(*args, **kwargs):
+        raise RuntimeError("banco indisponível")
+
+    monkeypatch.setattr(app, "add_log_async", broken_log)
+    client = TestClient(app.app, raise_server_exceptions=False)
+    assert client.post(f"/api/bots/{bot_id}/restart").status_code == 500
+    assert bot_id not in app.restarting_bots
+
+def test_restart_holds_the_start_lock(bot_id, monkeypatch):
+    monkeypatch.setattr(app, "BOT_READY_TIMEOUT", 0.1)
+    held = []
+
+    def start_bot(bot_id, artifact, token, requested_at=None):
+        held.append(app.bot_start_lock(bot_id).locked())
+        handle = worker.start_bot(bot_id, artifact, token, requested_at)
+        handle.launch.mark("ready")
+        return handle
+
+    worker = FakeWorker(1)
+    monkeypatch.setattr(app.worker_pool, "start_bot", start_bot)
+    result = app.restart_bot_instance(bot_id, None, "123:abc", "shared", 0.0)
+    assert held == [True]
+    assert result["downtime"] is not None
+    # Um toggle durante o reinício esperaria o lock; depois dele vê a instância nova
+    assert app.launch_bot(bot_id, "print()", "123:abc", "shared") is False
+    assert app.bot_processes[bot_id] is worker.handles[bot_id]
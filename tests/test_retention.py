@@ -0,0 +1,104 @@
+"""
+Limpeza de logs (DELETE /api/logs) e arquivamento da retenção
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+import app
+from conftest import WORKDIR, run_app
+
+def max_log_id() -> int:
+    with app.engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM logs").scalar()
+
+def log_ids() -> list:
+    with app.engine.connect() as conn:
+        return [row[0] for row in conn.exec_driver_sql("SELECT id FROM logs ORDER BY id")]
+
+def archived_ids(archive_dir: str) -> list:
+    ids = []
+    for root, _, files in os.walk(archive_dir):
+        for name in files:
+            with gzip.open(os.path.join(root, name), "rt", encoding="utf-8") as f:
+                ids.extend(json.loads(line)["id"] for line in f)
+    return ids
+
+@pytest.fixture
+def retention():
+    archive_dir = tempfile.mkdtemp(prefix="archive_", dir=WORKDIR)
+    return app.LogRetention(0, 0, 0, {}, archive_dir, chunk_size=2, pause=0, vacuum_pages=0)
+
+def test_clear_removes_everything_and_ids_keep_growing(retention):
+    app.add_logs([("info", f"antes da limpeza {i}", None) for i in range(5)])
+    cutoff = max_log_id()
+    existing = log_ids()
+
+    retention.request_clear(cutoff)
+    retention.run_once(include_policies=False)
+    assert log_ids() == []
+    assert retention.stats()["pending_clear_up_to"] is None
+
+    # Tabela vazia: os ids novos continuam acima do corte (AUTOINCREMENT)
+    app.add_logs([("info", "depois da limpeza", None)])
+    assert max_log_id() > cutoff
+    assert sorted(archived_ids(retention.archive_dir)) == existing
+
+def test_failed_delete_does_not_archive_twice(retention):
+    app.add_logs([("info", f"retido {i}", None) for i in range(3)])
+    cutoff = max_log_id()
+    existing = log_ids()
+    with app.engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TRIGGER block_log_delete BEFORE DELETE ON logs BEGIN SELECT RAISE(ABORT, 'bloqueado'); END")
+    try:
+        retention.request_clear(cutoff)
+        with pytest.raises(DBAPIError):
+            retention.run_once(include_policies=False)
+        assert archived_ids(retention.archive_dir) == []
+    finally:
+        with app.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TRIGGER block_log_delete")
+
+    retention.run_once(include_policies=False)
+    # Cada linha arquivada uma única vez, só depois do DELETE passar
+    assert sorted(archived_ids(retention.archive_dir)) == existing
+    assert log_ids() == []
+
+def test_clear_endpoint_hides_logs_right_away():
+    from starlette.testclient import TestClient
+
+    client = TestClient(app.app)
+    app.add_logs([("info", "some da listagem", None)])
+    assert client.delete("/api/logs").status_code == 200
+    app.add_logs([("info", "chegou depois", None)])
+    expected = ["chegou depois", "Logs limpos pelo usuário"]
+    assert [log["message"] for log in client.get("/api/logs").json()] == expected
+    app.log_retention.run_once(include_policies=False)
+    assert [log["message"] for log in client.get("/api/logs").json()] == expected
+
+def test_legacy_table_is_rebuilt_with_autoincrement():
+    path = os.path.join(WORKDIR, "legacy_ids.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY, level VARCHAR, message TEXT, bot_id INTEGER, timestamp DATETIME)")
+    conn.executemany("INSERT INTO logs (id, level, message) VALUES (?, 'info', 'legado')", [(i,) for i in (3, 7, 9)])
+    conn.commit()
+    conn.close()
+
+    output = run_app(path, """
+import json
+with app.engine.begin() as conn:
+    ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'logs'").scalar()
+    ids = [row[0] for row in conn.exec_driver_sql("SELECT id FROM logs ORDER BY id")]
+    found = conn.exec_driver_sql("SELECT count(*) FROM logs_fts WHERE logs_fts MATCH 'legado'").scalar()
+    conn.exec_driver_sql("DELETE FROM logs")
+    conn.exec_driver_sql("INSERT INTO logs (level, message) VALUES ('info', 'novo')")
+    new_id = conn.exec_driver_sql("SELECT max(id) FROM logs").scalar()
+print(json.dumps({"autoincrement": "AUTOINCREMENT" in ddl.upper(), "ids": ids, "found": found, "new_id": new_id}))
+""")
+    assert json.loads(output.splitlines()[-1]) == {"autoincrement": True, "ids": [3, 7, 9], "found": 3, "new_id": 10}
@@ -0,0 +1,75 @@
+"""
+Rebalanceamento do WorkerPool com workers falsos (sem subprocessos nem Telegram)
+"""
+
+import threading
+
+import pytest
+
+import app
+
+class FakeWorker:
+    """Guarda os comandos enviados; `on_start` simula a resposta do bot_worker"""
+
+    def __init__(self, index: int, on_start=None):
+        self.index = index
+        self.handles = {}
+        self.alive = True
+        self.sent = []
+        self.on_start = on_start
+
+    def send(self, command: dict):
+        self.sent.append(command)
+
+    def start_bot(self, bot_id, artifact, token, requested_at=None):
+        handle = app.WorkerBotHandle(self, bot_id, artifact, token, requested_at)
+        self.handles[bot_id] = handle
+        self.sent.append({"op": "start", "bot_id": bot_id})
+        if self.on_start:
+            self.on_start(handle)
+        return handle
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(app, "BOT_READY_TIMEOUT", 1.0)
+    pool = app.WorkerPool(2)
+    yield pool
+    for worker in pool.workers:
+        for bot_id in worker.handles:
+            app.bot_processes.pop(bot_id, None)
+
+def host(pool, worker, bot_ids):
+    for bot_id in bot_ids:
+        app.bot_processes[bot_id] = worker.start_bot(bot_id, None, "token")
+    pool.workers.append(worker)
+
+def test_source_stops_only_after_target_loaded(pool):
+    source = FakeWorker(1)
+    stopped_before_loaded = []
+
+    def load_later(handle):
+        def mark():
+            stopped_before_loaded.append(any(c["op"] == "stop" for c in source.sent))
+            handle.launch.mark("loaded")
+        threading.Timer(0.2, mark).start()
+
+    target = FakeWorker(2, on_start=load_later)
+    host(pool, source, [9001, 9002, 9003])
+    pool.workers.append(target)
+
+    moves = pool.rebalance()
+    assert moves == [{"bot_id": 9001, "from_worker": 1, "to_worker": 2}]
+    assert stopped_before_loaded == [False]
+    assert source.sent[-1] == {"op": "stop", "bot_id": 9001}
+    assert app.bot_processes[9001] is target.handles[9001]
+
+def test_failed_target_keeps_source_running(pool):
+    source = FakeWorker(1)
+    target = FakeWorker(2, on_start=lambda handle: handle.finish(1))
+    host(pool, source, [9011, 9012, 9013])
+    pool.workers.append(target)
+    original = app.bot_processes[9011]
+
+    assert pool.rebalance() == []
+    assert not any(c["op"] == "stop" for c in source.sent)
+    assert app.bot_processes[9011] is original